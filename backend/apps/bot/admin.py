@@ -1,5 +1,15 @@
 from django.contrib import admin
 
-from apps.bot.models import Recommendation
+from apps.bot.models import (
+    FanOutJob,
+    FanOutRun,
+    FanOutShard,
+    Recommendation,
+    RecommendationVersion,
+)
 
 admin.site.register(Recommendation)
+admin.site.register(RecommendationVersion)
+admin.site.register(FanOutJob)
+admin.site.register(FanOutRun)
+admin.site.register(FanOutShard)
@@ -1,6 +1,12 @@
-from rest_framework import serializers
+from adrf import serializers
+from rest_framework import fields
 
-from apps.bot.models import Recommendation
+from apps.bot.models import (
+    FanOutRun,
+    FanOutShard,
+    Recommendation,
+    RecommendationVersion,
+)
 
 
 class RecommendationSerializer(serializers.ModelSerializer):
@@ -24,3 +30,80 @@ class RecommendationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recommendation
         fields = "__all__"
+
+
+class RecommendationVersionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the `RecommendationVersion` model.
+
+    Provides the earlier versions of a recommendation, which are kept
+    when the recommendation is regenerated for an edited proposal.
+
+    Attributes:
+    -----------
+    Meta : class
+        A nested class that defines metadata options for the serializer.
+        It specifies the model to serialize (`RecommendationVersion`)
+        and the fields to include in the serialized output (all fields
+        but the recommendation, which is implied by the URL).
+    """
+
+    class Meta:
+        model = RecommendationVersion
+        exclude = ("id", "recommendation")
+
+
+class RecommendationSearchResultSerializer(RecommendationSerializer):
+    """
+    Serializer for the results of a recommendation search.
+
+    Attributes:
+    -----------
+    rank : FloatField
+        How well the recommendation matches the query. Higher is
+        better.
+    """
+
+    rank = fields.FloatField(read_only=True)
+
+
+class FanOutShardSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the `FanOutShard` model.
+
+    Attributes:
+    -----------
+    cluster_count : IntegerField
+        The number of clusters of the shard, which are not listed.
+    Meta : class
+        A nested class that defines metadata options for the serializer.
+        It specifies the model to serialize (`FanOutShard`) and the
+        fields to leave out of the serialized output (the clusters and
+        the run, which is implied by the URL).
+    """
+
+    cluster_count = fields.SerializerMethodField()
+
+    class Meta:
+        model = FanOutShard
+        exclude = ("id", "run", "clusters")
+
+    def get_cluster_count(self, shard: FanOutShard) -> int:
+        return len(shard.clusters)
+
+
+class FanOutRunSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the `FanOutRun` model.
+
+    Attributes:
+    -----------
+    Meta : class
+        A nested class that defines metadata options for the serializer.
+        It specifies the model to serialize (`FanOutRun`) and the fields
+        to include in the serialized output (all fields in this case).
+    """
+
+    class Meta:
+        model = FanOutRun
+        fields = "__all__"
@@ -1,5 +1,5 @@
 from django.urls import path, include
-from rest_framework import routers
+from adrf import routers
 
 from apps.bot.api import views
 
@@ -12,5 +12,20 @@ urlpatterns = [
         views.snapshot_webhook_callback,
         name="snapshot_webhook_callback",
     ),
+    path(
+        "metrics",
+        views.metrics_endpoint,
+        name="metrics",
+    ),
+    path(
+        "runs/<int:pk>",
+        views.fan_out_run_status,
+        name="fan_out_run_status",
+    ),
+    path(
+        "events",
+        views.recommendation_events,
+        name="recommendation_events",
+    ),
     path("", include(router.urls)),
 ]
@@ -1,30 +1,57 @@
+import datetime
+import hmac
 from http import HTTPStatus
 
-from rest_framework import decorators, response, permissions, viewsets
-from django.http import HttpRequest
+from adrf import decorators as async_decorators, viewsets
+from asgiref.sync import sync_to_async
+from rest_framework import (
+    decorators,
+    exceptions,
+    pagination,
+    permissions,
+    response,
+)
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
+from django.utils import dateparse, timezone
 
-from apps.bot.models import Recommendation
-from apps.bot.api.serializers import RecommendationSerializer
-from apps.bot.snapshot import query_snapshot_proposal
-from apps.bot import completions
-from apps.users.models import Profile
+from apps.bot.models import FanOutRun, Recommendation
+from apps.bot.api.serializers import (
+    FanOutRunSerializer,
+    FanOutShardSerializer,
+    RecommendationSearchResultSerializer,
+    RecommendationSerializer,
+    RecommendationVersionSerializer,
+)
+from apps.bot import export, metrics, realtime, runs, search, webhooks
+from apps.users.middleware.auth import token_subject
+from apps.users.models import Account
+from core import conditional
 
 
-@decorators.api_view(["POST"])
+@async_decorators.api_view(["POST"])
+@decorators.authentication_classes([])
 @decorators.permission_classes([permissions.AllowAny])
-def snapshot_webhook_callback(request: HttpRequest):
+async def snapshot_webhook_callback(request: HttpRequest):
     """
     Handles the webhook callback from Snapshot.
 
-    This function processes incoming proposals from Snapshot. For each
-    user profile with a personal statement, it constructs a completion
-    request, sends it to the desired language model, and then stores the
-    model's response as a recommendation.
+    Deliveries must carry the shared secret of the webhook, which is
+    checked before anything else, so that forged deliveries cost
+    neither queries nor calls to Snapshot. Each event is then routed to
+    its handler (see `apps.bot.webhooks`): the fan-out of created
+    proposals is enqueued, unless they were already processed by an
+    earlier delivery or by the proposal sync, and the other events only
+    update the local mirror. The response does not wait for the
+    fan-out, which the job worker runs by voting deadline. The view is
+    asynchronous, so waiting on Snapshot does not hold a worker thread.
 
     Parameters:
     ----------
     request : HttpRequest
-        The incoming request containing the proposal information.
+        The incoming request containing the event.
 
     Returns:
     -------
@@ -32,61 +59,192 @@ def snapshot_webhook_callback(request: HttpRequest):
         An HTTP response indicating the success or failure of the
         operation.
     """
-    try:
-        proposal_id = request.data["id"].strip("proposal/")
-        proposal = query_snapshot_proposal(proposal_id)["proposal"]
-    except KeyError:
+    if not webhooks.is_authentic(request):
+        return response.Response(status=HTTPStatus.UNAUTHORIZED)
+
+    event = request.data
+    if not isinstance(event, dict) or not await webhooks.ahandle(event):
         return response.Response(status=HTTPStatus.BAD_REQUEST)
 
-    profiles = Profile.objects.exclude(bio__isnull=True).exclude(bio__exact="")
+    return response.Response(status=HTTPStatus.OK)
 
-    for profile in profiles:
-        match profile.large_language_model:
-            case Profile.LargeLanguageModelChoices.GPT_4:
-                completion_response = completions.openai_provider_completion(
-                    completions.CompletionRequest(
-                        profile,
-                        proposal,
-                    )
-                )
-                bot_response = Recommendation(
-                    account=profile.account,
-                    profile=profile,
-                    proposal={
-                        "title": proposal["title"],
-                        "body": proposal["body"],
-                    },
-                    recommendation=completion_response.completion,
-                    usage=completion_response.usage.__dict__,
-                )
-                bot_response.save()
 
-    return response.Response(status=HTTPStatus.OK)
+class HasMetricsToken(permissions.BasePermission):
+    """
+    Allows requests bearing the `METRICS["TOKEN"]`, compared in constant
+    time. No request is allowed while the token is unset.
+    """
+
+    def has_permission(self, request, view):
+        token = settings.METRICS["TOKEN"]
+        received = request.headers.get("Authorization", "")
+        return bool(token) and hmac.compare_digest(
+            received.encode(), f"Bearer {token}".encode()
+        )
+
+
+@decorators.api_view(["GET"])
+@decorators.permission_classes([permissions.IsAdminUser | HasMetricsToken])
+def metrics_endpoint(request: HttpRequest):
+    """
+    Exposes the recommendation pipeline metrics in the Prometheus text
+    format. This view is restricted to admin users and to scrapers
+    bearing the `METRICS["TOKEN"]`.
+
+    Parameters:
+    ----------
+    request : HttpRequest
+        The incoming scrape request.
+
+    Returns:
+    -------
+    HttpResponse
+        The rendered metrics.
+    """
+    content, content_type = metrics.render_latest()
+    return HttpResponse(content, content_type=content_type)
+
+
+@async_decorators.api_view(["GET"])
+@decorators.permission_classes([permissions.IsAdminUser])
+async def fan_out_run_status(request: HttpRequest, pk: int):
+    """
+    Reports the progress of a fan-out run. This view is restricted to
+    admin users.
+
+    Parameters:
+    ----------
+    request : HttpRequest
+        The incoming request.
+    pk : int
+        The primary key of the run.
+
+    Returns:
+    -------
+    Response
+        The run, the number of its shards per status, the number of
+        profiles processed and failed so far, and its shards.
+    """
+    run = await FanOutRun.objects.filter(pk=pk).afirst()
+    if run is None:
+        raise exceptions.NotFound()
+    summary = await sync_to_async(runs.status)(run)
+    shards = [shard async for shard in run.shards.order_by("index")]
+    return response.Response(
+        {
+            **await FanOutRunSerializer(run).adata,
+            **summary,
+            "shard_details": await FanOutShardSerializer(
+                shards, many=True
+            ).adata,
+        }
+    )
+
+
+async def recommendation_events(request: HttpRequest):
+    """
+    Streams the new recommendations of the user as server-sent events
+    (see `apps.bot.realtime.astream`), so that clients do not poll for
+    them.
+
+    Browsers cannot set headers on an `EventSource`, so besides the
+    `Authorization` header, the JWT may be passed as the `access_token`
+    query parameter, whose signature is verified like that of the
+    header. This is a plain Django view, as the streaming response
+    bypasses the rendering of DRF.
+
+    Parameters:
+    ----------
+    request : HttpRequest
+        The incoming request.
+
+    Returns:
+    -------
+    HttpResponse
+        The `text/event-stream` response, or 401 Unauthorized if the
+        request is not authenticated.
+    """
+    if request.method != "GET":
+        return HttpResponse(status=HTTPStatus.METHOD_NOT_ALLOWED)
+
+    # The user of a session is loaded lazily, with the synchronous ORM.
+    user = request.user
+    await sync_to_async(lambda: user.is_authenticated)()
+    if not user.is_authenticated and (
+        uuid := token_subject(
+            request.GET.get("access_token", ""),
+            settings.SUPABASE["JWT_SECRET"],
+        )
+    ):
+        try:
+            user = await Account.objects.aget(uuid=uuid)
+        except (Account.DoesNotExist, ValidationError):
+            pass
+    if not user.is_authenticated:
+        return HttpResponse(status=HTTPStatus.UNAUTHORIZED)
+
+    stream = StreamingHttpResponse(
+        realtime.astream(user.pk), content_type="text/event-stream"
+    )
+    stream["Cache-Control"] = "no-cache"
+    stream["X-Accel-Buffering"] = "no"
+    return stream
+
+
+class SearchPagination(pagination.PageNumberPagination):
+    """
+    Paginates search results with `?page=`, 20 per page unless
+    `?page_size=` asks for up to 100.
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
 
 
 class RecommendationViewSet(viewsets.ModelViewSet):
     """
     A ViewSet for viewing and manipulating Recommendation objects.
 
-    This ViewSet provides CRUD operations for `Recommendation`
-    instances. If the request user is a superuser, they can access all
-    recommendations. Otherwise, users can only access their own
-    recommendations.
+    This ViewSet provides asynchronous CRUD operations for
+    `Recommendation` instances. If the request user is a superuser, they
+    can access all recommendations. Otherwise, users can only access
+    their own recommendations.
 
     Attributes:
     -----------
     serializer_class : RecommendationSerializer
         The serializer class used for converting `Recommendation`
         instances to and from JSON format.
+    permission_classes : List[Permission]
+        The set of permissions required to access this view.
 
     Methods:
     --------
     get_queryset() -> QuerySet:
         Retrieves a queryset of `Recommendation` instances based on the
         permissions of the request user.
+
+    alist(request: HttpRequest) -> HttpResponse:
+        Lists the recommendations, or answers 304 Not Modified if the
+        client already holds them.
+
+    versions(request: HttpRequest, pk: str) -> HttpResponse:
+        Lists the earlier versions of a recommendation, newest first.
+
+    verdict_counts(request: HttpRequest) -> HttpResponse:
+        Counts the recommendations per verdict.
+
+    search(request: HttpRequest) -> HttpResponse:
+        Searches the recommendations by proposal title, proposal body
+        and recommendation text.
+
+    export(request: HttpRequest, export_format: str) -> HttpResponse:
+        Streams the recommendations as NDJSON or CSV.
     """
 
     serializer_class = RecommendationSerializer
+    permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         """
@@ -94,15 +252,217 @@ class RecommendationViewSet(viewsets.ModelViewSet):
         to view.
 
         If the user is a superuser, they can see all recommendations.
-        Otherwise, they can only see their own recommendations.
+        Otherwise, they can only see their own recommendations. Either
+        way, the recommendations are restricted to the verdicts given
+        by the `verdict` query parameter, if any.
 
         Returns:
         -------
         QuerySet
             A queryset of `Recommendation` instances.
+
+        Raises:
+        -------
+        ValidationError
+            If the `verdict` query parameter holds an unknown verdict.
         """
         if self.request.user.is_superuser:
             queryset = Recommendation.objects.all()
         else:
             queryset = Recommendation.objects.filter(account=self.request.user)
+
+        requested = {
+            verdict.strip()
+            for value in self.request.query_params.getlist("verdict")
+            for verdict in value.split(",")
+            if verdict.strip()
+        }
+        if requested:
+            known = Recommendation.VerdictChoices.values
+            unknown = requested - set(known)
+            if unknown:
+                raise exceptions.ValidationError(
+                    {
+                        "verdict": (
+                            f"Unknown verdicts {', '.join(sorted(unknown))},"
+                            f" expected any of {', '.join(known)}."
+                        )
+                    }
+                )
+            queryset = queryset.filter(verdict__in=requested)
         return queryset
+
+    async def alist(self, request: HttpRequest, *args, **kwargs):
+        """
+        Lists the recommendations the user can see.
+
+        The response carries an ETag derived from the number of
+        recommendations and their latest creation and revision times,
+        which change whenever a recommendation is added, regenerated,
+        edited or deleted. A request whose `If-None-Match` holds the
+        current ETag is answered with 304 Not Modified without reading
+        the recommendations.
+        """
+        version = await self.filter_queryset(self.get_queryset()).aaggregate(
+            count=Count("pk"),
+            created=Max("created_at"),
+            revised=Max("revised_at"),
+        )
+        etag = conditional.make_etag(
+            request.user.pk,
+            request.query_params.urlencode(),
+            version["count"],
+            version["created"],
+            version["revised"],
+        )
+        unchanged = conditional.not_modified(request, etag)
+        if unchanged is not None:
+            return unchanged
+        return conditional.tag(
+            await super().alist(request, *args, **kwargs), etag
+        )
+
+    async def perform_aupdate(self, serializer):
+        """
+        Saves an edited recommendation. The edit counts as a revision,
+        so that the ETag of the list changes.
+        """
+        await serializer.asave(revised_at=timezone.now())
+
+    @decorators.action(detail=True, methods=["get"])
+    async def versions(self, request: HttpRequest, pk=None):
+        """
+        Lists the earlier versions of a recommendation, newest first.
+        Recommendations are regenerated when their proposal is
+        significantly edited.
+        """
+        recommendation = await self.aget_object()
+        versions = [
+            version
+            async for version in recommendation.versions.order_by("-version")
+        ]
+        return response.Response(
+            await RecommendationVersionSerializer(versions, many=True).adata
+        )
+
+    @decorators.action(detail=False, methods=["get"], url_path="verdicts")
+    async def verdict_counts(self, request: HttpRequest):
+        """
+        Counts the recommendations the user can see per verdict.
+        Recommendations whose verdict could not be extracted are counted
+        under null.
+        """
+        counts = {
+            verdict: 0 for verdict in Recommendation.VerdictChoices.values
+        }
+        async for row in (
+            self.get_queryset()
+            .order_by()
+            .values("verdict")
+            .annotate(count=Count("pk"))
+        ):
+            counts[row["verdict"]] = row["count"]
+        return response.Response(counts)
+
+    @decorators.action(detail=False, methods=["get"], url_path="search")
+    async def search(self, request: HttpRequest):
+        """
+        Searches the recommendations the user can see for the `q` query
+        parameter, in web search syntax. Results are ranked, best first,
+        and paginated. Matches in the proposal title weigh more than
+        matches in the recommendation, which weigh more than matches in
+        the proposal body. The `verdict` filter applies.
+        """
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            raise exceptions.ValidationError({"q": "A query is required."})
+
+        paginator = SearchPagination()
+        page = await sync_to_async(paginator.paginate_queryset)(
+            search.search_recommendations(self.get_queryset(), query),
+            request,
+            view=self,
+        )
+        return paginator.get_paginated_response(
+            await RecommendationSearchResultSerializer(page, many=True).adata
+        )
+
+    def parse_timestamp(self, name: str):
+        """
+        Reads a query parameter holding an ISO 8601 date or datetime.
+        Dates are taken as midnight and naive datetimes as being in the
+        current timezone.
+
+        Returns:
+        -------
+        datetime or None
+            The timestamp, or None if the parameter is missing.
+
+        Raises:
+        -------
+        ValidationError
+            If the parameter is not a date or datetime.
+        """
+        value = self.request.query_params.get(name, "").strip()
+        if not value:
+            return None
+        try:
+            timestamp = dateparse.parse_datetime(value)
+            if timestamp is None:
+                date = dateparse.parse_date(value)
+                if date is not None:
+                    timestamp = datetime.datetime.combine(
+                        date, datetime.time()
+                    )
+        except ValueError:
+            timestamp = None
+        if timestamp is None:
+            raise exceptions.ValidationError(
+                {name: "Expected an ISO 8601 date or datetime."}
+            )
+        if timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp)
+        return timestamp
+
+    @decorators.action(
+        detail=False,
+        methods=["get"],
+        url_path=r"export/(?P<export_format>ndjson|csv)",
+    )
+    async def export(self, request: HttpRequest, export_format: str):
+        """
+        Streams the recommendations the user can see, or all of them for
+        superusers, as NDJSON or CSV, oldest first. The rows are read
+        through a server-side cursor, so exports use constant memory
+        however many rows they hold.
+
+        The `since` and `until` query parameters restrict the export to
+        recommendations created from a date or datetime included, until
+        one excluded. The `space` query parameter, repeated or comma
+        separated, restricts it to proposals of the given Snapshot
+        spaces. The `verdict` filter applies.
+        """
+        queryset = self.get_queryset()
+        since = self.parse_timestamp("since")
+        if since is not None:
+            queryset = queryset.filter(created_at__gte=since)
+        until = self.parse_timestamp("until")
+        if until is not None:
+            queryset = queryset.filter(created_at__lt=until)
+        spaces = {
+            space.strip()
+            for value in request.query_params.getlist("space")
+            for space in value.split(",")
+            if space.strip()
+        }
+        if spaces:
+            queryset = queryset.filter(snapshot_proposal__space_id__in=spaces)
+
+        streamed = StreamingHttpResponse(
+            export.SERIALIZERS[export_format](queryset),
+            content_type=export.CONTENT_TYPES[export_format],
+        )
+        streamed[
+            "Content-Disposition"
+        ] = f'attachment; filename="recommendations.{export_format}"'
+        return streamed
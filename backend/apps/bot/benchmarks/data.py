@@ -0,0 +1,280 @@
+import random
+import uuid
+
+from django.db import transaction
+
+from apps.bot.models import Proposal, Recommendation
+from apps.users.models import Account, Profile, SpaceSubscription
+from apps.users.models.profile import STATEMENT_FIELDS
+
+from .servers import BENCHMARK_SPACE_ID
+
+BENCHMARK_EMAIL_DOMAIN = "benchmark.diplomat.invalid"
+
+BIOS = (
+    "I care about decentralization and low fees.",
+    "I am a long-term holder who wants sustainable treasury management"
+    " and conservative spending.",
+    "Open source developer. I support grants for public goods and"
+    " developer tooling.",
+    "I prefer proposals that improve security, even at the cost of"
+    " slower upgrades.",
+    "Community organiser interested in governance participation,"
+    " transparency and fair token distribution.",
+)
+
+PROPOSAL_TOPICS = (
+    "Fund the public goods grants program",
+    "Reduce protocol fees on stable pairs",
+    "Migrate the treasury to a multisig with a timelock",
+    "Adopt the new delegate compensation framework",
+    "Deploy the protocol on a layer two network",
+    "Increase the security council to nine members",
+)
+
+PROPOSAL_PARAGRAPHS = (
+    "This proposal allocates funds from the community treasury to a"
+    " grants program for public goods tooling. Grants are reviewed by an"
+    " elected committee every quarter and paid out in three milestones.",
+    "The current fee switch sends all swap fees to liquidity providers."
+    " Turning it on would divert a sixth of the fees to the treasury,"
+    " which the authors estimate at two million dollars a year.",
+    "Signers would be required to confirm every transaction within a"
+    " forty-eight hour timelock, giving token holders time to react to"
+    " malicious or mistaken transfers.",
+    "## Motivation\n\nDelegates currently volunteer their time. Paying"
+    " active delegates a monthly stipend tied to their voting record is"
+    " expected to increase participation in governance.",
+    "## Risks\n\nBridging contracts have been the target of several"
+    " large exploits. The deployment would be audited twice and capped"
+    " at a total value locked of fifty million dollars for six months.",
+    "## Specification\n\n| Parameter | Current | Proposed |\n|---|---|---|"
+    "\n| Quorum | 4% | 3% |\n| Voting period | 5 days | 7 days |",
+)
+
+RECOMMENDATIONS = (
+    "True. The proposal is aligned with the user's interest in public"
+    " goods and decentralization, and its milestones limit the risk of"
+    " the treasury spending.",
+    "False. The user prefers conservative treasury management, and the"
+    " proposal commits a large share of the treasury without a clear"
+    " path to recovering the funds.",
+    "Not enough info. The proposal does not say how the committee is"
+    " elected. Would you support it if the committee were chosen by"
+    " token holders?",
+)
+
+
+def seed_profiles(count: int, batch_size: int = 5000) -> int:
+    """
+    Creates benchmark accounts, each with a profile and a bio, subscribed
+    to the `BENCHMARK_SPACE_ID` space.
+
+    Accounts are identified by their `BENCHMARK_EMAIL_DOMAIN` email
+    address so they can be removed with `remove_seeded`, and numbered
+    after any benchmark accounts that already exist. Profiles are
+    upserted, since a database with the Supabase triggers installed
+    creates an empty profile for every inserted account.
+
+    Parameters:
+    -----------
+    count : int
+        The number of accounts to create.
+    batch_size : int, optional
+        The number of rows inserted per query.
+
+    Returns:
+    --------
+    int:
+        The number of accounts created.
+    """
+    start = seeded_accounts().count()
+    for offset in range(start, start + count, batch_size):
+        with transaction.atomic():
+            accounts = []
+            for index in range(
+                offset, min(offset + batch_size, start + count)
+            ):
+                account_uuid = uuid.uuid4()
+                accounts.append(
+                    Account(
+                        uuid=account_uuid,
+                        email=f"user-{index}@{BENCHMARK_EMAIL_DOMAIN}",
+                        username=str(account_uuid),
+                        password="!",
+                        is_active=True,
+                    )
+                )
+            accounts = Account.objects.bulk_create(accounts)
+            profiles = [
+                Profile(
+                    account=account,
+                    first_name="Benchmark",
+                    last_name=f"User {index}",
+                    bio=random.choice(BIOS),
+                    large_language_model=(
+                        Profile.LargeLanguageModelChoices.GPT_4
+                    ),
+                )
+                for index, account in enumerate(accounts, start=offset)
+            ]
+            for profile in profiles:
+                profile.render_statements()
+            Profile.objects.bulk_create(
+                profiles,
+                update_conflicts=True,
+                unique_fields=["account"],
+                update_fields=[
+                    "first_name",
+                    "last_name",
+                    "bio",
+                    "large_language_model",
+                    *STATEMENT_FIELDS,
+                ],
+            )
+            SpaceSubscription.objects.bulk_create(
+                [
+                    SpaceSubscription(
+                        profile_id=pk, space_id=BENCHMARK_SPACE_ID
+                    )
+                    for pk in Profile.objects.filter(
+                        account__in=accounts
+                    ).values_list("pk", flat=True)
+                ],
+                ignore_conflicts=True,
+            )
+    return count
+
+
+def remove_seeded() -> int:
+    """
+    Deletes every benchmark account along with its profile and
+    recommendations, and the mirrored benchmark proposals.
+
+    Benchmark accounts have no Supabase user, so no Supabase deletion is
+    enqueued for them.
+
+    Returns:
+    --------
+    int:
+        The number of rows deleted.
+    """
+    deleted, _ = seeded_accounts().delete(sync_supabase=False)
+    proposals, _ = Proposal.objects.filter(
+        space_id=BENCHMARK_SPACE_ID
+    ).delete()
+    return deleted + proposals
+
+
+def seeded_accounts():
+    """Returns the queryset of benchmark accounts."""
+    return Account.objects.filter(email__endswith=f"@{BENCHMARK_EMAIL_DOMAIN}")
+
+
+def seed_staff_account() -> Account:
+    """
+    Returns the benchmark staff account, creating it if needed. Like a
+    superuser, it has no profile.
+    """
+    account_uuid = uuid.uuid4()
+    account, _ = Account.objects.get_or_create(
+        email=f"staff@{BENCHMARK_EMAIL_DOMAIN}",
+        defaults={
+            "uuid": account_uuid,
+            "username": str(account_uuid),
+            "password": "!",
+            "is_active": True,
+            "is_staff": True,
+            "is_superuser": True,
+        },
+    )
+    Profile.objects.filter(account=account).delete()
+    return account
+
+
+def synthetic_proposal(index: int) -> dict:
+    """
+    Builds the stored form of a proposal with a realistic size. Bodies
+    range from a short paragraph to roughly twelve kilobytes, like the
+    proposals of the larger Snapshot spaces.
+    """
+    generator = random.Random(index)
+    paragraphs = generator.randint(1, 40)
+    return {
+        "title": f"[SIP-{index}] {generator.choice(PROPOSAL_TOPICS)}",
+        "body": "\n\n".join(
+            generator.choice(PROPOSAL_PARAGRAPHS) for _ in range(paragraphs)
+        ),
+    }
+
+
+def seed_recommendations(
+    per_profile: int, proposals: int = 200, batch_size: int = 5000
+) -> int:
+    """
+    Creates recommendations for every benchmark profile.
+
+    The rows are bulk inserted, so the summary email receiver is not
+    triggered.
+
+    Parameters:
+    -----------
+    per_profile : int
+        The number of recommendations to create for each profile.
+    proposals : int, optional
+        The number of distinct proposals the recommendations are drawn
+        from.
+    batch_size : int, optional
+        The number of rows inserted per query.
+
+    Returns:
+    --------
+    int:
+        The number of recommendations created.
+    """
+    pool = [synthetic_proposal(index) for index in range(proposals)]
+    profile_ids = Profile.objects.filter(
+        account__in=seeded_accounts()
+    ).values_list("account_id", flat=True)
+
+    created = 0
+    batch = []
+    for profile_id in profile_ids.iterator():
+        for proposal in random.sample(pool, min(per_profile, len(pool))):
+            prompt_tokens = len(proposal["body"]) // 4 + 150
+            completion_tokens = random.randint(60, 400)
+            batch.append(
+                Recommendation(
+                    account_id=profile_id,
+                    profile_id=profile_id,
+                    proposal=proposal,
+                    recommendation=random.choice(RECOMMENDATIONS),
+                    usage={
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                )
+            )
+            if len(batch) == batch_size:
+                Recommendation.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+    if batch:
+        Recommendation.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def has_foreign_profiles() -> bool:
+    """
+    Returns True if the database contains profiles with a bio that do
+    not belong to benchmark accounts and would therefore take part in a
+    benchmark fan-out.
+    """
+    return (
+        Profile.objects.exclude(bio__isnull=True)
+        .exclude(bio__exact="")
+        .exclude(account__email__endswith=f"@{BENCHMARK_EMAIL_DOMAIN}")
+        .exists()
+    )
@@ -0,0 +1,460 @@
+import json
+import random
+import socketserver
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from graphql import build_schema, graphql_sync
+
+BENCHMARK_SPACE_ID = "bench.eth"
+
+SNAPSHOT_SCHEMA = build_schema(
+    """
+    scalar Any
+
+    type Strategy {
+        name: String
+        network: String
+        params: Any
+    }
+
+    type SpaceFilters {
+        minScore: Float
+        onlyMembers: Boolean
+    }
+
+    type Space {
+        id: String
+        name: String
+        about: String
+        network: String
+        symbol: String
+        strategies: [Strategy]
+        admins: [String]
+        moderators: [String]
+        members: [String]
+        filters: SpaceFilters
+        plugins: Any
+    }
+
+    type Proposal {
+        id: String
+        title: String
+        body: String
+        choices: [String]
+        start: Int
+        end: Int
+        snapshot: String
+        state: String
+        author: String
+        created: Int
+        scores: [Float]
+        scores_by_strategy: Any
+        scores_total: Float
+        scores_updated: Int
+        plugins: Any
+        network: String
+        strategies: [Strategy]
+        space: Space
+    }
+
+    input SpaceWhere {
+        id: String
+    }
+
+    enum OrderDirection {
+        asc
+        desc
+    }
+
+    input ProposalWhere {
+        created_gte: Int
+        space_in: [String]
+    }
+
+    type Query {
+        proposal(id: String): Proposal
+        proposals(
+            first: Int
+            skip: Int
+            where: ProposalWhere
+            orderBy: String
+            orderDirection: OrderDirection
+        ): [Proposal]
+        spaces(where: SpaceWhere): [Space]
+    }
+    """
+)
+
+PROPOSAL_BODY = (
+    "## Summary\n\nThis proposal allocates funds from the community"
+    " treasury to a grants program for public goods tooling. "
+    + "Grants are reviewed by an elected committee every quarter. " * 40
+)
+
+COMPLETION = (
+    "True. The proposal funds public goods tooling, which matches the"
+    " user's stated interest in decentralization and open source."
+)
+
+
+@dataclass
+class Behaviour:
+    """
+    Describes how a fake server responds.
+
+    Attributes:
+    -----------
+    latency : float
+        The mean number of seconds to wait before responding. The
+        actual delay is drawn uniformly from half to one and a half
+        times this value.
+    error_rate : float
+        The fraction of requests answered with a server error.
+    rate_limit_rate : float
+        The fraction of requests answered with a rate limit error.
+    stall_rate : float
+        The fraction of requests that stall before responding, as the
+        slowest calls of a real provider do.
+    stall_latency : float
+        The number of seconds stalled requests wait, on top of the
+        latency.
+    """
+
+    latency: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    stall_rate: float = 0.0
+    stall_latency: float = 0.0
+
+    def wait(self):
+        if self.latency:
+            time.sleep(random.uniform(self.latency / 2, self.latency * 1.5))
+        if self.stall_rate and random.random() < self.stall_rate:
+            time.sleep(self.stall_latency)
+
+    def outcome(self) -> str:
+        """Returns "error", "rate_limit" or "ok" for a new request."""
+        roll = random.random()
+        if roll < self.error_rate:
+            return "error"
+        if roll < self.error_rate + self.rate_limit_rate:
+            return "rate_limit"
+        return "ok"
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    """
+    Ignores clients that disconnect before their response is written,
+    such as the losing copy of a hedged completion.
+    """
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FakeServer:
+    """
+    Runs a socket server on an ephemeral local port in a daemon thread.
+
+    Attributes:
+    -----------
+    behaviour : Behaviour
+        How the server responds to requests.
+    requests : int
+        The number of requests received so far.
+
+    Methods:
+    --------
+    start() -> FakeServer:
+        Binds the server and starts serving in the background.
+    stop():
+        Shuts the server down.
+    """
+
+    server_class = _QuietHTTPServer
+
+    def __init__(self, behaviour: Behaviour):
+        self.behaviour = behaviour
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def handler_class(self):
+        raise NotImplementedError
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self):
+        self._server = self.server_class(
+            ("127.0.0.1", 0), self.handler_class()
+        )
+        self._server.daemon_threads = True
+        threading.Thread(
+            target=self._server.serve_forever, daemon=True
+        ).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    fake: FakeServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def write_json(self, status: int, payload: dict):
+        content = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def respond(self, payload: dict):
+        """Writes the payload or an error chosen by the behaviour."""
+        self.fake.count()
+        behaviour = self.fake.behaviour
+        behaviour.wait()
+        match behaviour.outcome():
+            case "error":
+                self.write_json(
+                    500, {"error": {"message": "Fake server error"}}
+                )
+            case "rate_limit":
+                self.write_json(
+                    429,
+                    {
+                        "error": {
+                            "message": "Rate limit reached",
+                            "type": "requests",
+                        }
+                    },
+                )
+            case _:
+                self.write_json(200, payload)
+
+
+class FakeSnapshotServer(FakeServer):
+    """
+    A stand-in for the Snapshot GraphQL API.
+
+    Queries, including schema introspection, are executed against a
+    subset of the Snapshot schema. Every proposal belongs to the same
+    space and has a body of a few kilobytes. The `proposals` query
+    lists `listed_proposals` proposals, created one minute apart and
+    ending with one created now.
+    """
+
+    def __init__(self, behaviour: Behaviour, listed_proposals: int = 0):
+        super().__init__(behaviour)
+        self.listed_proposals = listed_proposals
+        self.started_at = int(time.time())
+
+    @staticmethod
+    def proposal(id: str, created: int) -> dict:
+        return {
+            "id": id,
+            "title": f"Fund the public goods grants program ({id})",
+            "body": PROPOSAL_BODY,
+            "choices": ["For", "Against", "Abstain"],
+            "start": created,
+            "end": created + 7 * 24 * 60 * 60,
+            "snapshot": "18000000",
+            "state": "active",
+            "author": "0x0000000000000000000000000000000000000000",
+            "created": created,
+            "network": "1",
+            "space": {
+                "id": BENCHMARK_SPACE_ID,
+                "name": "Benchmark DAO",
+            },
+        }
+
+    def handler_class(self):
+        fake = self
+
+        class Root:
+            def proposal(self, info, id):
+                return fake.proposal(id, int(time.time()))
+
+            def proposals(self, info, first=20, skip=0, where=None, **kwargs):
+                where = where or {}
+                listed = [
+                    fake.proposal(
+                        f"0xlisted{index}",
+                        fake.started_at - 60 * (fake.listed_proposals - index),
+                    )
+                    for index in range(1, fake.listed_proposals + 1)
+                ]
+                if "space_in" in where:
+                    listed = [
+                        proposal
+                        for proposal in listed
+                        if proposal["space"]["id"] in where["space_in"]
+                    ]
+                listed = [
+                    proposal
+                    for proposal in listed
+                    if proposal["created"] >= where.get("created_gte", 0)
+                ]
+                return listed[skip : skip + first]
+
+            def spaces(self, info, where=None):
+                return [
+                    {
+                        "id": (where or {}).get("id", BENCHMARK_SPACE_ID),
+                        "name": "Benchmark DAO",
+                        "about": "A DAO that funds open source tooling.",
+                        "network": "1",
+                        "symbol": "BENCH",
+                    }
+                ]
+
+        class Handler(_JSONHandler):
+            def do_POST(self):
+                request = self.read_json()
+                result = graphql_sync(
+                    SNAPSHOT_SCHEMA,
+                    request["query"],
+                    root_value=Root(),
+                    variable_values=request.get("variables"),
+                )
+                self.respond(
+                    {
+                        "data": result.data,
+                        **(
+                            {"errors": [e.formatted for e in result.errors]}
+                            if result.errors
+                            else {}
+                        ),
+                    }
+                )
+
+        Handler.fake = self
+        return Handler
+
+
+class FakeOpenAIServer(FakeServer):
+    """
+    A stand-in for the OpenAI chat completions API.
+
+    Every completion returns the same short recommendation, as a call
+    to the requested function if any, and reports a token usage
+    proportional to the size of the prompt.
+    """
+
+    def handler_class(self):
+        class Handler(_JSONHandler):
+            def do_POST(self):
+                request = self.read_json()
+                prompt_tokens = sum(
+                    len(message["content"]) // 4
+                    for message in request.get("messages", [])
+                )
+                completion_tokens = len(COMPLETION) // 4
+                message = {"role": "assistant", "content": COMPLETION}
+                if request.get("functions"):
+                    verdict, _, reasoning = COMPLETION.partition(". ")
+                    message = {
+                        "role": "assistant",
+                        "content": None,
+                        "function_call": {
+                            "name": request["functions"][0]["name"],
+                            "arguments": json.dumps(
+                                {
+                                    "verdict": verdict.lower(),
+                                    "reasoning": reasoning,
+                                }
+                            ),
+                        },
+                    }
+                self.respond(
+                    {
+                        "id": "chatcmpl-benchmark",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": request.get("model", "gpt-4"),
+                        "choices": [
+                            {
+                                "index": 0,
+                                "message": message,
+                                "finish_reason": "stop",
+                            }
+                        ],
+                        "usage": {
+                            "prompt_tokens": prompt_tokens,
+                            "completion_tokens": completion_tokens,
+                            "total_tokens": prompt_tokens + completion_tokens,
+                        },
+                    }
+                )
+
+        Handler.fake = self
+        return Handler
+
+
+class FakeSMTPServer(FakeServer):
+    """
+    A stand-in for an SMTP relay without TLS or authentication.
+
+    Messages are accepted and discarded. Errors are reported as a
+    temporary failure (451) and rate limits as a closing channel (421)
+    once the message data has been received.
+    """
+
+    class server_class(socketserver.ThreadingTCPServer):
+        allow_reuse_address = True
+
+    def handler_class(self):
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line: str):
+                self.wfile.write(f"{line}\r\n".encode())
+
+            def handle(self):
+                self.reply("220 localhost fake ESMTP")
+                while line := self.rfile.readline():
+                    command = line.decode(errors="replace").strip().upper()
+                    if command.startswith("EHLO"):
+                        self.reply("250-localhost")
+                        self.reply("250 8BITMIME")
+                    elif command.startswith("DATA"):
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        while self.rfile.readline() not in (b".\r\n", b""):
+                            pass
+                        fake.count()
+                        fake.behaviour.wait()
+                        match fake.behaviour.outcome():
+                            case "error":
+                                self.reply("451 Temporary failure")
+                            case "rate_limit":
+                                self.reply("421 Too many messages")
+                                return
+                            case _:
+                                self.reply("250 OK")
+                    elif command.startswith("QUIT"):
+                        self.reply("221 Bye")
+                        return
+                    else:
+                        self.reply("250 OK")
+
+        return Handler
@@ -0,0 +1,52 @@
+import resource
+import statistics
+from contextlib import contextmanager
+
+from django.db import connections
+
+
+def percentile(values: list, percent: int) -> float:
+    """
+    Returns the given percentile (1 to 99) of the values, or 0.0 if
+    there are none.
+    """
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+def peak_rss_mb() -> float:
+    """Returns the peak resident set size of this process in megabytes."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class QueryCounter:
+    """
+    Counts the SQL queries executed on a database connection.
+
+    Unlike `django.test.utils.CaptureQueriesContext`, the queries are
+    not kept in memory, so it can observe long benchmark runs.
+
+    Attributes:
+    -----------
+    count : int
+        The number of queries executed while counting.
+
+    Methods:
+    --------
+    counting(using: str = "default"):
+        A context manager that counts the queries executed within it on
+        the calling thread.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def counting(self, using: str = "default"):
+        with connections[using].execute_wrapper(self):
+            yield self
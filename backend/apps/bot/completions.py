@@ -1,20 +1,38 @@
+import functools
+import json
+import re
+import time
 from pathlib import Path
+from typing import Optional
 
 from django.conf import settings
-from django.core.exceptions import ImproperlyConfigured
-import openai
 
-from .snapshot import query_snapshot_space
+from . import hedging, verdicts
+from .metrics import MODEL_ROUTES, record_usage, track_stage
+from .snapshot import aquery_snapshot_space, query_snapshot_space
 
 from apps.users.models import Profile
+from core.clients import get_openai
+from core.tokens import count_tokens
 
-try:
-    openai.api_key = settings.LARGE_LANGUAGE_MODEL_PROVIDERS["openai"]["key"]
-except (KeyError, AttributeError):
-    raise ImproperlyConfigured(
-        "Either the `LARGE_LANGUAGE_MODEL_PROVIDERS` setting is missing or it"
-        " is improperly configured"
-    )
+# Markers of technical content in a proposal: code, contract addresses,
+# links and figures.
+TECHNICAL_PATTERN = re.compile(
+    r"```|0x[0-9a-fA-F]{6,}|https?://\S+|(?<![\w.])\d[\d,.]*%?(?!\w)"
+)
+
+# Proposals of this many tokens, or with this many technical markers
+# per word, are as complex as proposals get. The density of proposals
+# shorter than `MIN_DENSITY_WORDS` is taken over that many words, so
+# that a single figure does not make a one-liner complex.
+COMPLEX_PROPOSAL_TOKENS = 2000
+COMPLEX_MARKER_DENSITY = 0.1
+MIN_DENSITY_WORDS = 100
+
+# The number of proposal texts and system prompts whose complexity and
+# token count are kept. Every profile of a fan-out shares them, so only
+# the proposals being fanned out at once need to fit.
+PROMPT_CACHE_SIZE = 64
 
 
 class CompletionRequest:
@@ -26,32 +44,63 @@ class CompletionRequest:
     ----------
     large_language_model : Profile.LargeLanguageModelChoices
         The large language model choice associated with the request.
+    anonymous : bool
+        Leaves the user's name out of the personal statement, so that
+        the completion can be shared with users who have a similar bio.
 
     Methods
     -------
     about_statement() -> str
         Returns a statement about the organization.
+    aabout_statement() -> str
+        Asynchronous version of `about_statement`.
     proposal_statement() -> str
         Returns the proposal title and body.
     personal_statement() -> str
         Returns a statement with the user's personal information.
+    personal_statement_tokens() -> int
+        Returns the number of tokens of the personal statement.
+    proposal() -> dict
+        Returns the proposal the completion is requested for.
     """
 
     large_language_model: Profile.LargeLanguageModelChoices
-
-    def __init__(self, profile: Profile, proposal: dict):
+    anonymous: bool
+
+    def __init__(
+        self, profile: Profile, proposal: dict, anonymous: bool = False
+    ):
+        # Profiles inserted by the account trigger, or updated without
+        # `save()`, have no statements until they are rendered.
+        if profile.statement_hash is None:
+            profile.render_statements()
         self._profile = profile
         self._proposal = proposal
         self.large_language_model = profile.large_language_model
+        self.anonymous = anonymous
 
     @property
     def about_statement(self) -> str:
         space = query_snapshot_space(self._proposal["space"]["id"])["spaces"][0]
+        return self._about(space)
+
+    async def aabout_statement(self) -> str:
+        space = (await aquery_snapshot_space(self._proposal["space"]["id"]))[
+            "spaces"
+        ][0]
+        return self._about(space)
+
+    @staticmethod
+    def _about(space: dict) -> str:
         space_about = space["about"]
         if space_about:
             return f"The point of the organization is {space_about}"
         return ""
 
+    @property
+    def proposal(self) -> dict:
+        return self._proposal
+
     @property
     def proposal_statement(self) -> str:
         title = self._proposal["title"]
@@ -60,14 +109,15 @@ class CompletionRequest:
 
     @property
     def personal_statement(self) -> str:
-        statement = ""
-        if self._profile.first_name:
-            statement += f"The user's name is {self._profile.first_name} "
-        if self._profile.last_name:
-            statement += f"{self._profile.last_name}. "
-        if self._profile.bio:
-            statement += f"Here is their bio: {self._profile.bio}"
-        return statement
+        if self.anonymous:
+            return self._profile.anonymous_statement
+        return self._profile.personal_statement
+
+    @property
+    def personal_statement_tokens(self) -> int:
+        if self.anonymous:
+            return self._profile.anonymous_statement_tokens
+        return self._profile.personal_statement_tokens
 
 
 class CompletionResponse:
@@ -85,6 +135,9 @@ class CompletionResponse:
         The completion result.
     usage : Usage
         The usage details of the completion.
+    verdict : str or None
+        The verdict of the completion, one of the verdicts of
+        `apps.bot.verdicts`, or None if it could not be extracted.
 
     Classes
     -------
@@ -120,12 +173,14 @@ class CompletionResponse:
     created: int
     completion: str
     usage: Usage
+    verdict: Optional[str]
 
-    def __init__(self, model, created, completion, usage):
+    def __init__(self, model, created, completion, usage, verdict=None):
         self.model = model
         self.created = created
         self.completion = completion
         self.usage = usage
+        self.verdict = verdict
 
 
 def openai_provider_completion(completion_request: CompletionRequest):
@@ -142,43 +197,267 @@ def openai_provider_completion(completion_request: CompletionRequest):
     CompletionResponse
         The response object containing the completion result.
     """
+    messages = openai_provider_messages(
+        completion_request, completion_request.about_statement
+    )
+    model = route_model(
+        completion_request, count_prompt_tokens(completion_request, messages)
+    )
+
+    with track_stage("completion"):
+        completion = get_openai().ChatCompletion.create(
+            model=model,
+            messages=messages,
+            functions=[openai_provider_function()],
+            function_call={"name": "recommend"},
+            request_timeout=settings.HEDGING["DEADLINE"],
+        )
+
+    return openai_provider_response(completion)
+
+
+async def aopenai_provider_completion(completion_request: CompletionRequest):
+    """
+    Asynchronous version of `openai_provider_completion`. The
+    organization's description and the completion are requested without
+    blocking the event loop, and slow completions are hedged (see
+    `apps.bot.hedging`).
+    """
+    messages = openai_provider_messages(
+        completion_request, await completion_request.aabout_statement()
+    )
+    prompt_tokens = count_prompt_tokens(completion_request, messages)
+    model = route_model(completion_request, prompt_tokens)
+
+    with track_stage("completion"):
+        completion = await hedging.ahedged(
+            f"openai:{model}",
+            lambda: get_openai().ChatCompletion.acreate(
+                model=model,
+                messages=messages,
+                functions=[openai_provider_function()],
+                function_call={"name": "recommend"},
+                request_timeout=settings.HEDGING["DEADLINE"],
+            ),
+            prompt_tokens,
+        )
+
+    return openai_provider_response(completion)
+
+
+def openai_provider_messages(
+    completion_request: CompletionRequest, about_statement: str
+) -> list:
+    """
+    Builds the chat messages sent to the OpenAI provider.
+
+    Parameters
+    ----------
+    completion_request : CompletionRequest
+        The request object containing details for generating a completion.
+    about_statement : str
+        The statement about the organization.
+
+    Returns
+    -------
+    list
+        The system prompt and the user's personal statement.
+    """
+    with track_stage("prompt_assembly"):
+        with open(
+            Path(__file__).parent
+            / "text_templates"
+            / "prompts"
+            / "openai_provider_prompt.txt",
+            "r",
+        ) as prompt_file:
+            prompt = prompt_file.read().format(
+                about_statement=about_statement,
+                proposal_statement=completion_request.proposal_statement,
+            )
+            return [
+                {
+                    "role": "system",
+                    "content": prompt,
+                },
+                {
+                    "role": "user",
+                    "content": completion_request.personal_statement,
+                },
+            ]
+
+
+def proposal_complexity(proposal: dict) -> float:
+    """
+    Estimates how hard a proposal is to judge, from its length and its
+    density of technical content (see `TECHNICAL_PATTERN`).
+
+    Parameters
+    ----------
+    proposal : dict
+        The proposal as returned by `query_snapshot_proposal`.
+
+    Returns
+    -------
+    float
+        The complexity, from 0 for a short plain proposal to 1 for one
+        of `COMPLEX_PROPOSAL_TOKENS` or more, or as dense in technical
+        content as `COMPLEX_MARKER_DENSITY`.
+    """
+    return text_complexity(f"{proposal['title']}\n\n{proposal['body']}")
+
+
+@functools.lru_cache(maxsize=PROMPT_CACHE_SIZE)
+def text_complexity(text: str) -> float:
+    """
+    Estimates the complexity of the text of a proposal. See
+    `proposal_complexity`. The text is the same for every profile of a
+    fan-out, so it is tokenized and scanned once.
+    """
+    length = count_tokens(text, Profile.LargeLanguageModelChoices.GPT_4)
+    density = len(TECHNICAL_PATTERN.findall(text)) / max(
+        len(text.split()), MIN_DENSITY_WORDS
+    )
+    return min(
+        1.0,
+        max(
+            length / COMPLEX_PROPOSAL_TOKENS,
+            density / COMPLEX_MARKER_DENSITY,
+        ),
+    )
+
+
+def count_prompt_tokens(
+    completion_request: CompletionRequest, messages: list
+) -> int:
+    """
+    Counts the tokens of the chat messages of a completion, as built by
+    `openai_provider_messages`, for the model of the profile. Only the
+    personal statement differs between the profiles of a fan-out, and
+    its tokens are stored on the profile.
+    """
+    return (
+        count_system_tokens(
+            messages[0]["content"], completion_request.large_language_model
+        )
+        + completion_request.personal_statement_tokens
+    )
+
+
+@functools.lru_cache(maxsize=PROMPT_CACHE_SIZE)
+def count_system_tokens(prompt: str, model: str) -> int:
+    """
+    Counts the tokens of a system prompt for a model, once for all the
+    profiles of a fan-out.
+    """
+    return count_tokens(prompt, model)
+
+
+def route_model(
+    completion_request: CompletionRequest, prompt_tokens: int
+) -> str:
+    """
+    Chooses the model a completion is requested from, following the
+    routes of the model of the profile in `MODEL_ROUTING["ROUTES"]`.
+
+    Parameters
+    ----------
+    completion_request : CompletionRequest
+        The request object containing details for generating a completion.
+    prompt_tokens : int
+        The number of tokens of the prompt, as counted by
+        `count_prompt_tokens`.
+
+    Returns
+    -------
+    str
+        The model of the first route whose limits the completion is
+        within, or the model of the profile if there is none or routing
+        is disabled.
+    """
+    requested = completion_request.large_language_model
+    chosen = requested
+    routes = settings.MODEL_ROUTING["ROUTES"].get(requested, [])
+    if settings.MODEL_ROUTING["ENABLED"] and routes:
+        proposal = completion_request.proposal
+        complexity = proposal_complexity(proposal)
+        seconds_left = (
+            proposal["end"] - time.time() if proposal.get("end") else None
+        )
+        for route in routes:
+            if (
+                prompt_tokens <= route.get("max_prompt_tokens", prompt_tokens)
+                and complexity <= route.get("max_complexity", complexity)
+                and (
+                    "max_seconds_left" not in route
+                    or seconds_left is not None
+                    and seconds_left <= route["max_seconds_left"]
+                )
+            ):
+                chosen = route["model"]
+                break
+    MODEL_ROUTES.labels(requested, chosen).inc()
+    return chosen
+
+
+@functools.cache
+def openai_provider_function() -> dict:
+    """
+    Returns the definition of the `recommend` function the OpenAI
+    provider is made to call, so that the verdict is returned as a
+    structured argument rather than in free text.
+    """
     with open(
         Path(__file__).parent
         / "text_templates"
         / "prompts"
-        / "openai_provider_prompt.txt",
+        / "openai_provider_function.json",
         "r",
-    ) as prompt_file:
-        prompt = prompt_file.read().format(
-            about_statement=completion_request.about_statement,
-            proposal_statement=completion_request.proposal_statement,
-        )
-        messages = [
-            {
-                "role": "system",
-                "content": prompt,
-            },
-            {
-                "role": "user",
-                "content": completion_request.personal_statement,
-            },
-        ]
-
-    completion = openai.ChatCompletion.create(
-        model=completion_request.large_language_model,
-        messages=messages,
-    )
+    ) as function_file:
+        return json.load(function_file)
+
 
-    return CompletionResponse(
+def openai_provider_response(completion: dict) -> CompletionResponse:
+    """
+    Converts an OpenAI chat completion into a `CompletionResponse` and
+    records its token usage.
+
+    The verdict and reasoning are read from the call to the `recommend`
+    function. If the model answered in free text instead, or with
+    malformed arguments, the text is kept and the verdict is parsed
+    from its leading words.
+    """
+    message = completion["choices"][0]["message"]
+    text, verdict = message.get("content") or "", None
+    function_call = message.get("function_call")
+    if function_call is not None:
+        try:
+            verdict, text = verdicts.parse_function_call(
+                function_call["arguments"]
+            )
+        except (KeyError, ValueError):
+            text = function_call.get("arguments") or text
+    if verdict is None:
+        verdict = verdicts.parse_text(text)
+
+    completion_response = CompletionResponse(
         model=completion["model"],
         created=completion["created"],
-        completion=completion["choices"][0]["message"]["content"],
+        completion=text,
+        verdict=verdict,
         usage=CompletionResponse.Usage(
             prompt_tokens=completion["usage"]["prompt_tokens"],
             completion_tokens=completion["usage"]["completion_tokens"],
             total_tokens=completion["usage"]["total_tokens"],
         ),
     )
+    record_usage(completion_response.model, completion_response.usage)
+    hedging.budget.record(
+        completion_response.usage.prompt_tokens,
+        completion_response.usage.completion_tokens,
+    )
+
+    return completion_response
 
 
 def meta_provider_completion(completion_request: CompletionRequest):
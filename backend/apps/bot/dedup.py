@@ -0,0 +1,225 @@
+import hashlib
+import re
+from collections import defaultdict
+
+import numpy as np
+
+from apps.users.models import Profile
+from apps.users.models.profile import (
+    STATEMENT_FIELDS,
+    STATEMENT_SOURCE_FIELDS,
+)
+
+from .metrics import track_stage
+
+# The number of MinHash permutations, split into LSH bands of
+# ROWS_PER_BAND rows. With 8 bands of 8 rows, two statements with a
+# Jaccard similarity of 0.8 share a band with a probability of about
+# 0.9, while statements below 0.5 almost never do.
+NUM_PERMUTATIONS = 64
+ROWS_PER_BAND = 8
+
+# The minimum estimated Jaccard similarity between the shingles of two
+# statements for them to share a completion.
+MIN_SIMILARITY = 0.8
+
+# The number of consecutive words in a shingle.
+SHINGLE_SIZE = 3
+
+# The number of profiles loaded per query while building the clusters.
+BATCH_SIZE = 5000
+
+# The Mersenne prime the permutations are computed modulo. Shingle
+# hashes are reduced below it, since hashes that differ by a multiple
+# of it would collide in every permutation. Products of a hash and a
+# coefficient, both below it, fit in an unsigned 64-bit integer.
+_PRIME = np.uint64((1 << 31) - 1)
+_generator = np.random.default_rng(seed=20230801)
+_A = _generator.integers(1, _PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+_B = _generator.integers(0, _PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def shingles(statement: str) -> np.ndarray:
+    """
+    Returns the hashes of the word shingles of a statement.
+
+    Parameters:
+    -----------
+    statement : str
+        The personal statement.
+
+    Returns:
+    --------
+    numpy.ndarray:
+        The hashes, below `_PRIME`, of every distinct run of
+        `SHINGLE_SIZE` words, or of the whole statement if it is
+        shorter.
+    """
+    words = re.findall(r"[a-z0-9]+", statement.lower())
+    grams = {
+        " ".join(words[index : index + SHINGLE_SIZE])
+        for index in range(max(len(words) - SHINGLE_SIZE + 1, 1))
+    }
+    hashes = np.fromiter(
+        (
+            int.from_bytes(
+                hashlib.blake2b(gram.encode(), digest_size=4).digest(),
+                "little",
+            )
+            for gram in grams
+        ),
+        dtype=np.uint64,
+        count=len(grams),
+    )
+    return hashes % _PRIME
+
+
+def signature(statement: str) -> np.ndarray:
+    """
+    Returns the MinHash signature of a statement, computed for all
+    permutations at once.
+    """
+    hashes = shingles(statement)
+    return ((np.outer(hashes, _A) + _B) % _PRIME).min(axis=0)
+
+
+def cluster_statements(statements: list) -> list:
+    """
+    Groups near-duplicate statements.
+
+    Statements are taken in order. Each one joins the cluster of the
+    first earlier representative it shares an LSH band with and whose
+    signature agrees with its own on at least `MIN_SIMILARITY` of the
+    permutations, or else becomes the representative of a new cluster.
+    Every member is thus compared with the representative itself, so
+    clusters do not grow by chains of statements that are each similar
+    to the previous one only.
+
+    Parameters:
+    -----------
+    statements : list
+        The statements to group.
+
+    Returns:
+    --------
+    list:
+        The clusters as lists of indices into `statements`. Every
+        statement belongs to exactly one cluster, whose first member is
+        its representative, and clusters keep the order of their first
+        statement.
+    """
+    if not statements:
+        return []
+    signatures = np.vstack([signature(statement) for statement in statements])
+
+    # The representatives indexed by each band of their signature.
+    buckets = [
+        defaultdict(list) for _ in range(0, NUM_PERMUTATIONS, ROWS_PER_BAND)
+    ]
+    clusters = {}
+    for index, rows in enumerate(signatures):
+        keys = [
+            rows[band : band + ROWS_PER_BAND].tobytes()
+            for band in range(0, NUM_PERMUTATIONS, ROWS_PER_BAND)
+        ]
+        candidates = sorted(
+            {
+                representative
+                for bucket, key in zip(buckets, keys)
+                for representative in bucket.get(key, ())
+            }
+        )
+        for representative in candidates:
+            agreement = np.mean(signatures[representative] == rows)
+            if agreement >= MIN_SIMILARITY:
+                clusters[representative].append(index)
+                break
+        else:
+            clusters[index] = [index]
+            for bucket, key in zip(buckets, keys):
+                bucket[key].append(index)
+
+    return list(clusters.values())
+
+
+def cluster_profiles(profile_ids: list, proposal: dict) -> list:
+    """
+    Groups the profiles whose personal statements are near-duplicates,
+    so that each group shares a single completion.
+
+    Statements are the anonymous statements stored on the profiles,
+    which leave out the user's name. Profiles with the same statement
+    hash are grouped without comparing their statements, so that each
+    distinct statement is signed once. Profiles are only grouped with
+    profiles that use the same language model. The statements of the
+    profiles that were never rendered, such as those inserted by the
+    account trigger, are rendered and stored first.
+
+    Parameters:
+    -----------
+    profile_ids : list
+        The primary keys of the profiles to group.
+    proposal : dict
+        The proposal the completions are generated for.
+
+    Returns:
+    --------
+    list:
+        The clusters as lists of primary keys, in the order of their
+        first profile in `profile_ids`.
+    """
+    with track_stage("clustering"):
+        by_model = defaultdict(dict)
+        for offset in range(0, len(profile_ids), BATCH_SIZE):
+            profiles = list(
+                Profile.objects.filter(
+                    pk__in=profile_ids[offset : offset + BATCH_SIZE]
+                ).only(
+                    "anonymous_statement",
+                    "statement_hash",
+                    "large_language_model",
+                )
+            )
+            unrendered = {
+                profile.pk: profile
+                for profile in profiles
+                if profile.statement_hash is None
+            }
+            if unrendered:
+                rendered = list(
+                    Profile.objects.filter(pk__in=unrendered).only(
+                        *STATEMENT_SOURCE_FIELDS
+                    )
+                )
+                for profile in rendered:
+                    profile.render_statements()
+                    for name in STATEMENT_FIELDS:
+                        setattr(
+                            unrendered[profile.pk],
+                            name,
+                            getattr(profile, name),
+                        )
+                Profile.objects.bulk_update(rendered, STATEMENT_FIELDS)
+
+            for profile in profiles:
+                statements = by_model[profile.large_language_model]
+                key = profile.statement_hash
+                if key not in statements:
+                    statements[key] = (profile.anonymous_statement, [])
+                statements[key][1].append(profile.pk)
+
+        clusters = []
+        for statements in by_model.values():
+            members = list(statements.values())
+            clusters.extend(
+                [pk for index in cluster for pk in members[index][1]]
+                for cluster in cluster_statements(
+                    [statement for statement, _ in members]
+                )
+            )
+
+    order = {pk: index for index, pk in enumerate(profile_ids)}
+    clusters.sort(key=lambda cluster: min(order[pk] for pk in cluster))
+    for cluster in clusters:
+        cluster.sort(key=order.__getitem__)
+    return clusters
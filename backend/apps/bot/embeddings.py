@@ -0,0 +1,307 @@
+import functools
+import hashlib
+import math
+import re
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+from apps.users.models import Profile
+from core.clients import get_openai
+
+from .metrics import PROFILES_FILTERED, track_stage
+from .models import Proposal
+
+try:
+    EMBEDDINGS = settings.EMBEDDINGS
+    MIN_SIMILARITY = float(EMBEDDINGS["MIN_SIMILARITY"])
+except (KeyError, AttributeError, ValueError):
+    raise ImproperlyConfigured(
+        "Either the `EMBEDDINGS` setting is missing or it is improperly"
+        " configured"
+    )
+
+# The number of profiles whose embeddings are compared at once.
+BATCH_SIZE = 5000
+
+STOP_WORDS = frozenset(
+    """
+    a about above after again all also am an and any are as at be been
+    being but by can could did do does doing for from further had has
+    have having he her here hers him his how i if in into is it its
+    itself just me more most my no nor not of off on once only or other
+    our ours out over own same she should so some such than that the
+    their theirs them then there these they this those through to too
+    under until up very was we were what when where which while who whom
+    why will with would you your yours
+    """.split()
+)
+
+
+class Embedder:
+    """
+    The interface of the text embedders.
+
+    Attributes:
+    -----------
+    name : str
+        Identifies the embedder and its configuration. Embeddings made
+        by embedders with different names are never compared.
+
+    Methods:
+    --------
+    embed(texts: list) -> numpy.ndarray:
+        Returns one L2-normalised float32 row per text.
+    """
+
+    name: str
+
+    def embed(self, texts: list) -> np.ndarray:
+        raise NotImplementedError
+
+
+class HashingEmbedder(Embedder):
+    """
+    Embeds texts locally with the hashing trick.
+
+    Words are lowercased, stop words are dropped and each remaining word
+    is hashed into one of `dimensions` buckets with a random sign. Term
+    counts are dampened logarithmically, so the embedding behaves like a
+    TF-IDF vector without the need for a fitted vocabulary. It needs no
+    network access and is deterministic across processes.
+
+    Parameters:
+    -----------
+    dimensions : int, optional
+        The size of the embeddings.
+    """
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def _bucket(self, word: str) -> tuple:
+        digest = int.from_bytes(
+            hashlib.blake2b(word.encode(), digest_size=8).digest(), "little"
+        )
+        return digest % self.dimensions, 1.0 if digest >> 63 else -1.0
+
+    def embed(self, texts: list) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = Counter(
+                word
+                for word in re.findall(r"[a-z0-9]+", text.lower())
+                if word not in STOP_WORDS and len(word) > 1
+            )
+            for word, count in words.items():
+                column, sign = self._bucket(word)
+                vectors[row, column] += sign * (1.0 + math.log(count))
+        return normalize(vectors)
+
+
+class OpenAIEmbedder(Embedder):
+    """
+    Embeds texts with the OpenAI embeddings API.
+
+    Parameters:
+    -----------
+    model : str, optional
+        The OpenAI embedding model.
+    batch_size : int, optional
+        The number of texts sent per request.
+    """
+
+    def __init__(
+        self, model: str = "text-embedding-ada-002", batch_size: int = 100
+    ):
+        self.model = model
+        self.batch_size = batch_size
+        self.name = f"openai-{model}"
+
+    def embed(self, texts: list) -> np.ndarray:
+        rows = []
+        for offset in range(0, len(texts), self.batch_size):
+            response = get_openai().Embedding.create(
+                model=self.model,
+                input=texts[offset : offset + self.batch_size],
+            )
+            rows.extend(
+                item["embedding"]
+                for item in sorted(response["data"], key=lambda x: x["index"])
+            )
+        return normalize(np.asarray(rows, dtype=np.float32))
+
+
+@functools.cache
+def get_embedder() -> Embedder:
+    """
+    Returns the embedder configured by `EMBEDDINGS["BACKEND"]` and
+    `EMBEDDINGS["OPTIONS"]`.
+    """
+    return import_string(EMBEDDINGS["BACKEND"])(
+        **EMBEDDINGS.get("OPTIONS", {})
+    )
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scales every row to unit length, leaving zero rows untouched."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(
+        vectors, norms, out=np.zeros_like(vectors), where=norms > 0
+    )
+
+
+def to_bytes(vector: np.ndarray) -> bytes:
+    """Serializes an embedding as little-endian float32."""
+    return vector.astype("<f4").tobytes()
+
+
+def from_bytes(data: bytes) -> np.ndarray:
+    """Deserializes an embedding serialized by `to_bytes`."""
+    return np.frombuffer(data, dtype="<f4")
+
+
+def embedding_key(embedder: Embedder, text: str) -> str:
+    """
+    Returns the digest identifying the embedding of a text by an
+    embedder, used to detect stale embeddings.
+    """
+    return hashlib.sha256(f"{embedder.name}\0{text}".encode()).hexdigest()
+
+
+def proposal_embedding(proposal: dict) -> np.ndarray:
+    """
+    Returns the embedding of a proposal's title and body.
+
+    The embedding is stored on the mirrored proposal, so a proposal is
+    only embedded again if its text or the embedder changes.
+
+    Parameters:
+    -----------
+    proposal : dict
+        The proposal as returned by `query_snapshot_proposal`.
+
+    Returns:
+    --------
+    numpy.ndarray:
+        The normalised embedding of the proposal.
+    """
+    embedder = get_embedder()
+    text = f"{proposal['title']}\n\n{proposal['body']}"
+    key = embedding_key(embedder, text)
+
+    stored = (
+        Proposal.objects.filter(pk=proposal["id"])
+        .values_list("embedding", "embedding_key")
+        .first()
+    )
+    if stored is not None and stored[1] == key:
+        return from_bytes(stored[0])
+
+    vector = embedder.embed([text])[0]
+    Proposal.objects.filter(pk=proposal["id"]).update(
+        embedding=to_bytes(vector), embedding_key=key
+    )
+    return vector
+
+
+def profile_embeddings(profile_ids: list) -> tuple:
+    """
+    Returns the bio embeddings of profiles as a single matrix.
+
+    Bios that were never embedded or changed since they were last
+    embedded are embedded together and stored on their profile.
+
+    Parameters:
+    -----------
+    profile_ids : list
+        The primary keys of profiles with a bio.
+
+    Returns:
+    --------
+    tuple:
+        The primary keys of the profiles and a float32 matrix with the
+        embedding of each profile in the same order.
+    """
+    embedder = get_embedder()
+    rows = list(
+        Profile.objects.filter(pk__in=profile_ids).values_list(
+            "pk", "bio", "bio_embedding", "bio_embedding_key"
+        )
+    )
+
+    stale = []
+    vectors = []
+    for index, (pk, bio, embedding, key) in enumerate(rows):
+        current_key = embedding_key(embedder, bio)
+        if key == current_key:
+            vectors.append(from_bytes(embedding))
+        else:
+            stale.append((index, pk, bio, current_key))
+            vectors.append(None)
+
+    if stale:
+        embedded = embedder.embed([bio for _, _, bio, _ in stale])
+        updated = []
+        for (index, pk, _, key), vector in zip(stale, embedded):
+            vectors[index] = vector
+            updated.append(
+                Profile(
+                    pk=pk,
+                    bio_embedding=to_bytes(vector),
+                    bio_embedding_key=key,
+                )
+            )
+        Profile.objects.bulk_update(
+            updated, ["bio_embedding", "bio_embedding_key"]
+        )
+
+    if not rows:
+        return [], np.zeros((0, 0), dtype=np.float32)
+    return [pk for pk, _, _, _ in rows], np.vstack(vectors)
+
+
+def relevant_profile_ids(proposal: dict, profile_ids: list) -> list:
+    """
+    Selects the profiles whose bio is similar enough to a proposal to be
+    worth a language model completion.
+
+    The cosine similarity between the proposal and every profile is
+    computed as a single matrix product per batch of profiles. Profiles
+    below `EMBEDDINGS["MIN_SIMILARITY"]` are left out.
+
+    Parameters:
+    -----------
+    proposal : dict
+        The proposal as returned by `query_snapshot_proposal`. It must
+        have been mirrored with `apps.bot.sync.mirror_proposals`.
+    profile_ids : list
+        The primary keys of the candidate profiles, each with a bio.
+
+    Returns:
+    --------
+    list:
+        The primary keys of the relevant profiles, most relevant first.
+    """
+    with track_stage("relevance_filter"):
+        target = proposal_embedding(proposal)
+        relevant = []
+        for offset in range(0, len(profile_ids), BATCH_SIZE):
+            pks, vectors = profile_embeddings(
+                profile_ids[offset : offset + BATCH_SIZE]
+            )
+            if not pks:
+                continue
+            similarities = vectors @ target
+            keep = np.flatnonzero(similarities >= MIN_SIMILARITY)
+            relevant.extend(
+                (float(similarities[index]), pks[index]) for index in keep
+            )
+            PROFILES_FILTERED.inc(len(pks) - len(keep))
+
+    relevant.sort(key=lambda item: item[0], reverse=True)
+    return [pk for _, pk in relevant]
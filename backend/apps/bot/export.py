@@ -0,0 +1,171 @@
+"""
+Streaming export of recommendations.
+
+The recommendations are read through a server-side cursor, `CHUNK_SIZE`
+rows at a time, and serialized row by row as they are sent, so an
+export of millions of recommendations holds a single chunk in memory.
+The rows are produced by an asynchronous iterator, which Django streams
+under ASGI without first collecting the response.
+"""
+
+import csv
+import json
+from typing import AsyncIterator
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, QuerySet
+from django.db.models.fields.json import KeyTextTransform
+
+# The number of rows fetched from the cursor at a time.
+CHUNK_SIZE = 2000
+
+# The number of characters sent at a time. Rows are short, and each
+# chunk of a streamed response is compressed on its own, so rows are
+# grouped to compress well.
+BUFFER_SIZE = 64 * 1024
+
+# The exported columns, in order. The proposal body is left out, as it
+# is usually much larger than the recommendation.
+COLUMNS = (
+    "id",
+    "created_at",
+    "revised_at",
+    "account",
+    "profile",
+    "snapshot_proposal",
+    "space",
+    "title",
+    "verdict",
+    "model",
+    "version",
+    "recommendation",
+)
+
+# The content type of each export format.
+CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def rows(queryset: QuerySet) -> QuerySet:
+    """
+    Selects the exported columns of recommendations.
+
+    Parameters:
+    -----------
+    queryset : QuerySet
+        The recommendations to export.
+
+    Returns:
+    --------
+    QuerySet:
+        Dictionaries with the `COLUMNS` of the recommendations, oldest
+        first.
+    """
+    return queryset.order_by("pk").values(
+        "id",
+        "created_at",
+        "revised_at",
+        "account",
+        "profile",
+        "snapshot_proposal",
+        "verdict",
+        "model",
+        "version",
+        "recommendation",
+        space=F("snapshot_proposal__space_id"),
+        title=KeyTextTransform("title", "proposal"),
+    )
+
+
+class _Echo:
+    """
+    A file-like object that returns what is written to it, so that
+    `csv.writer` formats a row without buffering it.
+    """
+
+    def write(self, value: str) -> str:
+        return value
+
+
+async def _abuffered(lines: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Groups lines into chunks of at least `BUFFER_SIZE` characters, but
+    for the last one.
+    """
+    buffer, size = [], 0
+    async for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= BUFFER_SIZE:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+async def _alines_ndjson(queryset: QuerySet) -> AsyncIterator[str]:
+    """
+    Serializes recommendations as newline-delimited JSON, one object
+    per line.
+
+    Parameters:
+    -----------
+    queryset : QuerySet
+        The recommendations to export.
+
+    Yields:
+    -------
+    str:
+        A line per recommendation.
+    """
+    async for row in rows(queryset).aiterator(chunk_size=CHUNK_SIZE):
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+
+async def _alines_csv(queryset: QuerySet) -> AsyncIterator[str]:
+    """
+    Serializes recommendations as CSV, with a header row.
+
+    Parameters:
+    -----------
+    queryset : QuerySet
+        The recommendations to export.
+
+    Yields:
+    -------
+    str:
+        The header, then a line per recommendation.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    async for row in rows(queryset).aiterator(chunk_size=CHUNK_SIZE):
+        yield writer.writerow(
+            [
+                value.isoformat() if hasattr(value, "isoformat") else value
+                for value in (row[column] for column in COLUMNS)
+            ]
+        )
+
+
+def aiter_ndjson(queryset: QuerySet) -> AsyncIterator[str]:
+    """
+    Serializes recommendations as newline-delimited JSON, one object
+    per line, in chunks of about `BUFFER_SIZE` characters.
+    """
+    return _abuffered(_alines_ndjson(queryset))
+
+
+def aiter_csv(queryset: QuerySet) -> AsyncIterator[str]:
+    """
+    Serializes recommendations as CSV, with a header row, in chunks of
+    about `BUFFER_SIZE` characters.
+    """
+    return _abuffered(_alines_csv(queryset))
+
+
+SERIALIZERS = {
+    "ndjson": aiter_ndjson,
+    "csv": aiter_csv,
+}
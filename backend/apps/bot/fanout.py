@@ -0,0 +1,481 @@
+import asyncio
+import datetime
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from apps.bot import completions, dedup, embeddings, metrics
+from apps.bot.models import Proposal, Recommendation
+from apps.users.models import Profile
+from core.db import release_connections
+
+logger = logging.getLogger(__name__)
+
+# The number of profiles loaded per query during a fan-out.
+BATCH_SIZE = 500
+
+# Users who used the app within the first period are served first, then
+# those who did within the second, then everyone else.
+ACTIVITY_TIERS = (datetime.timedelta(days=7), datetime.timedelta(days=30))
+
+# The relative cost of a completion of each language model. Models
+# without a cost are not supported yet, so their profiles are skipped
+# immediately.
+MODEL_COSTS = {
+    Profile.LargeLanguageModelChoices.GPT_4: 1.0,
+}
+
+
+def eligible_profiles(proposal: dict) -> QuerySet:
+    """
+    Selects the profiles that should receive a recommendation for a
+    proposal.
+
+    Parameters:
+    -----------
+    proposal : dict
+        The proposal as returned by `query_snapshot_proposal`.
+
+    Returns:
+    --------
+    QuerySet:
+        The profiles with a personal statement that subscribed to the
+        proposal's space.
+    """
+    return (
+        Profile.objects.filter(
+            space_subscriptions__space_id=proposal["space"]["id"]
+        )
+        .exclude(bio__isnull=True)
+        .exclude(bio__exact="")
+        .select_related("account")
+    )
+
+
+async def acomplete(
+    profile: Profile, proposal: dict, anonymous: bool = False
+) -> Optional[completions.CompletionResponse]:
+    """
+    Generates the completion of a profile's language model for a
+    proposal.
+
+    Parameters:
+    -----------
+    profile : Profile
+        The profile to generate the completion for.
+    proposal : dict
+        The proposal as returned by `query_snapshot_proposal`.
+    anonymous : bool, optional
+        Leaves the user's name out of the prompt, so that the completion
+        can be shared with other profiles.
+
+    Returns:
+    --------
+    CompletionResponse or None:
+        The completion, or None if the profile's language model is not
+        supported yet.
+    """
+    match profile.large_language_model:
+        case Profile.LargeLanguageModelChoices.GPT_4:
+            return await completions.aopenai_provider_completion(
+                completions.CompletionRequest(
+                    profile,
+                    proposal,
+                    anonymous=anonymous,
+                )
+            )
+        case _:
+            return None
+
+
+async def arecommend(
+    profile: Profile,
+    proposal: dict,
+    completion_response: Optional[completions.CompletionResponse] = None,
+    cluster_size: int = 1,
+    reused: bool = False,
+    revise: bool = False,
+) -> Optional[Recommendation]:
+    """
+    Generates and stores the recommendation of a single profile for a
+    proposal.
+
+    Parameters:
+    -----------
+    profile : Profile
+        The profile to generate the recommendation for.
+    proposal : dict
+        The proposal as returned by `query_snapshot_proposal`. It must
+        have been mirrored with `apps.bot.sync.mirror_proposals`.
+    completion_response : CompletionResponse, optional
+        A completion generated for the cluster of the profile. It is
+        generated for the profile alone if omitted.
+    cluster_size : int, optional
+        The number of profiles sharing the completion.
+    reused : bool, optional
+        Whether the completion's tokens were already recorded on the
+        recommendation of another member of the cluster.
+    revise : bool, optional
+        Whether to regenerate the profile's existing recommendation for
+        the proposal, keeping the previous one as a version, instead of
+        creating a new one.
+
+    Returns:
+    --------
+    Recommendation or None:
+        The stored recommendation, or None if the profile's language
+        model is not supported yet.
+    """
+    if completion_response is None:
+        completion_response = await acomplete(profile, proposal)
+        if completion_response is None:
+            return None
+    usage = (
+        completions.CompletionResponse.Usage(0, 0, 0)
+        if reused
+        else completion_response.usage
+    )
+
+    fields = {
+        "proposal": {
+            "title": proposal["title"],
+            "body": proposal["body"],
+        },
+        "recommendation": completion_response.completion,
+        "verdict": completion_response.verdict,
+        "model": completion_response.model,
+        "usage": usage.__dict__,
+        "cluster_size": cluster_size,
+        "proposal_hash": Proposal.content_hash(proposal),
+    }
+
+    def save():
+        with metrics.track_queries("database_write"):
+            if revise:
+                existing = Recommendation.objects.filter(
+                    profile=profile, snapshot_proposal_id=proposal["id"]
+                ).first()
+                if existing is not None:
+                    existing.revise(**fields)
+                    return existing
+            return Recommendation.objects.create(
+                account=profile.account,
+                profile=profile,
+                snapshot_proposal_id=proposal["id"],
+                **fields,
+            )
+
+    recommendation = await sync_to_async(save)()
+    metrics.RECOMMENDATIONS.labels(completion_response.model).inc()
+
+    return recommendation
+
+
+def fan_out_proposal(
+    proposal: dict,
+    on_profile: Optional[
+        Callable[[Profile, float, Optional[Exception]], None]
+    ] = None,
+    **kwargs,
+):
+    """Synchronous version of `afan_out_proposal`."""
+    async_to_sync(afan_out_proposal)(proposal, on_profile, **kwargs)
+
+
+def order_clusters(clusters: list) -> list:
+    """
+    Orders the clusters of a fan-out so that the users most likely to
+    read their recommendation before the vote closes get it first.
+
+    Clusters are ordered by the activity tier of their most recently
+    active member (see `ACTIVITY_TIERS`), based on the `last_login` the
+    authentication middleware keeps, then by the cost per
+    recommendation of their language model, since the members of a
+    cluster share one completion. Ties keep their relevance order.
+
+    Parameters:
+    -----------
+    clusters : list
+        The clusters as lists of profile primary keys, as returned by
+        `dedup.cluster_profiles`.
+
+    Returns:
+    --------
+    list:
+        The same clusters, reordered.
+    """
+    profile_ids = [pk for cluster in clusters for pk in cluster]
+    members = {}
+    for offset in range(0, len(profile_ids), BATCH_SIZE):
+        members.update(
+            (pk, (last_login, model))
+            for pk, last_login, model in Profile.objects.filter(
+                pk__in=profile_ids[offset : offset + BATCH_SIZE]
+            ).values_list("pk", "account__last_login", "large_language_model")
+        )
+
+    now = timezone.now()
+
+    def tier(last_login) -> int:
+        if last_login is None:
+            return len(ACTIVITY_TIERS)
+        return next(
+            (
+                index
+                for index, period in enumerate(ACTIVITY_TIERS)
+                if now - last_login <= period
+            ),
+            len(ACTIVITY_TIERS),
+        )
+
+    def key(indexed):
+        index, cluster = indexed
+        known = [members[pk] for pk in cluster if pk in members]
+        if not known:
+            return (len(ACTIVITY_TIERS), 0.0, index)
+        cost = MODEL_COSTS.get(known[0][1], 0.0)
+        return (
+            min(tier(last_login) for last_login, _ in known),
+            cost / len(cluster),
+            index,
+        )
+
+    return [cluster for _, cluster in sorted(enumerate(clusters), key=key)]
+
+
+def plan_fan_out(proposal: dict, profile_ids: Optional[list] = None) -> list:
+    """
+    Selects the eligible profiles that are relevant to a proposal and
+    groups them by near-duplicate personal statement.
+
+    Parameters:
+    -----------
+    proposal : dict
+        The proposal as returned by `query_snapshot_proposal`. It must
+        have been mirrored with `apps.bot.sync.mirror_proposals`.
+    profile_ids : list, optional
+        Restricts the fan-out to these profiles, which are not filtered
+        by relevance since they already received a recommendation.
+
+    Returns:
+    --------
+    list:
+        The clusters as lists of profile primary keys, in the order
+        given by `order_clusters`.
+    """
+    profiles = eligible_profiles(proposal)
+    if profile_ids is None:
+        profile_ids = embeddings.relevant_profile_ids(
+            proposal, list(profiles.values_list("pk", flat=True))
+        )
+    else:
+        profile_ids = list(
+            profiles.filter(pk__in=profile_ids)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+    return order_clusters(dedup.cluster_profiles(profile_ids, proposal))
+
+
+async def afan_out_proposal(
+    proposal: dict,
+    on_profile: Optional[
+        Callable[[Profile, float, Optional[Exception]], None]
+    ] = None,
+    concurrency: Optional[int] = None,
+    profile_ids: Optional[list] = None,
+    revise: bool = False,
+    job=None,
+):
+    """
+    Generates a recommendation for a proposal for every eligible
+    profile.
+
+    Eligible profiles whose bio is unrelated to the proposal are skipped
+    by `embeddings.relevant_profile_ids`, and profiles with
+    near-duplicate personal statements are grouped by
+    `dedup.cluster_profiles`. Each cluster is sent to the language model
+    once and the completion is copied to the recommendation of every
+    member. If the completion fails, the next member of the cluster
+    tries again.
+
+    The clusters are planned as a `FanOutRun` whose shards are carried
+    out by this process and by any `process_fan_out_shards` worker (see
+    `apps.bot.runs`), so a fan-out interrupted by a crash resumes where
+    it stopped. This returns once no shard of the run is left to claim.
+
+    Parameters:
+    -----------
+    proposal : dict
+        The proposal as returned by `query_snapshot_proposal`. It must
+        have been mirrored with `apps.bot.sync.mirror_proposals`.
+    on_profile : Callable, optional
+        Called after each profile with the profile, the seconds spent
+        on it and the exception raised, if any.
+    concurrency : int, optional
+        Overrides `FAN_OUT["CONCURRENCY"]`.
+    profile_ids : list, optional
+        Restricts the fan-out to these profiles. See `plan_fan_out`.
+    revise : bool, optional
+        Regenerates the existing recommendations of the profiles. See
+        `arecommend`.
+    job : FanOutJob, optional
+        The job carrying out the fan-out, whose unfinished run, if any,
+        is resumed instead of planning a new one.
+    """
+    from apps.bot import runs
+
+    with metrics.track_stage("fan_out"):
+        run = await sync_to_async(runs.start_run)(
+            proposal, profile_ids=profile_ids, revise=revise, job=job
+        )
+        await runs.aexecute(
+            run, concurrency=concurrency, on_profile=on_profile
+        )
+
+
+async def afan_out_clusters(
+    clusters: list,
+    proposal: dict,
+    concurrency: Optional[int] = None,
+    on_profile: Optional[
+        Callable[[Profile, float, Optional[Exception]], None]
+    ] = None,
+    revise: bool = False,
+    on_cluster: Optional[Callable[[int], Awaitable[None]]] = None,
+) -> bool:
+    """
+    Generates the recommendations of a list of clusters, in order.
+
+    Up to `FAN_OUT["CONCURRENCY"]` clusters are processed at once, so
+    the fan-out waits on several upstream calls without holding a
+    thread for each of them. Dispatching stops once voting on the
+    proposal has ended, since later recommendations would arrive too
+    late to matter.
+
+    A failure for one profile is logged and does not prevent the
+    remaining profiles from receiving their recommendation. An error
+    raised by `on_cluster` cancels the clusters still in progress, and
+    is raised once they are cancelled. Profiles are loaded in batches
+    and the database connection is handed back to the pool after every
+    profile, so a long fan-out does not hold a connection while it
+    waits on the language model.
+
+    Parameters:
+    -----------
+    clusters : list
+        The clusters as lists of profile primary keys.
+    proposal : dict
+        The proposal as returned by `query_snapshot_proposal`.
+    concurrency : int, optional
+        Overrides `FAN_OUT["CONCURRENCY"]`.
+    on_profile : Callable, optional
+        Called after each profile. See `afan_out_proposal`.
+    revise : bool, optional
+        Regenerates the existing recommendations of the profiles.
+    on_cluster : Callable, optional
+        Awaited with the position of each cluster once it is done.
+        Clusters may finish out of order.
+
+    Returns:
+    --------
+    bool:
+        False if voting ended before every cluster was dispatched.
+    """
+    semaphore = asyncio.Semaphore(
+        concurrency or settings.FAN_OUT["CONCURRENCY"]
+    )
+    profiles = eligible_profiles(proposal)
+
+    async def afan_out(index: int, cluster: list):
+        await afan_out_cluster(
+            cluster, proposal, semaphore, on_profile, revise
+        )
+        if on_cluster is not None:
+            await on_cluster(index)
+
+    offset = 0
+    while offset < len(clusters):
+        if proposal.get("end", float("inf")) <= time.time():
+            logger.info(
+                "Voting on proposal %s ended, skipping %s clusters",
+                proposal.get("id"),
+                len(clusters) - offset,
+            )
+            return False
+        start = offset
+        size = len(clusters[offset])
+        offset += 1
+        while offset < len(clusters) and (
+            size + len(clusters[offset]) <= BATCH_SIZE
+        ):
+            size += len(clusters[offset])
+            offset += 1
+
+        loaded = await profiles.ain_bulk(
+            [pk for cluster in clusters[start:offset] for pk in cluster]
+        )
+        try:
+            async with asyncio.TaskGroup() as group:
+                for index, cluster in enumerate(clusters[start:offset], start):
+                    group.create_task(
+                        afan_out(
+                            index,
+                            [loaded[pk] for pk in cluster if pk in loaded],
+                        )
+                    )
+        except ExceptionGroup as errors:
+            raise errors.exceptions[0]
+    return True
+
+
+async def afan_out_cluster(
+    cluster: list,
+    proposal: dict,
+    semaphore: asyncio.Semaphore,
+    on_profile: Optional[
+        Callable[[Profile, float, Optional[Exception]], None]
+    ] = None,
+    revise: bool = False,
+):
+    """
+    Generates the recommendations of a cluster of profiles from a single
+    completion. See `afan_out_clusters`.
+    """
+    shared = None
+    charged = False
+    async with semaphore:
+        for profile in cluster:
+            start = time.perf_counter()
+            error = None
+            try:
+                with metrics.track_stage("profile"):
+                    if shared is None:
+                        shared = await acomplete(
+                            profile, proposal, anonymous=len(cluster) > 1
+                        )
+                    if shared is not None:
+                        await arecommend(
+                            profile,
+                            proposal,
+                            shared,
+                            cluster_size=len(cluster),
+                            reused=charged,
+                            revise=revise,
+                        )
+                        charged = True
+            except Exception as exception:
+                error = exception
+                logger.exception(
+                    "Failed to recommend proposal %s to profile %s",
+                    proposal.get("id"),
+                    profile.pk,
+                )
+            await sync_to_async(release_connections)()
+            if on_profile is not None:
+                on_profile(profile, time.perf_counter() - start, error)
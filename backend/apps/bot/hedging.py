@@ -0,0 +1,213 @@
+"""
+Hedged completion requests.
+
+A few completions of every fan-out take minutes, while most take
+seconds. The latency of the completions of each provider and model is
+tracked over the last `HEDGING["WINDOW"]` calls. A call still pending
+past the `HEDGING["PERCENTILE"]` of that distribution is sent a second
+time, and whichever copy answers first is kept while the other one is
+cancelled. Both copies are bounded by the hard deadline of the call.
+
+Hedges spend tokens twice, so they are only sent while the tokens they
+are estimated to spend stay within `HEDGING["MAX_TOKEN_SHARE"]` of the
+tokens of the completions themselves. Latencies and tokens are tracked
+per process.
+"""
+
+import asyncio
+import collections
+import logging
+import math
+from typing import Awaitable, Callable, Optional
+
+from django.conf import settings
+
+from .metrics import COMPLETION_HEDGES
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """
+    Keeps the latencies of the most recent calls to a provider's model.
+
+    Methods:
+    --------
+    observe(seconds: float) -> None:
+        Records the latency of a call.
+
+    percentile(fraction: float) -> float or None:
+        Returns a percentile of the recorded latencies.
+    """
+
+    def __init__(self, window: int):
+        self.latencies = collections.deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        """Records the latency of a call."""
+        self.latencies.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """
+        Returns the latency below which `fraction` of the recorded calls
+        returned, or None until `HEDGING["MIN_SAMPLES"]` are recorded.
+        """
+        if len(self.latencies) < settings.HEDGING["MIN_SAMPLES"]:
+            return None
+        latencies = sorted(self.latencies)
+        index = min(math.ceil(fraction * len(latencies)), len(latencies)) - 1
+        return latencies[max(index, 0)]
+
+
+class TokenBudget:
+    """
+    Keeps count of the tokens of completions and of the tokens spent on
+    hedges, to cap the latter to a share of the former.
+
+    Methods:
+    --------
+    record(prompt_tokens: int, completion_tokens: int) -> None:
+        Counts the tokens of a completion.
+
+    estimate(prompt_tokens: int) -> int:
+        Estimates the tokens a hedge with a prompt of this size spends.
+
+    spend(tokens: int) -> bool:
+        Reserves the tokens of a hedge if the budget allows it.
+    """
+
+    def __init__(self):
+        self.tokens = 0
+        self.completions = 0
+        self.completion_tokens = 0
+        self.spent = 0
+
+    def record(self, prompt_tokens: int, completion_tokens: int):
+        """Counts the tokens of a completion."""
+        self.tokens += prompt_tokens + completion_tokens
+        self.completions += 1
+        self.completion_tokens += completion_tokens
+
+    def estimate(self, prompt_tokens: int) -> int:
+        """
+        Estimates the tokens a hedge spends: its prompt and the average
+        completion so far.
+        """
+        if not self.completions:
+            return prompt_tokens
+        return prompt_tokens + self.completion_tokens // self.completions
+
+    def spend(self, tokens: int) -> bool:
+        """
+        Reserves the tokens of a hedge, unless they would take the tokens
+        spent on hedges past `HEDGING["MAX_TOKEN_SHARE"]` of the tokens
+        of completions.
+        """
+        if (
+            self.spent + tokens
+            > settings.HEDGING["MAX_TOKEN_SHARE"] * self.tokens
+        ):
+            return False
+        self.spent += tokens
+        return True
+
+
+# The latency tracker of each provider and model, and the tokens of
+# this process.
+trackers: dict[str, LatencyTracker] = {}
+budget = TokenBudget()
+
+
+def get_tracker(key: str) -> LatencyTracker:
+    """Returns the latency tracker of a provider and model."""
+    if key not in trackers:
+        trackers[key] = LatencyTracker(settings.HEDGING["WINDOW"])
+    return trackers[key]
+
+
+def hedge_delay(key: str) -> Optional[float]:
+    """
+    Returns the seconds after which a call to a provider and model is
+    hedged: the `HEDGING["PERCENTILE"]` of its latency, and at least
+    `HEDGING["MIN_DELAY"]`. None if hedging is disabled or too few
+    calls were observed.
+    """
+    if not settings.HEDGING["ENABLED"]:
+        return None
+    threshold = get_tracker(key).percentile(settings.HEDGING["PERCENTILE"])
+    if threshold is None:
+        return None
+    return max(threshold, settings.HEDGING["MIN_DELAY"])
+
+
+async def ahedged(key: str, call: Callable[[], Awaitable], prompt_tokens: int):
+    """
+    Awaits a call, hedging it once if it is slow, within the hard
+    deadline of `HEDGING["DEADLINE"]` seconds.
+
+    Parameters:
+    -----------
+    key : str
+        The provider and model called, such as 'openai:gpt-4', whose
+        latency decides when to hedge.
+    call : Callable
+        Makes the call. It is called a second time to hedge.
+    prompt_tokens : int
+        The number of tokens of the prompt, to estimate the tokens of a
+        hedge.
+
+    Returns:
+    --------
+    The result of the first copy of the call that succeeds.
+
+    Raises:
+    -------
+    TimeoutError
+        If no copy succeeded before the deadline.
+    Exception
+        The error of the last copy to fail, if every copy failed.
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    primary = asyncio.ensure_future(call())
+    pending = {primary}
+    hedge = None
+    try:
+        async with asyncio.timeout(settings.HEDGING["DEADLINE"]):
+            delay = hedge_delay(key)
+            if delay is not None:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                tokens = budget.estimate(prompt_tokens)
+                if not done and budget.spend(tokens):
+                    logger.info(
+                        "Hedging a call to %s pending for %.1fs", key, delay
+                    )
+                    hedge = asyncio.ensure_future(call())
+                    pending.add(hedge)
+            while True:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                failed = None
+                for task in done:
+                    if task.exception() is None:
+                        if hedge is not None:
+                            COMPLETION_HEDGES.labels(
+                                key, "hedge" if task is hedge else "primary"
+                            ).inc()
+                        return task.result()
+                    failed = task.exception()
+                if not pending:
+                    raise failed
+    finally:
+        # The primary's latency is observed even when it was cancelled
+        # or timed out, as a lower bound, so that hedging does not hide
+        # the tail it is triggered by.
+        get_tracker(key).observe(loop.time() - start)
+        for task in pending:
+            task.cancel()
+            # A copy may have failed as the deadline passed. Its error is
+            # retrieved so that it is not reported as never retrieved.
+            task.add_done_callback(
+                lambda task: task.cancelled() or task.exception()
+            )
@@ -0,0 +1,175 @@
+"""
+Worker for the fan-out job queue.
+
+Jobs are enqueued as `FanOutJob` rows and run one at a time by
+`process_job`, lowest priority value first and, within a priority, the
+job whose proposal's voting ends soonest first. Jobs are claimed with
+`SELECT ... FOR UPDATE SKIP LOCKED`, so several workers can drain the
+queue at once, and each claim leases the job for `LEASE` seconds, after
+which a job whose worker died is claimed again.
+"""
+
+import datetime
+import logging
+from typing import Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.bot import fanout, revisions
+from apps.bot.models import FanOutJob, Proposal
+
+logger = logging.getLogger(__name__)
+
+# The number of attempts after which a job is marked as failed.
+MAX_ATTEMPTS = 3
+
+# The seconds a claimed job is reserved for its worker, and the delay
+# before the first retry, which doubles with every attempt.
+LEASE = 3600
+RETRY_DELAY = 60
+
+
+def claim_job() -> Optional[FanOutJob]:
+    """
+    Claims the next job that is due: pending jobs, and running jobs
+    whose lease expired, by priority, then by the end of their
+    proposal's voting, then oldest first.
+
+    Due jobs whose proposal closed, was deleted or stopped accepting
+    votes are marked as skipped instead, since their recommendations
+    would arrive too late.
+
+    Returns:
+    --------
+    FanOutJob or None:
+        The claimed job, or None if there is none. Jobs locked by
+        another worker are skipped.
+    """
+    now = timezone.now()
+    due = FanOutJob.objects.filter(
+        status__in=[
+            FanOutJob.StatusChoices.PENDING,
+            FanOutJob.StatusChoices.RUNNING,
+        ],
+        available_at__lte=now,
+    )
+    with transaction.atomic():
+        closed = (
+            due.filter(
+                Q(proposal__end__lte=now)
+                | Q(
+                    proposal__state__in=[
+                        Proposal.StateChoices.CLOSED,
+                        Proposal.StateChoices.DELETED,
+                    ]
+                )
+            )
+            .select_for_update(skip_locked=True, of=("self",))
+            .values_list("pk", flat=True)
+        )
+        skipped = FanOutJob.objects.filter(pk__in=list(closed)).update(
+            status=FanOutJob.StatusChoices.SKIPPED,
+            last_error="Voting ended before the job was claimed",
+            completed_at=now,
+        )
+        if skipped:
+            logger.info("Skipped %s jobs of closed proposals", skipped)
+
+        job = (
+            due.select_for_update(skip_locked=True, of=("self",))
+            .select_related("proposal")
+            .order_by("priority", "proposal__end", "available_at")
+            .first()
+        )
+        if job is None:
+            return None
+        FanOutJob.objects.filter(pk=job.pk).update(
+            status=FanOutJob.StatusChoices.RUNNING,
+            attempts=F("attempts") + 1,
+            available_at=now + datetime.timedelta(seconds=LEASE),
+        )
+    job.status = FanOutJob.StatusChoices.RUNNING
+    job.attempts += 1
+    return job
+
+
+def run_job(job: FanOutJob):
+    """
+    Carries out a job.
+
+    A revision regenerates the recommendations of the profiles whose
+    recommendation was made from another version of the proposal. A
+    complete fan-out recommends the proposal to every relevant
+    subscriber. A retried job resumes the run of its earlier attempt.
+
+    Parameters:
+    -----------
+    job : FanOutJob
+        The job to carry out.
+    """
+    proposal = job.proposal.data
+    match job.kind:
+        case FanOutJob.KindChoices.REVISION:
+            profile_ids = revisions.stale_profile_ids(
+                job.proposal_id, job.body_hash
+            )
+            logger.info(
+                "Revising %s recommendations of proposal %s",
+                len(profile_ids),
+                job.proposal_id,
+            )
+            if profile_ids:
+                fanout.fan_out_proposal(
+                    proposal, profile_ids=profile_ids, revise=True, job=job
+                )
+        case FanOutJob.KindChoices.FAN_OUT:
+            fanout.fan_out_proposal(proposal, job=job)
+
+
+def process_job() -> Optional[FanOutJob]:
+    """
+    Claims and runs the next job.
+
+    A failed job is made available again after `RETRY_DELAY` seconds,
+    doubled for every previous attempt, and is marked as failed once it
+    reaches `MAX_ATTEMPTS`. It is also marked as failed if a job of the
+    same kind was enqueued for the proposal in the meantime, since that
+    job covers it.
+
+    Returns:
+    --------
+    FanOutJob or None:
+        The job, or None if the queue is empty.
+    """
+    job = claim_job()
+    if job is None:
+        return None
+
+    try:
+        run_job(job)
+    except Exception as exception:
+        logger.exception("Fan-out job %s failed", job)
+        job.last_error = str(exception) or exception.__class__.__name__
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = FanOutJob.StatusChoices.FAILED
+            job.completed_at = timezone.now()
+        else:
+            job.status = FanOutJob.StatusChoices.PENDING
+            job.available_at = timezone.now() + datetime.timedelta(
+                seconds=RETRY_DELAY * 2 ** (job.attempts - 1)
+            )
+    else:
+        job.status = FanOutJob.StatusChoices.DONE
+        job.last_error = ""
+        job.completed_at = timezone.now()
+    fields = ["status", "last_error", "available_at", "completed_at"]
+    try:
+        with transaction.atomic():
+            job.save(update_fields=fields)
+    except IntegrityError:
+        job.status = FanOutJob.StatusChoices.FAILED
+        job.completed_at = timezone.now()
+        job.save(update_fields=fields)
+    return job
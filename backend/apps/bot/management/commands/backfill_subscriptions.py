@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.bot.models import Recommendation
+from apps.users.models import Profile, SpaceSubscription
+
+
+class Command(BaseCommand):
+    help = (
+        "Subscribes the profiles that have no space subscription to the"
+        " spaces they received recommendations for, and to the given"
+        " spaces (SNAPSHOT_SPACES by default). Proposals are only fanned"
+        " out to the subscribers of their space, so this must run once"
+        " after upgrading, or profiles created before subscriptions"
+        " existed stop receiving recommendations."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--space",
+            action="append",
+            dest="spaces",
+            help=(
+                "A space to subscribe every profile to. Repeat for several"
+                " spaces. Defaults to SNAPSHOT_SPACES."
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="The number of profiles read and subscribed per query.",
+        )
+
+    def handle(self, *args, **options):
+        spaces = options["spaces"] or settings.SNAPSHOT["SPACES"]
+        if not spaces and not Recommendation.objects.exists():
+            raise CommandError(
+                "There are no recommendations to subscribe profiles from."
+                " Pass --space or set SNAPSHOT_SPACES."
+            )
+
+        # Profiles are walked by primary key. Those that already manage
+        # their subscriptions are left as they are.
+        last_pk = 0
+        profiles = created = 0
+        while True:
+            batch = list(
+                Profile.objects.filter(
+                    pk__gt=last_pk, space_subscriptions__isnull=True
+                )
+                .exclude(bio__isnull=True)
+                .exclude(bio__exact="")
+                .order_by("pk")
+                .values_list("pk", flat=True)[: options["batch_size"]]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1]
+            profiles += len(batch)
+
+            pairs = {(pk, space) for pk in batch for space in spaces}
+            pairs.update(
+                Recommendation.objects.filter(
+                    profile_id__in=batch,
+                    snapshot_proposal__isnull=False,
+                )
+                .values_list("profile_id", "snapshot_proposal__space_id")
+                .distinct()
+            )
+            created += len(
+                SpaceSubscription.objects.bulk_create(
+                    [
+                        SpaceSubscription(profile_id=pk, space_id=space)
+                        for pk, space in pairs
+                    ],
+                    ignore_conflicts=True,
+                )
+            )
+
+        self.stdout.write(
+            f"Created {created} subscriptions for {profiles} profiles."
+        )
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+from apps.bot import verdicts
+from apps.bot.models import Recommendation
+
+
+class Command(BaseCommand):
+    help = (
+        "Extracts the verdict of the recommendations stored before"
+        " verdicts were extracted when recommendations are written."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="The number of recommendations read and updated per query.",
+        )
+
+    def handle(self, *args, **options):
+        # Recommendations are walked by primary key, so those whose
+        # verdict cannot be extracted are read once rather than on every
+        # batch.
+        last_pk = 0
+        scanned = updated = 0
+        while True:
+            batch = list(
+                Recommendation.objects.filter(
+                    verdict__isnull=True, pk__gt=last_pk
+                )
+                .order_by("pk")
+                .only("pk", "recommendation")[: options["batch_size"]]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            scanned += len(batch)
+
+            parsed = []
+            for recommendation in batch:
+                recommendation.verdict = verdicts.parse_text(
+                    recommendation.recommendation
+                )
+                if recommendation.verdict is not None:
+                    parsed.append(recommendation)
+            Recommendation.objects.bulk_update(parsed, ["verdict"])
+            updated += len(parsed)
+
+        self.stdout.write(
+            f"Extracted the verdict of {updated} of {scanned}"
+            " recommendations."
+        )
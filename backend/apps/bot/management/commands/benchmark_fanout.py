@@ -0,0 +1,257 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.bot.benchmarks import data, servers, stats
+
+BENCHMARK_PROPOSAL_ID = "0xbenchmark"
+
+SERVICES = {
+    "snapshot": servers.FakeSnapshotServer,
+    "llm": servers.FakeOpenAIServer,
+    "smtp": servers.FakeSMTPServer,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the Snapshot webhook fan-out against local stand-ins"
+        " for the Snapshot GraphQL API, OpenAI and SMTP. Seeded accounts"
+        " are written to the configured database, which must not contain"
+        " any other profiles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--profiles",
+            type=int,
+            nargs="+",
+            default=[1_000, 10_000, 100_000],
+            help="The number of profiles to seed for each run.",
+        )
+        for service, latency in (
+            ("snapshot", 0.05),
+            ("llm", 0.2),
+            ("smtp", 0.01),
+        ):
+            parser.add_argument(
+                f"--{service}-latency",
+                type=float,
+                default=latency,
+                help=f"Mean {service} response time in seconds.",
+            )
+            parser.add_argument(
+                f"--{service}-error-rate",
+                type=float,
+                default=0.0,
+                help=f"Fraction of {service} requests that fail.",
+            )
+            parser.add_argument(
+                f"--{service}-rate-limit-rate",
+                type=float,
+                default=0.0,
+                help=f"Fraction of {service} requests that are rate limited.",
+            )
+            parser.add_argument(
+                f"--{service}-stall-rate",
+                type=float,
+                default=0.0,
+                help=f"Fraction of {service} requests that stall.",
+            )
+            parser.add_argument(
+                f"--{service}-stall-latency",
+                type=float,
+                default=10.0,
+                help=f"Seconds stalled {service} requests wait.",
+            )
+        parser.add_argument(
+            "--output",
+            help="Writes the results as JSON to this path.",
+        )
+        parser.add_argument(
+            "--baseline",
+            help="Compares the results with a previous --output file.",
+        )
+        parser.add_argument(
+            "--worker", action="store_true", help=argparse.SUPPRESS
+        )
+
+    def handle(self, *args, **options):
+        if options["worker"]:
+            return self.run_worker()
+
+        if data.has_foreign_profiles():
+            raise CommandError(
+                "The database contains profiles that would take part in the"
+                " benchmark fan-out. Point the SUPABASE_DB_* variables at a"
+                " disposable database."
+            )
+
+        fakes = {
+            service: server_class(
+                servers.Behaviour(
+                    latency=options[f"{service}_latency"],
+                    error_rate=options[f"{service}_error_rate"],
+                    rate_limit_rate=options[f"{service}_rate_limit_rate"],
+                    stall_rate=options[f"{service}_stall_rate"],
+                    stall_latency=options[f"{service}_stall_latency"],
+                )
+            ).start()
+            for service, server_class in SERVICES.items()
+        }
+
+        results = []
+        try:
+            for count in options["profiles"]:
+                data.remove_seeded()
+                self.stdout.write(f"Seeding {count} profiles...")
+                data.seed_profiles(count)
+                requests_before = {
+                    service: fake.requests for service, fake in fakes.items()
+                }
+                result = self.spawn_worker(fakes)
+                for service, fake in fakes.items():
+                    result[f"{service}_requests"] = (
+                        fake.requests - requests_before[service]
+                    )
+                results.append(result)
+        finally:
+            data.remove_seeded()
+            for fake in fakes.values():
+                fake.stop()
+
+        self.report(results)
+
+        if options["output"]:
+            with open(options["output"], "w") as output_file:
+                json.dump(results, output_file, indent=2)
+        if options["baseline"]:
+            with open(options["baseline"], "r") as baseline_file:
+                self.compare(results, json.load(baseline_file))
+
+    def spawn_worker(self, fakes: dict) -> dict:
+        """
+        Runs the fan-out in a fresh process pointed at the fake servers,
+        so the settings are read from the environment as in production
+        and the peak memory is that of the fan-out alone.
+        """
+        env = {
+            **os.environ,
+            "SNAPSHOT_GRAPHQL_URL": (
+                f"http://127.0.0.1:{fakes['snapshot'].port}/graphql"
+            ),
+            "OPENAI_API_BASE": f"http://127.0.0.1:{fakes['llm'].port}/v1",
+            "OPENAI_API_KEY": "benchmark",
+            "EMAIL_HOST": "127.0.0.1",
+            "EMAIL_PORT": str(fakes["smtp"].port),
+            "EMAIL_USE_TLS": "false",
+            "GOOGLE_EMAIL_ADDRESS": "",
+            "GOOGLE_APP_PASSWORD": "",
+        }
+        completed = subprocess.run(
+            [
+                sys.executable,
+                str(settings.BASE_DIR / "manage.py"),
+                "benchmark_fanout",
+                "--worker",
+            ],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if completed.returncode != 0:
+            raise CommandError(
+                f"The benchmark worker failed:\n{completed.stderr}"
+            )
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def run_worker(self):
+        from apps.bot import fanout, sync
+        from apps.bot.snapshot import query_snapshot_proposal
+
+        durations = []
+        errors = 0
+
+        def on_profile(profile, seconds, error):
+            nonlocal errors
+            durations.append(seconds)
+            errors += error is not None
+
+        counter = stats.QueryCounter()
+        start = time.perf_counter()
+        with counter.counting():
+            proposal = query_snapshot_proposal(BENCHMARK_PROPOSAL_ID)[
+                "proposal"
+            ]
+            sync.mirror_proposals([proposal])
+            fanout.fan_out_proposal(proposal, on_profile=on_profile)
+        wall_seconds = time.perf_counter() - start
+
+        self.stdout.write(
+            json.dumps(
+                {
+                    "profiles": len(durations),
+                    "wall_seconds": wall_seconds,
+                    "throughput": len(durations) / wall_seconds,
+                    "p50_ms": stats.percentile(durations, 50) * 1000,
+                    "p99_ms": stats.percentile(durations, 99) * 1000,
+                    "errors": errors,
+                    "queries": counter.count,
+                    "peak_rss_mb": stats.peak_rss_mb(),
+                }
+            )
+        )
+
+    def report(self, results: list):
+        columns = (
+            "profiles",
+            "wall_seconds",
+            "throughput",
+            "p50_ms",
+            "p99_ms",
+            "errors",
+            "queries",
+            "llm_requests",
+            "smtp_requests",
+            "peak_rss_mb",
+        )
+        self.stdout.write(" ".join(name.rjust(13) for name in columns))
+        for result in results:
+            self.stdout.write(
+                " ".join(
+                    (
+                        f"{result[name]:13.1f}"
+                        if isinstance(result[name], float)
+                        else f"{result[name]:13}"
+                    )
+                    for name in columns
+                )
+            )
+
+    def compare(self, results: list, baseline: list):
+        baseline_by_size = {result["profiles"]: result for result in baseline}
+        for result in results:
+            previous = baseline_by_size.get(result["profiles"])
+            if previous is None:
+                continue
+            changes = ", ".join(
+                f"{name} {change:+.1f}%"
+                for name in (
+                    "wall_seconds",
+                    "p50_ms",
+                    "p99_ms",
+                    "queries",
+                    "peak_rss_mb",
+                )
+                if previous[name]
+                for change in [
+                    100 * (result[name] - previous[name]) / previous[name]
+                ]
+            )
+            self.stdout.write(f"{result['profiles']} profiles: {changes}")
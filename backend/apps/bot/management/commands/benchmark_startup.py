@@ -0,0 +1,137 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Libraries that are only needed to talk to external services. They are
+# imported by `core.clients` on first use and must not be loaded by
+# `django.setup()` or the URLconf.
+LAZY_MODULES = ("supabase", "gql", "openai")
+
+STARTUP_SCRIPT = """
+import json, os, sys, time
+
+start = time.perf_counter()
+import django
+
+django.setup()
+setup_seconds = time.perf_counter() - start
+if {import_urls}:
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
+print(
+    json.dumps(
+        {{
+            "setup_seconds": setup_seconds,
+            "total_seconds": time.perf_counter() - start,
+            "modules": sorted(sys.modules),
+        }}
+    )
+)
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the cold start of `django.setup()` in fresh processes and"
+        " fails if it exceeds the budget or imports the client libraries of"
+        " external services."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--budget",
+            type=float,
+            default=1.0,
+            help="The maximum median startup time in seconds.",
+        )
+        parser.add_argument(
+            "--runs",
+            type=int,
+            default=5,
+            help="The number of fresh processes to measure.",
+        )
+        parser.add_argument(
+            "--urls",
+            action="store_true",
+            help=(
+                "Also loads the URLconf, which imports every view, as"
+                " `runserver` and the ASGI/WSGI workers do."
+            ),
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=15,
+            help="The number of slowest imports to list.",
+        )
+
+    def handle(self, *args, **options):
+        script = STARTUP_SCRIPT.format(import_urls=options["urls"])
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": os.environ.get(
+                "DJANGO_SETTINGS_MODULE", "core.settings"
+            ),
+        }
+
+        runs = []
+        for index in range(options["runs"]):
+            # The import profile of the last run is kept for the report.
+            command = [sys.executable]
+            if index == options["runs"] - 1:
+                command += ["-X", "importtime"]
+            completed = subprocess.run(
+                [*command, "-c", script],
+                cwd=settings.BASE_DIR,
+                env=env,
+                capture_output=True,
+                text=True,
+            )
+            if completed.returncode != 0:
+                raise CommandError(completed.stderr)
+            runs.append(json.loads(completed.stdout.splitlines()[-1]))
+
+        self.report_imports(completed.stderr, options["top"])
+
+        key = "total_seconds" if options["urls"] else "setup_seconds"
+        median = statistics.median(run[key] for run in runs[:-1] or runs)
+        self.stdout.write(
+            f"Median startup over {options['runs']} runs: {median:.3f}s"
+            f" (budget {options['budget']:.3f}s)"
+        )
+
+        loaded = [
+            module for module in LAZY_MODULES if module in runs[-1]["modules"]
+        ]
+        if loaded:
+            raise CommandError(
+                f"Startup imports {', '.join(loaded)}. Use the accessors in"
+                " `core.clients` instead of importing these libraries at"
+                " module level."
+            )
+        if median > options["budget"]:
+            raise CommandError(
+                f"Startup takes {median:.3f}s, over the budget of"
+                f" {options['budget']:.3f}s."
+            )
+
+    def report_imports(self, importtime: str, top: int):
+        """Lists the top-level imports with the largest cumulative time."""
+        imports = []
+        for line in importtime.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line.split("|")
+            if name.startswith("  ") or not cumulative.strip().isdigit():
+                continue
+            imports.append((int(cumulative), name.strip()))
+
+        self.stdout.write(f"{'cumulative_ms':>14}  module")
+        for cumulative, name in sorted(imports, reverse=True)[:top]:
+            self.stdout.write(f"{cumulative / 1000:>14.1f}  {name}")
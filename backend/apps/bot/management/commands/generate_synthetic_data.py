@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from apps.bot.benchmarks import data
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk generates benchmark accounts, profiles and recommendations"
+        " with realistic proposal sizes. Use --clear to remove them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--accounts",
+            type=int,
+            default=10_000,
+            help="The number of accounts (each with a profile) to create.",
+        )
+        parser.add_argument(
+            "--recommendations-per-account",
+            type=int,
+            default=100,
+            help="The number of recommendations to create per account.",
+        )
+        parser.add_argument(
+            "--proposals",
+            type=int,
+            default=200,
+            help="The number of distinct proposals recommendations use.",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Removes all generated data instead.",
+        )
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            deleted = data.remove_seeded()
+            self.stdout.write(f"Deleted {deleted} rows.")
+            return
+
+        accounts = data.seed_profiles(options["accounts"])
+        self.stdout.write(f"Created {accounts} accounts and profiles.")
+        data.seed_staff_account()
+        recommendations = data.seed_recommendations(
+            options["recommendations_per_account"],
+            proposals=max(
+                options["proposals"], options["recommendations_per_account"]
+            ),
+        )
+        self.stdout.write(f"Created {recommendations} recommendations.")
@@ -0,0 +1,187 @@
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import jwt
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import (
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+
+from apps.bot.benchmarks import data, stats
+from apps.bot.models import Recommendation
+
+ENDPOINTS = (
+    "recommendation_list",
+    "recommendation_detail",
+    "profile_detail",
+    "profile_list",
+)
+
+
+def access_token(account) -> str:
+    """
+    Mints a Supabase access token for the account, signed with
+    `SUPABASE["JWT_SECRET"]` as the authentication middleware requires.
+    """
+    return jwt.encode(
+        {
+            "sub": str(account.uuid),
+            "aud": "authenticated",
+            "exp": int(time.time()) + 60 * 60,
+        },
+        settings.SUPABASE["JWT_SECRET"],
+        algorithm="HS256",
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Sends concurrent authenticated requests to the read endpoints"
+        " through the full middleware stack and reports latency"
+        " percentiles and SQL query counts per endpoint. Run"
+        " generate_synthetic_data first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=500,
+            help="The number of requests sent to each endpoint.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=16,
+            help="The number of requests in flight at once.",
+        )
+        parser.add_argument(
+            "--accounts",
+            type=int,
+            default=200,
+            help="The number of benchmark accounts to send requests as.",
+        )
+        parser.add_argument(
+            "--endpoints",
+            nargs="+",
+            choices=ENDPOINTS,
+            default=list(ENDPOINTS),
+        )
+
+    def handle(self, *args, **options):
+        accounts = list(
+            data.seeded_accounts()
+            .filter(profile__isnull=False)
+            .order_by("?")[: options["accounts"]]
+        )
+        if not accounts:
+            raise CommandError(
+                "There are no benchmark accounts. Run generate_synthetic_data"
+                " first."
+            )
+        if not settings.SUPABASE["JWT_SECRET"]:
+            raise CommandError(
+                "Set SUPABASE_JWT_SECRET to sign the access tokens of the"
+                " benchmark accounts."
+            )
+        staff = data.seed_staff_account()
+        recommendation_ids = dict(
+            Recommendation.objects.filter(account__in=accounts)
+            .order_by("account_id", "-id")
+            .distinct("account_id")
+            .values_list("account_id", "id")
+        )
+        tokens = {account.pk: access_token(account) for account in accounts}
+        staff_token = access_token(staff)
+
+        plan = []
+        for endpoint in options["endpoints"]:
+            for _ in range(options["requests"]):
+                account = random.choice(accounts)
+                match endpoint:
+                    case "recommendation_list":
+                        url = reverse("recommendation-list")
+                    case "recommendation_detail":
+                        url = reverse(
+                            "recommendation-detail",
+                            kwargs={
+                                "pk": recommendation_ids.get(account.pk, 0)
+                            },
+                        )
+                    case "profile_detail":
+                        url = reverse("profile")
+                    case "profile_list":
+                        url = reverse("profile_list")
+                token = (
+                    staff_token
+                    if endpoint == "profile_list"
+                    else tokens[account.pk]
+                )
+                plan.append((endpoint, url, token))
+        random.shuffle(plan)
+
+        local = threading.local()
+
+        def send(request):
+            endpoint, url, token = request
+            if not hasattr(local, "client"):
+                local.client = Client(raise_request_exception=False)
+            counter = stats.QueryCounter()
+            start = time.perf_counter()
+            with counter.counting():
+                response = local.client.get(
+                    url, HTTP_AUTHORIZATION=f"Bearer {token}"
+                )
+            # The test client does not close the connections at the end
+            # of a request, so they are handed back to the pool here.
+            connections.close_all()
+            return (
+                endpoint,
+                time.perf_counter() - start,
+                counter.count,
+                response.status_code,
+            )
+
+        setup_test_environment()
+        try:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(options["concurrency"]) as executor:
+                results = list(executor.map(send, plan))
+            wall_seconds = time.perf_counter() - start
+        finally:
+            teardown_test_environment()
+
+        self.report(results, wall_seconds)
+
+    def report(self, results: list, wall_seconds: float):
+        by_endpoint = defaultdict(list)
+        for endpoint, seconds, queries, status in results:
+            by_endpoint[endpoint].append((seconds, queries, status))
+
+        self.stdout.write(
+            f"{'endpoint':<24}{'requests':>9}{'errors':>8}{'p50_ms':>9}"
+            f"{'p95_ms':>9}{'p99_ms':>9}{'sql_avg':>9}{'sql_max':>9}"
+        )
+        for endpoint, samples in by_endpoint.items():
+            latencies = [seconds for seconds, _, _ in samples]
+            queries = [count for _, count, _ in samples]
+            errors = sum(status >= 400 for _, _, status in samples)
+            self.stdout.write(
+                f"{endpoint:<24}{len(samples):>9}{errors:>8}"
+                f"{stats.percentile(latencies, 50) * 1000:>9.1f}"
+                f"{stats.percentile(latencies, 95) * 1000:>9.1f}"
+                f"{stats.percentile(latencies, 99) * 1000:>9.1f}"
+                f"{sum(queries) / len(queries):>9.1f}{max(queries):>9}"
+            )
+        self.stdout.write(
+            f"{len(results)} requests in {wall_seconds:.1f}s"
+            f" ({len(results) / wall_seconds:.1f} requests/s)"
+        )
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.bot import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the queued fan-out jobs, the fan-outs of new proposals and"
+        " the revisions of edited ones, by priority and voting deadline."
+        " Several workers can run at once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=5.0,
+            help="The seconds to wait when the queue is empty.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exits once the queue is empty instead of waiting.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            job = jobs.process_job()
+            if job is not None:
+                self.stdout.write(f"Job {job}: {job.status}.")
+                continue
+            if options["once"]:
+                return
+            time.sleep(options["poll_interval"])
@@ -0,0 +1,45 @@
+import time
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand
+
+from apps.bot import runs
+
+
+class Command(BaseCommand):
+    help = (
+        "Carries out the shards of fan-out runs, soonest voting deadline"
+        " first, and resumes the shards of crashed workers. Any number of"
+        " workers can run at once, on any number of nodes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=None,
+            help="The number of clusters processed at once per shard.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=5.0,
+            help="The seconds to wait when no shard is due.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exits once no shard is due instead of waiting.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            shard = async_to_sync(runs.aprocess_next_shard)(
+                options["concurrency"]
+            )
+            if shard is not None:
+                self.stdout.write(f"Shard {shard} processed.")
+                continue
+            if options["once"]:
+                return
+            time.sleep(options["poll_interval"])
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from apps.bot import sync
+
+
+class Command(BaseCommand):
+    help = (
+        "Pulls the Snapshot proposals created since the last run into the"
+        " local mirror and enqueues the fan-out of those that have not"
+        " been processed yet. Meant to run periodically as a fallback for"
+        " lost webhooks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=100,
+            help="The number of proposals requested per page.",
+        )
+        parser.add_argument(
+            "--max-pages",
+            type=int,
+            help="Stops after this many pages; the next run resumes.",
+        )
+        parser.add_argument(
+            "--no-fan-out",
+            action="store_true",
+            help="Only updates the mirror.",
+        )
+
+    def handle(self, *args, **options):
+        mirrored = sync.sync_proposals(
+            page_size=options["page_size"], max_pages=options["max_pages"]
+        )
+        self.stdout.write(f"Mirrored {mirrored} proposals.")
+        if not options["no_fan_out"]:
+            enqueued = sync.fan_out_pending()
+            self.stdout.write(f"Enqueued {enqueued} fan-outs.")
@@ -0,0 +1,165 @@
+import os
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+
+# Buckets span a fast database write (a few milliseconds) up to a slow
+# language model completion (a couple of minutes).
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
+STAGE_LATENCY = Histogram(
+    "diplomat_pipeline_stage_seconds",
+    "Time spent in each stage of the recommendation pipeline.",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_ERRORS = Counter(
+    "diplomat_pipeline_stage_errors_total",
+    "Number of exceptions raised by each stage of the recommendation"
+    " pipeline.",
+    ["stage"],
+)
+STAGE_IN_FLIGHT = Gauge(
+    "diplomat_pipeline_stage_in_flight",
+    "Number of pipeline stages currently executing.",
+    ["stage"],
+    multiprocess_mode="livesum",
+)
+COMPLETION_TOKENS = Counter(
+    "diplomat_completion_tokens_total",
+    "Number of tokens consumed by language model completions.",
+    ["model", "kind"],
+)
+RECOMMENDATIONS = Counter(
+    "diplomat_recommendations_total",
+    "Number of recommendations written.",
+    ["model"],
+)
+MODEL_ROUTES = Counter(
+    "diplomat_model_routes_total",
+    "Number of completions per model of the profile and model chosen by"
+    " the routing policy.",
+    ["requested", "chosen"],
+)
+COMPLETION_HEDGES = Counter(
+    "diplomat_completion_hedges_total",
+    "Number of hedged completions per provider and model, by the copy"
+    " that answered first.",
+    ["model", "winner"],
+)
+PROFILES_FILTERED = Counter(
+    "diplomat_relevance_filtered_profiles_total",
+    "Number of candidate profiles skipped by the relevance filter.",
+)
+
+
+@contextmanager
+def track_stage(stage: str):
+    """
+    Measures a block of the recommendation pipeline.
+
+    The block's duration is observed in the stage latency histogram,
+    the in-flight gauge is held for as long as the block runs and any
+    exception raised by the block is counted before being re-raised.
+
+    Parameters:
+    -----------
+    stage : str
+        The name of the pipeline stage, used as the `stage` label.
+    """
+    STAGE_IN_FLIGHT.labels(stage).inc()
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_LATENCY.labels(stage).observe(time.perf_counter() - start)
+        STAGE_IN_FLIGHT.labels(stage).dec()
+
+
+@contextmanager
+def track_queries(stage: str):
+    """
+    Measures every SQL query executed on the default connection within
+    the block as the given stage.
+
+    Unlike `track_stage`, only the time spent executing queries is
+    observed, so work done by signal receivers between queries (such as
+    sending an email) is not attributed to the database.
+
+    Parameters:
+    -----------
+    stage : str
+        The name of the pipeline stage, used as the `stage` label.
+    """
+
+    def wrapper(execute, sql, params, many, context):
+        with track_stage(stage):
+            return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield
+
+
+def record_usage(model: str, usage):
+    """
+    Counts the tokens reported by a completion.
+
+    Parameters:
+    -----------
+    model : str
+        The model that produced the completion.
+    usage : CompletionResponse.Usage
+        The token usage reported by the provider.
+    """
+    COMPLETION_TOKENS.labels(model, "prompt").inc(usage.prompt_tokens)
+    COMPLETION_TOKENS.labels(model, "completion").inc(usage.completion_tokens)
+
+
+def render_latest():
+    """
+    Renders all registered metrics in the Prometheus text format.
+
+    When the `PROMETHEUS_MULTIPROC_DIR` environment variable is set
+    (for instance when running several gunicorn workers), the samples
+    of every worker process are aggregated.
+
+    Returns:
+    --------
+    tuple[bytes, str]:
+        The rendered metrics and their content type.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.4 on 2026-10-19 07:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bot", "0002_remove_recommendation_completion_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Proposal",
+            fields=[
+                (
+                    "id",
+                    models.CharField(
+                        max_length=128, primary_key=True, serialize=False
+                    ),
+                ),
+                ("space_id", models.CharField(db_index=True, max_length=128)),
+                ("title", models.TextField()),
+                ("body", models.TextField()),
+                ("state", models.CharField(max_length=16)),
+                ("created", models.DateTimeField(db_index=True)),
+                ("start", models.DateTimeField()),
+                ("end", models.DateTimeField()),
+                ("data", models.JSONField()),
+                ("processed_at", models.DateTimeField(blank=True, null=True)),
+                ("synced_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="SyncCursor",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=64, unique=True)),
+                ("value", models.BigIntegerField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="recommendation",
+            name="snapshot_proposal",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="bot.proposal",
+            ),
+        ),
+    ]
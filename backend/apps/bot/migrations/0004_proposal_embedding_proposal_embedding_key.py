@@ -0,0 +1,22 @@
+# Generated by Django 4.2.4 on 2026-10-19 08:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bot", "0003_proposal_synccursor_recommendation_snapshot_proposal"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="proposal",
+            name="embedding",
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AddField(
+            model_name="proposal",
+            name="embedding_key",
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+    ]
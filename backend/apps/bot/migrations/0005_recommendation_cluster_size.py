@@ -0,0 +1,17 @@
+# Generated by Django 4.2.4 on 2026-10-19 08:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bot", "0004_proposal_embedding_proposal_embedding_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recommendation",
+            name="cluster_size",
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,149 @@
+# Generated by Django 4.2.4 on 2026-10-19 08:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bot", "0005_recommendation_cluster_size"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="proposal",
+            name="body_hash",
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name="recommendation",
+            name="proposal_hash",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name="recommendation",
+            name="revised_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="recommendation",
+            name="version",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.CreateModel(
+            name="RecommendationVersion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.PositiveIntegerField()),
+                ("proposal", models.JSONField()),
+                (
+                    "proposal_hash",
+                    models.CharField(blank=True, max_length=64, null=True),
+                ),
+                ("content", models.TextField()),
+                ("usage", models.JSONField()),
+                ("cluster_size", models.PositiveIntegerField(default=1)),
+                ("created_at", models.DateTimeField()),
+                (
+                    "recommendation",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="versions",
+                        to="bot.recommendation",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="FanOutJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("fan_out", "Fan Out"),
+                            ("revision", "Revision"),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                (
+                    "priority",
+                    models.PositiveSmallIntegerField(
+                        choices=[(0, "High"), (5, "Normal"), (10, "Low")],
+                        default=5,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("done", "Done"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=16,
+                    ),
+                ),
+                ("body_hash", models.CharField(max_length=64)),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("last_error", models.TextField(blank=True)),
+                (
+                    "available_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("completed_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "proposal",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="fan_out_jobs",
+                        to="bot.proposal",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="recommendationversion",
+            constraint=models.UniqueConstraint(
+                fields=("recommendation", "version"),
+                name="unique_recommendation_version",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="fanoutjob",
+            index=models.Index(
+                fields=["status", "priority", "available_at"],
+                name="fan_out_job_queue",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="fanoutjob",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status", "pending")),
+                fields=("proposal", "kind"),
+                name="unique_pending_fan_out_job",
+            ),
+        ),
+    ]
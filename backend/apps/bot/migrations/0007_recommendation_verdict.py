@@ -0,0 +1,48 @@
+# Generated by Django 4.2.4 on 2026-10-19 08:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bot", "0006_proposal_revisions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recommendation",
+            name="verdict",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("true", "True"),
+                    ("false", "False"),
+                    ("not_enough_info", "Not enough info"),
+                ],
+                db_index=True,
+                max_length=16,
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="recommendationversion",
+            name="verdict",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("true", "True"),
+                    ("false", "False"),
+                    ("not_enough_info", "Not enough info"),
+                ],
+                max_length=16,
+                null=True,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recommendation",
+            index=models.Index(
+                fields=["account", "verdict"],
+                name="recommendation_account_verdict",
+            ),
+        ),
+    ]
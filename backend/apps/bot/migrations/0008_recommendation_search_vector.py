@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# The search vector of a recommendation is generated by Postgres from the
+# proposal title (weight A), the recommendation (weight B) and the
+# proposal body (weight C). It is not a model field, since Django 4.2
+# would try to write it; `apps.bot.search` reads it instead.
+SEARCH_VECTOR = """
+    setweight(to_tsvector('english'::regconfig, coalesce(proposal ->> 'title', '')), 'A')
+    || setweight(to_tsvector('english'::regconfig, coalesce(recommendation, '')), 'B')
+    || setweight(to_tsvector('english'::regconfig, coalesce(proposal ->> 'body', '')), 'C')
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bot", "0007_recommendation_verdict"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=f"""
+            ALTER TABLE bot_recommendation
+            ADD COLUMN search_vector tsvector
+            GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED;
+            """,
+            reverse_sql="""
+            ALTER TABLE bot_recommendation DROP COLUMN search_vector;
+            """,
+        ),
+        migrations.RunSQL(
+            sql="""
+            CREATE INDEX recommendation_search_vector
+            ON bot_recommendation USING GIN (search_vector);
+            """,
+            reverse_sql="DROP INDEX recommendation_search_vector;",
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.4 on 2026-10-19 08:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bot", "0008_recommendation_search_vector"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="fanoutjob",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("running", "Running"),
+                    ("done", "Done"),
+                    ("failed", "Failed"),
+                    ("skipped", "Skipped"),
+                ],
+                default="pending",
+                max_length=16,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="proposal",
+            name="state",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("active", "Active"),
+                    ("closed", "Closed"),
+                    ("deleted", "Deleted"),
+                ],
+                max_length=16,
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.4 on 2026-10-19 08:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bot", "0010_fan_out_runs"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recommendation",
+            name="model",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name="recommendationversion",
+            name="model",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
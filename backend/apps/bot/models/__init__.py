@@ -1 +1,4 @@
-from .recommendation import Recommendation
+from .job import FanOutJob
+from .proposal import Proposal, SyncCursor
+from .recommendation import Recommendation, RecommendationVersion
+from .run import FanOutRun, FanOutShard
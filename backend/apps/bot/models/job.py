@@ -0,0 +1,108 @@
+from django.db import models
+from django.utils import timezone
+
+from .proposal import Proposal
+
+
+class FanOutJob(models.Model):
+    """
+    Represents a fan-out of a proposal that is carried out in the
+    background by the `process_fan_out_jobs` command.
+
+    Jobs are claimed by priority, then by the end of their proposal's
+    voting, then by when they became available, with `SELECT ... FOR
+    UPDATE SKIP LOCKED`, so that several workers never run the same
+    job. Jobs whose proposal closed before they were claimed are
+    skipped. A claimed job is leased to its worker and
+    is claimed again if the worker dies before the lease expires. At
+    most one job of each kind is pending per proposal, so that repeated
+    edits of a proposal are coalesced into a single revision.
+
+    Attributes:
+    -----------
+    proposal : ForeignKey
+        The mirrored proposal to fan out.
+    kind : CharField
+        Either a revision, which regenerates the stale recommendations
+        of an edited proposal, or a complete fan-out.
+    priority : PositiveSmallIntegerField
+        Jobs with a lower priority value are claimed first. Revisions
+        are low priority.
+    status : CharField
+        Whether the job is pending, running, done, failed or skipped.
+    body_hash : CharField
+        The digest of the proposal's title and body the job was
+        enqueued for.
+    attempts : PositiveIntegerField
+        The number of times the job was claimed.
+    last_error : TextField
+        The error of the last failed attempt.
+    available_at : DateTimeField
+        When the job can be claimed next. For running jobs, when their
+        lease expires.
+    created_at : DateTimeField
+        Timestamp of when the job was enqueued.
+    completed_at : DateTimeField
+        Timestamp of when the job succeeded or failed for good.
+
+    Methods:
+    --------
+    __str__() -> str:
+        Returns the kind and the proposal of the job.
+    """
+
+    class KindChoices(models.TextChoices):
+        FAN_OUT = "fan_out"
+        REVISION = "revision"
+
+    class PriorityChoices(models.IntegerChoices):
+        HIGH = 0
+        NORMAL = 5
+        LOW = 10
+
+    class StatusChoices(models.TextChoices):
+        PENDING = "pending"
+        RUNNING = "running"
+        DONE = "done"
+        FAILED = "failed"
+        SKIPPED = "skipped"
+
+    proposal = models.ForeignKey(
+        Proposal,
+        on_delete=models.CASCADE,
+        related_name="fan_out_jobs",
+    )
+    kind = models.CharField(max_length=16, choices=KindChoices.choices)
+    priority = models.PositiveSmallIntegerField(
+        choices=PriorityChoices.choices,
+        default=PriorityChoices.NORMAL,
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=StatusChoices.choices,
+        default=StatusChoices.PENDING,
+    )
+    body_hash = models.CharField(max_length=64)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["proposal", "kind"],
+                condition=models.Q(status="pending"),
+                name="unique_pending_fan_out_job",
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["status", "priority", "available_at"],
+                name="fan_out_job_queue",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.proposal_id}"
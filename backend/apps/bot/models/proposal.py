@@ -0,0 +1,134 @@
+import datetime
+import hashlib
+
+from django.db import models
+
+
+class Proposal(models.Model):
+    """
+    Represents a local mirror of a Snapshot proposal.
+
+    Proposals are mirrored when they are received through the Snapshot
+    webhook and by the incremental sync job, which pulls proposals that
+    were created since the last sync. The mirror records whether the
+    proposal has been fanned out to the users, so that a proposal is
+    never processed twice, whichever path saw it first.
+
+    Attributes:
+    -----------
+    id : CharField
+        The Snapshot identifier of the proposal.
+    space_id : CharField
+        The Snapshot identifier of the space the proposal belongs to.
+    title : TextField
+        The title of the proposal.
+    body : TextField
+        The body of the proposal.
+    state : CharField
+        The Snapshot state of the proposal (pending, active or closed),
+        or deleted once Snapshot reports its deletion.
+    created : DateTimeField
+        When the proposal was created on Snapshot.
+    start : DateTimeField
+        When voting on the proposal starts.
+    end : DateTimeField
+        When voting on the proposal ends.
+    data : JSONField
+        The proposal as returned by the Snapshot API.
+    processed_at : DateTimeField
+        When the proposal was claimed for fan-out, or null if it has not
+        been fanned out yet.
+    synced_at : DateTimeField
+        When the mirror was last updated.
+    embedding : BinaryField
+        The embedding of the title and body as little-endian float32.
+    embedding_key : CharField
+        The digest of the text and embedder the embedding was made from.
+    body_hash : CharField
+        The digest of the title and body, compared on every fetch to
+        detect edits.
+
+    Methods:
+    --------
+    from_snapshot(proposal: dict) -> Proposal:
+        Builds an unsaved instance from a Snapshot API proposal.
+
+    content_hash(proposal: dict) -> str:
+        Returns the digest of the title and body of a Snapshot API
+        proposal, ignoring changes in whitespace.
+    """
+
+    class StateChoices(models.TextChoices):
+        PENDING = "pending"
+        ACTIVE = "active"
+        CLOSED = "closed"
+        DELETED = "deleted"
+
+    id = models.CharField(max_length=128, primary_key=True)
+    space_id = models.CharField(max_length=128, db_index=True)
+    title = models.TextField()
+    body = models.TextField()
+    state = models.CharField(max_length=16, choices=StateChoices.choices)
+    created = models.DateTimeField(db_index=True)
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    data = models.JSONField()
+    processed_at = models.DateTimeField(null=True, blank=True)
+    synced_at = models.DateTimeField(auto_now=True)
+    embedding = models.BinaryField(null=True, editable=False)
+    embedding_key = models.CharField(max_length=64, null=True, editable=False)
+    body_hash = models.CharField(max_length=64, null=True, editable=False)
+
+    @classmethod
+    def from_snapshot(cls, proposal: dict):
+        def timestamp(value):
+            return datetime.datetime.fromtimestamp(value, tz=datetime.UTC)
+
+        return cls(
+            id=proposal["id"],
+            space_id=proposal["space"]["id"],
+            title=proposal["title"],
+            body=proposal["body"],
+            state=proposal["state"],
+            created=timestamp(proposal["created"]),
+            start=timestamp(proposal["start"]),
+            end=timestamp(proposal["end"]),
+            data=proposal,
+            body_hash=cls.content_hash(proposal),
+        )
+
+    @staticmethod
+    def content_hash(proposal: dict) -> str:
+        return hashlib.sha256(
+            "\n".join(
+                " ".join(proposal[field].split())
+                for field in ("title", "body")
+            ).encode()
+        ).hexdigest()
+
+    def __str__(self):
+        return self.title
+
+
+class SyncCursor(models.Model):
+    """
+    Represents the position of an incremental sync job.
+
+    Attributes:
+    -----------
+    name : CharField
+        The name of the sync job.
+    value : BigIntegerField
+        The position the next run resumes from. For the Snapshot
+        proposal sync, this is the `created` timestamp of the newest
+        proposal seen so far.
+    updated_at : DateTimeField
+        When the cursor last moved.
+    """
+
+    name = models.CharField(max_length=64, unique=True)
+    value = models.BigIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}={self.value}"
@@ -1,8 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
+from apps.bot import verdicts
 from apps.users.models import Profile
 
+from .proposal import Proposal
+
 
 class Recommendation(models.Model):
     """
@@ -28,17 +32,59 @@ class Recommendation(models.Model):
     proposal : JSONField
         A JSON-structured field that captures the initial proposal or
         input that led to this recommendation.
+    snapshot_proposal : ForeignKey
+        The mirrored Snapshot proposal the recommendation was made for.
+        Null for recommendations created before proposals were
+        mirrored.
     recommendation : TextField
         A field that captures the output or result of the recommendation
         process, which can be the direct response from a language model
         or other algorithms.
+    verdict : CharField
+        Whether the recommendation is to pass the proposal, to reject it
+        or that there is not enough info, extracted when the
+        recommendation is written. Null if it could not be extracted.
+        Indexed, alone and per account, so that verdicts are counted
+        and filtered without reading the recommendations.
+    model : CharField
+        The model that generated the completion, as chosen by the
+        routing policy of `apps.bot.completions`. Null for
+        recommendations generated before completions were routed.
     usage : JSONField
         A JSON-structured field that captures the token usage that the
-        completion api call incurred.
+        completion api call incurred. When a completion is shared by a
+        cluster of near-duplicate profiles, the tokens are only counted
+        on the first recommendation of the cluster.
+    cluster_size : PositiveIntegerField
+        The number of profiles sharing the completion.
+    proposal_hash : CharField
+        The digest of the proposal's title and body the recommendation
+        was generated from. A recommendation is stale once the proposal
+        is edited.
+    version : PositiveIntegerField
+        The number of times the recommendation was generated. Earlier
+        versions are kept as `RecommendationVersion` rows.
     created_at : DateTimeField
         The timestamp when the recommendation was created.
+    revised_at : DateTimeField
+        The timestamp when the recommendation was last regenerated or
+        edited through the API, or null if it never was.
+
+    Methods:
+    --------
+    revise(**fields) -> None:
+        Archives the current version and replaces it with the given
+        fields.
     """
 
+    class VerdictChoices(models.TextChoices):
+        TRUE = verdicts.TRUE, verdicts.LABELS[verdicts.TRUE]
+        FALSE = verdicts.FALSE, verdicts.LABELS[verdicts.FALSE]
+        NOT_ENOUGH_INFO = (
+            verdicts.NOT_ENOUGH_INFO,
+            verdicts.LABELS[verdicts.NOT_ENOUGH_INFO],
+        )
+
     account = models.ForeignKey(
         get_user_model(),
         on_delete=models.CASCADE,
@@ -50,6 +96,124 @@ class Recommendation(models.Model):
         unique=False,
     )
     proposal = models.JSONField()
+    snapshot_proposal = models.ForeignKey(
+        Proposal,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
     recommendation = models.TextField()
+    verdict = models.CharField(
+        max_length=16,
+        choices=VerdictChoices.choices,
+        null=True,
+        blank=True,
+        db_index=True,
+    )
+    model = models.CharField(max_length=64, null=True, blank=True)
     usage = models.JSONField()
+    cluster_size = models.PositiveIntegerField(default=1)
+    proposal_hash = models.CharField(max_length=64, null=True, blank=True)
+    version = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
+    revised_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["account", "verdict"],
+                name="recommendation_account_verdict",
+            )
+        ]
+
+    def revise(self, **fields):
+        """
+        Archives the current version of the recommendation and replaces
+        it with a regenerated one.
+
+        Parameters:
+        -----------
+        **fields : dict
+            The regenerated `proposal`, `recommendation`, `verdict`,
+            `model`, `usage`, `cluster_size` and `proposal_hash`.
+        """
+        with transaction.atomic():
+            RecommendationVersion.objects.create(
+                recommendation=self,
+                version=self.version,
+                proposal=self.proposal,
+                proposal_hash=self.proposal_hash,
+                content=self.recommendation,
+                verdict=self.verdict,
+                model=self.model,
+                usage=self.usage,
+                cluster_size=self.cluster_size,
+                created_at=self.revised_at or self.created_at,
+            )
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+            self.revised_at = timezone.now()
+            self.save(
+                update_fields=[*fields, "version", "revised_at"],
+            )
+
+
+class RecommendationVersion(models.Model):
+    """
+    Represents an earlier version of a recommendation, archived when the
+    recommendation was regenerated for an edited proposal.
+
+    Attributes:
+    -----------
+    recommendation : ForeignKey
+        The recommendation this is a version of.
+    version : PositiveIntegerField
+        The version number, starting at 1.
+    proposal : JSONField
+        The title and body of the proposal the version was generated
+        from.
+    proposal_hash : CharField
+        The digest of the proposal's title and body, or null for
+        versions generated before proposals were hashed.
+    content : TextField
+        The recommendation of this version.
+    verdict : CharField
+        The verdict of this version.
+    model : CharField
+        The model that generated this version.
+    usage : JSONField
+        The token usage of the completion of this version.
+    cluster_size : PositiveIntegerField
+        The number of profiles that shared the completion.
+    created_at : DateTimeField
+        The timestamp when the version was generated.
+    """
+
+    recommendation = models.ForeignKey(
+        Recommendation,
+        on_delete=models.CASCADE,
+        related_name="versions",
+    )
+    version = models.PositiveIntegerField()
+    proposal = models.JSONField()
+    proposal_hash = models.CharField(max_length=64, null=True, blank=True)
+    content = models.TextField()
+    verdict = models.CharField(
+        max_length=16,
+        choices=Recommendation.VerdictChoices.choices,
+        null=True,
+        blank=True,
+    )
+    model = models.CharField(max_length=64, null=True, blank=True)
+    usage = models.JSONField()
+    cluster_size = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recommendation", "version"],
+                name="unique_recommendation_version",
+            )
+        ]
@@ -0,0 +1,163 @@
+from django.db import models
+from django.utils import timezone
+
+from .job import FanOutJob
+from .proposal import Proposal
+
+
+class FanOutRun(models.Model):
+    """
+    Represents the fan-out of a proposal to a planned set of profiles.
+
+    When a fan-out starts, the relevant profiles are clustered once and
+    the clusters are partitioned into `FanOutShard` rows, which any
+    number of processes claim and carry out. The run is the ledger of
+    that work: it records what was planned and, through its shards,
+    what was done, so that a fan-out interrupted by a crash resumes
+    where it stopped instead of starting over.
+
+    Attributes:
+    -----------
+    proposal : ForeignKey
+        The mirrored proposal being fanned out.
+    job : ForeignKey
+        The job that started the run, if any. A retried job resumes
+        its run.
+    revise : BooleanField
+        Whether the run regenerates existing recommendations instead of
+        creating new ones.
+    body_hash : CharField
+        The digest of the proposal's title and body the run was planned
+        for.
+    status : CharField
+        Whether the run is running, done, or done with failed shards.
+    shard_count : PositiveIntegerField
+        The number of shards the run was partitioned into.
+    profile_count : PositiveIntegerField
+        The number of profiles the run was planned for.
+    created_at : DateTimeField
+        Timestamp of when the run was planned.
+    completed_at : DateTimeField
+        Timestamp of when the last shard finished.
+
+    Methods:
+    --------
+    __str__() -> str:
+        Returns the proposal and the primary key of the run.
+    """
+
+    class StatusChoices(models.TextChoices):
+        RUNNING = "running"
+        DONE = "done"
+        FAILED = "failed"
+
+    proposal = models.ForeignKey(
+        Proposal,
+        on_delete=models.CASCADE,
+        related_name="fan_out_runs",
+    )
+    job = models.ForeignKey(
+        FanOutJob,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="runs",
+    )
+    revise = models.BooleanField(default=False)
+    body_hash = models.CharField(max_length=64)
+    status = models.CharField(
+        max_length=16,
+        choices=StatusChoices.choices,
+        default=StatusChoices.RUNNING,
+    )
+    shard_count = models.PositiveIntegerField(default=0)
+    profile_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.proposal_id} run {self.pk}"
+
+
+class FanOutShard(models.Model):
+    """
+    Represents a part of a fan-out run, claimed and carried out by one
+    worker at a time.
+
+    Shards are claimed with `SELECT ... FOR UPDATE SKIP LOCKED` and
+    leased to their worker, which renews the lease at every checkpoint.
+    A shard whose worker died is claimed again once its lease expires
+    and resumes from its checkpoint.
+
+    Attributes:
+    -----------
+    run : ForeignKey
+        The run the shard belongs to.
+    index : PositiveIntegerField
+        The position of the shard in the run.
+    clusters : JSONField
+        The clusters of the shard, as lists of profile primary keys,
+        in the order they are processed.
+    checkpoint : PositiveIntegerField
+        The number of leading clusters that are done.
+    status : CharField
+        Whether the shard is pending, running, done, failed, or skipped
+        because voting ended.
+    profiles_done : PositiveIntegerField
+        The number of profiles that were processed successfully.
+    profiles_failed : PositiveIntegerField
+        The number of profiles whose recommendation failed in the
+        latest attempt. They are retried by the next attempt.
+    attempts : PositiveIntegerField
+        The number of times the shard was claimed.
+    last_error : TextField
+        The error that interrupted the last attempt.
+    available_at : DateTimeField
+        When the shard can be claimed next. For running shards, when
+        their lease expires.
+    completed_at : DateTimeField
+        Timestamp of when the shard finished.
+    """
+
+    class StatusChoices(models.TextChoices):
+        PENDING = "pending"
+        RUNNING = "running"
+        DONE = "done"
+        FAILED = "failed"
+        SKIPPED = "skipped"
+
+    run = models.ForeignKey(
+        FanOutRun,
+        on_delete=models.CASCADE,
+        related_name="shards",
+    )
+    index = models.PositiveIntegerField()
+    clusters = models.JSONField()
+    checkpoint = models.PositiveIntegerField(default=0)
+    status = models.CharField(
+        max_length=16,
+        choices=StatusChoices.choices,
+        default=StatusChoices.PENDING,
+    )
+    profiles_done = models.PositiveIntegerField(default=0)
+    profiles_failed = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["run", "index"], name="unique_fan_out_shard"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["status", "available_at"],
+                name="fan_out_shard_queue",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.run_id}/{self.index}"
@@ -7,6 +7,8 @@ from django.core.mail import send_mail
 import markdown
 
 from .recommendation import Recommendation
+from apps.bot import realtime
+from apps.bot.metrics import track_stage
 
 
 @receiver(post_save, sender=Recommendation)
@@ -54,13 +56,35 @@ def send_recommendation_summary_email(
                 total_tokens=instance.usage["total_tokens"],
             )
 
-        send_mail(
-            subject=(
-                "Diplomat proposal recommendation for"
-                f" {instance.proposal['title']}"
-            ),
-            message=email,
-            from_email=settings.EMAIL_HOST,
-            recipient_list=[instance.account.email],
-            html_message=markdown.markdown(email),
-        )
+        with track_stage("email"):
+            send_mail(
+                subject=(
+                    "Diplomat proposal recommendation for"
+                    f" {instance.proposal['title']}"
+                ),
+                message=email,
+                from_email=settings.EMAIL_HOST,
+                recipient_list=[instance.account.email],
+                html_message=markdown.markdown(email),
+            )
+
+
+@receiver(post_save, sender=Recommendation)
+def notify_recommendation(sender, instance: Recommendation, created, **kwargs):
+    """
+    Announces a new recommendation to the open streams of its account,
+    in every process (see `apps.bot.realtime`).
+
+    Args:
+    ----
+    sender : Model
+        The model class that triggered the signal.
+    instance : Recommendation
+        The actual instance of `Recommendation` that got saved.
+    created : bool
+        A flag indicating if the instance was created or just updated.
+    **kwargs : dict
+        Additional keyword arguments passed by the signal trigger.
+    """
+    if created:
+        realtime.notify(instance)
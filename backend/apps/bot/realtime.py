@@ -0,0 +1,212 @@
+"""
+Real-time push of new recommendations.
+
+Recommendations are created by whichever process runs the fan-out, so
+they are announced through Postgres: every new recommendation is sent
+with `NOTIFY` on `CHANNEL` (see `apps.bot.models.signals`). Each ASGI
+process keeps a single `Hub`, whose listener task holds one connection
+that `LISTEN`s on the channel and hands every notification to the
+queues of the affected account's open streams. An idle stream costs a
+queue and a suspended coroutine, and no database connection, so a
+process can hold tens of thousands of them.
+"""
+
+import asyncio
+import json
+import logging
+from collections import defaultdict
+
+import psycopg
+from django.conf import settings
+from django.db import connections
+
+from apps.bot.models import Recommendation
+
+logger = logging.getLogger(__name__)
+
+# The Postgres notification channel of new recommendations.
+CHANNEL = "diplomat_recommendations"
+
+# The seconds to wait before listening again after the connection of
+# the listener was lost.
+RECONNECT_DELAY = 5
+
+# The milliseconds clients wait before reopening a closed stream.
+RETRY = 3000
+
+
+def payload(recommendation: Recommendation) -> dict:
+    """
+    Describes a new recommendation for its account's streams. The
+    description is small, to fit in a notification; clients fetch the
+    recommendation itself from the API.
+    """
+    return {
+        "id": recommendation.pk,
+        "account": recommendation.account_id,
+        "snapshot_proposal": recommendation.snapshot_proposal_id,
+        "verdict": recommendation.verdict,
+        "created_at": recommendation.created_at.isoformat(),
+    }
+
+
+def notify(recommendation: Recommendation):
+    """
+    Announces a new recommendation to every process. Inside a
+    transaction, the notification is only delivered once it commits.
+    """
+    with connections["default"].cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_notify(%s, %s)",
+            [CHANNEL, json.dumps(payload(recommendation))],
+        )
+
+
+def conninfo() -> dict:
+    """
+    Returns the connection parameters of the listener: the
+    `REALTIME["DATABASE_URL"]` if set, since `LISTEN` needs a session
+    and does not work through a transaction pooler, or else those of
+    the default database.
+    """
+    if settings.REALTIME["DATABASE_URL"]:
+        return {"conninfo": settings.REALTIME["DATABASE_URL"]}
+    return {
+        name: value
+        for name, value in connections["default"]
+        .get_connection_params()
+        .items()
+        if name not in ("context", "cursor_factory")
+    }
+
+
+class Hub:
+    """
+    Dispatches the notifications of new recommendations to the streams
+    of their account, within one process.
+
+    The listener task is started by the first subscription, on the
+    event loop of the server, and reconnects after `RECONNECT_DELAY`
+    seconds whenever its connection is lost. Notifications sent in the
+    meantime are missed, so clients refresh their recommendations when
+    their stream reconnects.
+
+    Methods:
+    --------
+    subscribe(account_id: int) -> asyncio.Queue:
+        Opens a stream of the recommendations of an account.
+
+    unsubscribe(account_id: int, queue: asyncio.Queue) -> None:
+        Closes a stream.
+
+    publish(event: dict) -> None:
+        Hands a notification to the streams of its account.
+    """
+
+    def __init__(self):
+        self.streams = defaultdict(set)
+        self.listener = None
+
+    def subscribe(self, account_id: int) -> asyncio.Queue:
+        """
+        Opens a stream of the recommendations of an account. Streams
+        that fall behind by `REALTIME["QUEUE_SIZE"]` events miss the
+        following ones.
+        """
+        loop = asyncio.get_running_loop()
+        if (
+            self.listener is None
+            or self.listener.done()
+            or self.listener.get_loop() is not loop
+        ):
+            self.listener = loop.create_task(self.listen())
+        queue = asyncio.Queue(maxsize=settings.REALTIME["QUEUE_SIZE"])
+        self.streams[account_id].add(queue)
+        return queue
+
+    def unsubscribe(self, account_id: int, queue: asyncio.Queue):
+        """Closes a stream."""
+        streams = self.streams.get(account_id)
+        if streams is None:
+            return
+        streams.discard(queue)
+        if not streams:
+            del self.streams[account_id]
+
+    def publish(self, event: dict):
+        """Hands a notification to the streams of its account."""
+        for queue in list(self.streams.get(event["account"], ())):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                logger.warning(
+                    "Dropped a notification for account %s", event["account"]
+                )
+
+    async def listen(self):
+        """Listens for notifications for as long as there are streams."""
+        while self.streams:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    **conninfo(), autocommit=True
+                ) as connection:
+                    await connection.execute(f"LISTEN {CHANNEL}")
+                    logger.info("Listening for new recommendations")
+                    async for notification in connection.notifies():
+                        try:
+                            self.publish(json.loads(notification.payload))
+                        except (ValueError, KeyError, TypeError):
+                            logger.warning(
+                                "Ignoring notification %r",
+                                notification.payload,
+                            )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Lost the recommendation listener")
+                await asyncio.sleep(RECONNECT_DELAY)
+
+
+hub = Hub()
+
+
+async def astream(account_id: int):
+    """
+    Streams the new recommendations of an account as server-sent
+    events, with a comment every `REALTIME["HEARTBEAT"]` seconds while
+    there are none. The stream ends after `REALTIME["STREAM_TIMEOUT"]`
+    seconds, since a client that went away is only noticed then, and
+    the client reopens it after `RETRY` milliseconds.
+
+    Parameters:
+    -----------
+    account_id : int
+        The primary key of the account.
+
+    Yields:
+    -------
+    str:
+        The events, each with the primary key of the recommendation as
+        its id and the `payload` of the recommendation as its data.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.REALTIME["STREAM_TIMEOUT"]
+    queue = hub.subscribe(account_id)
+    try:
+        yield f"retry: {RETRY}\n\n"
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                event = await asyncio.wait_for(
+                    queue.get(),
+                    min(remaining, settings.REALTIME["HEARTBEAT"]),
+                )
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield (
+                f"id: {event['id']}\n"
+                "event: recommendation\n"
+                f"data: {json.dumps(event)}\n\n"
+            )
+    finally:
+        hub.unsubscribe(account_id, queue)
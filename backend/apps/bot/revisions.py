@@ -0,0 +1,151 @@
+"""
+Detection of edited proposals.
+
+Snapshot proposals can be edited until voting starts. Every fetched
+proposal is mirrored, and `enqueue_revisions` compares the digest of
+its title and body with the one stored on the mirror. When a proposal
+that was already fanned out changes significantly, a low-priority
+revision job regenerates the recommendations made from the previous
+text, and only those.
+"""
+
+import logging
+
+import numpy as np
+from django.conf import settings
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.bot.models import FanOutJob, Proposal, Recommendation
+
+from .dedup import shingles
+
+logger = logging.getLogger(__name__)
+
+
+def change_ratio(previous: str, current: str) -> float:
+    """
+    Measures how much a text changed.
+
+    Parameters:
+    -----------
+    previous : str
+        The text before the edit.
+    current : str
+        The text after the edit.
+
+    Returns:
+    --------
+    float:
+        The Jaccard distance between the word shingles of both texts,
+        from 0 for texts that only differ in case, punctuation or
+        whitespace to 1 for texts without a shingle in common.
+    """
+    before, after = shingles(previous), shingles(current)
+    union = np.union1d(before, after).size
+    if not union:
+        return 0.0
+    return 1 - np.intersect1d(before, after).size / union
+
+
+def is_significant(previous: dict, proposal: dict) -> bool:
+    """
+    Whether an edit of a proposal changes enough of its title and body
+    to regenerate its recommendations. See
+    `FAN_OUT["REVISION_MIN_CHANGE"]`.
+    """
+    ratio = change_ratio(
+        f"{previous['title']}\n{previous['body']}",
+        f"{proposal['title']}\n{proposal['body']}",
+    )
+    return ratio >= settings.FAN_OUT["REVISION_MIN_CHANGE"]
+
+
+def enqueue_revisions(previous: dict, proposals: list) -> list:
+    """
+    Enqueues a revision job for every significantly edited proposal.
+
+    Proposals that were never fanned out, or whose voting has ended, are
+    ignored: the former will be fanned out with their current text, and
+    the recommendations of the latter no longer matter. The edit is
+    measured against the text of the latest recommendation rather than
+    the previous fetch, so that a series of minor edits eventually
+    counts as a significant one. Edits of a proposal that already has a
+    pending revision update that job.
+
+    Parameters:
+    -----------
+    previous : dict
+        The mirrored proposals before the update, by identifier.
+    proposals : list
+        The proposals as returned by the Snapshot API.
+
+    Returns:
+    --------
+    list:
+        The enqueued or updated jobs.
+    """
+    jobs = []
+    for proposal in proposals:
+        mirrored = previous.get(proposal["id"])
+        if mirrored is None or mirrored.processed_at is None:
+            continue
+        body_hash = Proposal.content_hash(proposal)
+        previous_hash = mirrored.body_hash or Proposal.content_hash(
+            {"title": mirrored.title, "body": mirrored.body}
+        )
+        if previous_hash == body_hash:
+            continue
+        if mirrored.end <= timezone.now():
+            continue
+        recommended = (
+            Recommendation.objects.filter(snapshot_proposal_id=mirrored.pk)
+            .order_by(Coalesce("revised_at", "created_at").desc())
+            .values_list("proposal", flat=True)
+            .first()
+        )
+        if recommended is None:
+            continue
+        if not is_significant(recommended, proposal):
+            logger.info("Ignoring a minor edit of proposal %s", mirrored.pk)
+            continue
+
+        job, _ = FanOutJob.objects.update_or_create(
+            proposal_id=mirrored.pk,
+            kind=FanOutJob.KindChoices.REVISION,
+            status=FanOutJob.StatusChoices.PENDING,
+            defaults={
+                "priority": FanOutJob.PriorityChoices.LOW,
+                "body_hash": body_hash,
+            },
+        )
+        logger.info("Enqueued a revision of proposal %s", mirrored.pk)
+        jobs.append(job)
+    return jobs
+
+
+def stale_profile_ids(proposal_id: str, body_hash: str) -> list:
+    """
+    Selects the profiles whose recommendation for a proposal was
+    generated from another version of its title and body.
+
+    Parameters:
+    -----------
+    proposal_id : str
+        The Snapshot identifier of the proposal.
+    body_hash : str
+        The digest of the current title and body.
+
+    Returns:
+    --------
+    list:
+        The primary keys of the profiles. Recommendations generated
+        before proposals were hashed are always stale.
+    """
+    return list(
+        Recommendation.objects.filter(snapshot_proposal_id=proposal_id)
+        .exclude(proposal_hash=body_hash)
+        .order_by("profile_id")
+        .values_list("profile_id", flat=True)
+        .distinct()
+    )
@@ -0,0 +1,428 @@
+"""
+Sharded, checkpointed fan-out runs.
+
+`start_run` plans the fan-out of a proposal once, with
+`fanout.plan_fan_out`, and partitions the clusters into `FanOutShard`
+rows of about `FAN_OUT["SHARD_SIZE"]` profiles, keeping each cluster in
+a single shard. Shards are claimed with `SELECT ... FOR UPDATE SKIP
+LOCKED`, so any number of processes, on any number of nodes, can work
+on the same run, and each claim leases the shard for `LEASE` seconds.
+
+While a shard is processed, its checkpoint (the number of leading
+clusters that are done) and its counters are saved after every
+cluster, which also renews the lease. A shard whose worker died is
+claimed again once its lease expires and resumes from its checkpoint.
+The clusters past the checkpoint that finished out of order are
+recognized by their stored recommendations and are not generated
+twice. The checkpoint never passes a cluster with a profile whose
+recommendation failed, and such a shard is retried like a shard
+interrupted by an error, so that only the missing recommendations are
+generated again.
+"""
+
+import asyncio
+import datetime
+import logging
+from typing import Callable, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from apps.bot import fanout
+from apps.bot.models import (
+    FanOutJob,
+    FanOutRun,
+    FanOutShard,
+    Proposal,
+    Recommendation,
+)
+from apps.users.models import Profile
+
+logger = logging.getLogger(__name__)
+
+# The number of attempts after which a shard is marked as failed.
+MAX_ATTEMPTS = 3
+
+# The seconds a claimed shard is reserved for its worker, renewed at
+# every checkpoint, and the delay before the first retry, which doubles
+# with every attempt.
+LEASE = 300
+RETRY_DELAY = 30
+
+# The statuses of shards that are over.
+FINISHED = [
+    FanOutShard.StatusChoices.DONE,
+    FanOutShard.StatusChoices.FAILED,
+    FanOutShard.StatusChoices.SKIPPED,
+]
+
+
+def partition(clusters: list, shard_size: int) -> list:
+    """
+    Splits clusters into consecutive shards of at least `shard_size`
+    profiles, but for the last one. Clusters are never split.
+    """
+    shards, shard, size = [], [], 0
+    for cluster in clusters:
+        shard.append(cluster)
+        size += len(cluster)
+        if size >= shard_size:
+            shards.append(shard)
+            shard, size = [], 0
+    if shard:
+        shards.append(shard)
+    return shards
+
+
+def start_run(
+    proposal: dict,
+    profile_ids: Optional[list] = None,
+    revise: bool = False,
+    job: Optional[FanOutJob] = None,
+) -> FanOutRun:
+    """
+    Plans the fan-out of a proposal and records it as a run.
+
+    Parameters:
+    -----------
+    proposal : dict
+        The proposal as returned by `query_snapshot_proposal`. It must
+        have been mirrored with `apps.bot.sync.mirror_proposals`.
+    profile_ids : list, optional
+        Restricts the fan-out to these profiles. See
+        `fanout.plan_fan_out`.
+    revise : bool, optional
+        Regenerates the existing recommendations of the profiles.
+    job : FanOutJob, optional
+        The job starting the run. If an earlier attempt of the job left
+        a run unfinished, that run is returned instead.
+
+    Returns:
+    --------
+    FanOutRun:
+        The run, whose shards are ready to be claimed.
+    """
+    if job is not None:
+        unfinished = FanOutRun.objects.filter(
+            job=job, status=FanOutRun.StatusChoices.RUNNING
+        ).first()
+        if unfinished is not None:
+            logger.info("Resuming run %s of job %s", unfinished.pk, job.pk)
+            return unfinished
+
+    clusters = fanout.plan_fan_out(proposal, profile_ids)
+    shards = partition(clusters, settings.FAN_OUT["SHARD_SIZE"])
+    with transaction.atomic():
+        run = FanOutRun.objects.create(
+            proposal_id=proposal["id"],
+            job=job,
+            revise=revise,
+            body_hash=Proposal.content_hash(proposal),
+            shard_count=len(shards),
+            profile_count=sum(len(cluster) for cluster in clusters),
+        )
+        FanOutShard.objects.bulk_create(
+            [
+                FanOutShard(run=run, index=index, clusters=shard)
+                for index, shard in enumerate(shards)
+            ]
+        )
+    if not shards:
+        finish_run(run.pk)
+        run.refresh_from_db()
+    logger.info(
+        "Planned run %s of proposal %s: %s profiles in %s shards",
+        run.pk,
+        proposal["id"],
+        run.profile_count,
+        run.shard_count,
+    )
+    return run
+
+
+def claim_shard(run_id: Optional[int] = None) -> Optional[FanOutShard]:
+    """
+    Claims the next shard that is due: pending shards, and running
+    shards whose lease expired, soonest voting deadline first, then in
+    the order of their run.
+
+    Parameters:
+    -----------
+    run_id : int, optional
+        Only claims the shards of this run.
+
+    Returns:
+    --------
+    FanOutShard or None:
+        The claimed shard, with its run and proposal, or None if there
+        is none. Shards locked by another worker are skipped.
+    """
+    now = timezone.now()
+    shards = FanOutShard.objects.filter(
+        status__in=[
+            FanOutShard.StatusChoices.PENDING,
+            FanOutShard.StatusChoices.RUNNING,
+        ],
+        available_at__lte=now,
+    )
+    if run_id is not None:
+        shards = shards.filter(run_id=run_id)
+    with transaction.atomic():
+        shard = (
+            shards.select_for_update(skip_locked=True, of=("self",))
+            .select_related("run__proposal")
+            .order_by("run__proposal__end", "run_id", "index")
+            .first()
+        )
+        if shard is None:
+            return None
+        FanOutShard.objects.filter(pk=shard.pk).update(
+            status=FanOutShard.StatusChoices.RUNNING,
+            attempts=F("attempts") + 1,
+            available_at=now + datetime.timedelta(seconds=LEASE),
+        )
+    shard.status = FanOutShard.StatusChoices.RUNNING
+    shard.attempts += 1
+    return shard
+
+
+def completed_profile_ids(run: FanOutRun, profile_ids: list) -> set:
+    """
+    Selects the profiles of a run that already have their
+    recommendation: any recommendation of the proposal, or for
+    revisions, one generated from the text the run was planned for.
+    """
+    recommendations = Recommendation.objects.filter(
+        snapshot_proposal_id=run.proposal_id, profile_id__in=profile_ids
+    )
+    if run.revise:
+        recommendations = recommendations.filter(proposal_hash=run.body_hash)
+    return set(recommendations.values_list("profile_id", flat=True))
+
+
+class LostLease(Exception):
+    """Raised when another worker claimed a shard after its lease expired."""
+
+
+class ProfilesFailed(Exception):
+    """Raised when the recommendation of profiles of a shard failed."""
+
+
+async def aprocess_shard(
+    shard: FanOutShard,
+    concurrency: Optional[int] = None,
+    on_profile: Optional[
+        Callable[[Profile, float, Optional[Exception]], None]
+    ] = None,
+):
+    """
+    Carries out a claimed shard from its checkpoint.
+
+    Every checkpoint is conditioned on the attempt that claimed the
+    shard, so a worker that lost its lease stops instead of racing the
+    worker that claimed the shard after it, and the clusters it was
+    processing are cancelled. A shard interrupted by an error, or with
+    profiles whose recommendation failed, is made available again after
+    `RETRY_DELAY` seconds, doubled for every previous attempt, and is
+    marked as failed once it reaches `MAX_ATTEMPTS`. The run is finished
+    with its last shard, and fails if any of its shards failed.
+
+    Parameters:
+    -----------
+    shard : FanOutShard
+        The shard, as returned by `claim_shard`.
+    concurrency : int, optional
+        Overrides `FAN_OUT["CONCURRENCY"]`.
+    on_profile : Callable, optional
+        Called after each profile. See `fanout.afan_out_proposal`.
+    """
+    run = shard.run
+    proposal = run.proposal.data
+    remaining = shard.clusters[shard.checkpoint :]
+    completed = await sync_to_async(completed_profile_ids)(
+        run, [pk for cluster in remaining for pk in cluster]
+    )
+    remaining = [
+        [pk for pk in cluster if pk not in completed] for cluster in remaining
+    ]
+
+    positions = {
+        pk: index for index, cluster in enumerate(remaining) for pk in cluster
+    }
+    finished = set()
+    failed_clusters = set()
+    progress = {"checkpoint": shard.checkpoint, "done": 0, "failed": 0}
+    lock = asyncio.Lock()
+
+    def count(profile: Profile, seconds: float, error: Optional[Exception]):
+        progress["failed" if error else "done"] += 1
+        if error is not None:
+            failed_clusters.add(positions[profile.pk])
+        if on_profile is not None:
+            on_profile(profile, seconds, error)
+
+    def save_checkpoint(checkpoint: int, done: int, failed: int):
+        saved = FanOutShard.objects.filter(
+            pk=shard.pk, attempts=shard.attempts
+        ).update(
+            checkpoint=checkpoint,
+            profiles_done=shard.profiles_done + done,
+            profiles_failed=failed,
+            available_at=timezone.now() + datetime.timedelta(seconds=LEASE),
+        )
+        if not saved:
+            raise LostLease(f"Shard {shard} was claimed by another worker")
+
+    async def on_cluster(index: int):
+        async with lock:
+            if index not in failed_clusters:
+                finished.add(index)
+            checkpoint = progress["checkpoint"]
+            while checkpoint - shard.checkpoint in finished:
+                checkpoint += 1
+            progress["checkpoint"] = checkpoint
+            await sync_to_async(save_checkpoint)(
+                checkpoint, progress["done"], progress["failed"]
+            )
+
+    try:
+        dispatched = await fanout.afan_out_clusters(
+            remaining,
+            proposal,
+            concurrency=concurrency,
+            on_profile=count,
+            revise=run.revise,
+            on_cluster=on_cluster,
+        )
+    except LostLease:
+        logger.warning("Abandoning shard %s, whose lease expired", shard)
+        return
+    except Exception as exception:
+        logger.exception("Fan-out shard %s failed", shard)
+        await sync_to_async(fail_shard)(shard, exception)
+        return
+    if dispatched and progress["failed"]:
+        await sync_to_async(fail_shard)(
+            shard,
+            ProfilesFailed(
+                f"The recommendation of {progress['failed']} profiles failed"
+            ),
+        )
+        return
+
+    status = (
+        FanOutShard.StatusChoices.DONE
+        if dispatched
+        else FanOutShard.StatusChoices.SKIPPED
+    )
+    await FanOutShard.objects.filter(
+        pk=shard.pk, attempts=shard.attempts
+    ).aupdate(status=status, last_error="", completed_at=timezone.now())
+    await sync_to_async(finish_run)(run.pk)
+
+
+def fail_shard(shard: FanOutShard, exception: Exception):
+    """
+    Records the error that interrupted a shard, and either schedules
+    its retry or marks it as failed. See `aprocess_shard`.
+    """
+    fields = {"last_error": str(exception) or exception.__class__.__name__}
+    if shard.attempts >= MAX_ATTEMPTS:
+        fields.update(
+            status=FanOutShard.StatusChoices.FAILED,
+            completed_at=timezone.now(),
+        )
+    else:
+        fields.update(
+            status=FanOutShard.StatusChoices.PENDING,
+            available_at=timezone.now()
+            + datetime.timedelta(
+                seconds=RETRY_DELAY * 2 ** (shard.attempts - 1)
+            ),
+        )
+    FanOutShard.objects.filter(pk=shard.pk, attempts=shard.attempts).update(
+        **fields
+    )
+    finish_run(shard.run_id)
+
+
+def finish_run(run_id: int):
+    """
+    Marks a run as done once all of its shards are over, or as failed
+    if any of them failed.
+    """
+    shards = FanOutShard.objects.filter(run_id=run_id)
+    if shards.exclude(status__in=FINISHED).exists():
+        return
+    failed = shards.filter(status=FanOutShard.StatusChoices.FAILED).exists()
+    FanOutRun.objects.filter(
+        pk=run_id, status=FanOutRun.StatusChoices.RUNNING
+    ).update(
+        status=(
+            FanOutRun.StatusChoices.FAILED
+            if failed
+            else FanOutRun.StatusChoices.DONE
+        ),
+        completed_at=timezone.now(),
+    )
+
+
+async def aexecute(
+    run: FanOutRun,
+    concurrency: Optional[int] = None,
+    on_profile: Optional[
+        Callable[[Profile, float, Optional[Exception]], None]
+    ] = None,
+):
+    """
+    Claims and carries out the shards of a run until none is left to
+    claim. Shards held by other workers are left to them.
+    """
+    while shard := await sync_to_async(claim_shard)(run.pk):
+        await aprocess_shard(shard, concurrency, on_profile)
+
+
+async def aprocess_next_shard(
+    concurrency: Optional[int] = None,
+) -> Optional[FanOutShard]:
+    """
+    Claims and carries out the next shard of any run.
+
+    Returns:
+    --------
+    FanOutShard or None:
+        The shard, or None if there is none to claim.
+    """
+    shard = await sync_to_async(claim_shard)()
+    if shard is not None:
+        await aprocess_shard(shard, concurrency)
+    return shard
+
+
+def status(run: FanOutRun) -> dict:
+    """
+    Summarizes the progress of a run from its shards.
+
+    Returns:
+    --------
+    dict:
+        The number of shards per status, the number of profiles that
+        were processed, and the number of profiles that failed in the
+        latest attempt of their shard.
+    """
+    shards = {choice: 0 for choice in FanOutShard.StatusChoices.values}
+    for row in (
+        run.shards.order_by().values("status").annotate(count=Count("pk"))
+    ):
+        shards[row["status"]] = row["count"]
+    totals = run.shards.aggregate(
+        done=Sum("profiles_done"), failed=Sum("profiles_failed")
+    )
+    return {
+        "shards": shards,
+        "profiles_done": totals["done"] or 0,
+        "profiles_failed": totals["failed"] or 0,
+    }
@@ -0,0 +1,56 @@
+"""
+Full-text search over recommendations.
+
+Postgres maintains a generated `search_vector` column on
+`bot_recommendation`, built from the proposal title, the
+recommendation and the proposal body, in decreasing order of weight,
+and indexes it with GIN (see migration 0008). Matching recommendations
+are found through the index rather than by scanning the proposal JSON
+and the recommendation text.
+"""
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVectorField,
+)
+from django.db.models import QuerySet
+from django.db.models.expressions import RawSQL
+
+# The text search configuration the column is generated with. Queries
+# must use the same one to be served by the index.
+CONFIG = "english"
+
+
+def search_recommendations(queryset: QuerySet, query: str) -> QuerySet:
+    """
+    Restricts recommendations to those matching a query, best first.
+
+    Parameters:
+    -----------
+    queryset : QuerySet
+        The recommendations to search.
+    query : str
+        The query, in the syntax of web search engines: words are
+        combined with AND, "quoted phrases" match in order, `or`
+        combines alternatives and `-word` excludes a word.
+
+    Returns:
+    --------
+    QuerySet:
+        The matching recommendations annotated with their `rank`,
+        ordered by decreasing rank, then newest first.
+    """
+    search_query = SearchQuery(query, config=CONFIG, search_type="websearch")
+    return (
+        queryset.annotate(
+            search_vector=RawSQL(
+                '"bot_recommendation"."search_vector"',
+                [],
+                output_field=SearchVectorField(),
+            )
+        )
+        .filter(search_vector=search_query)
+        .annotate(rank=SearchRank("search_vector", search_query))
+        .order_by("-rank", "-created_at")
+    )
@@ -1,10 +1,88 @@
+import json
 from pathlib import Path
 
-from gql import gql, Client
-from gql.transport.aiohttp import AIOHTTPTransport
+from core.clients import get_snapshot_client, get_snapshot_url
 
-transport = AIOHTTPTransport(url="https://hub.snapshot.org/graphql")
-client = Client(transport=transport, fetch_schema_from_transport=True)
+from .metrics import track_stage
+
+
+def read_query(name: str, **kwargs) -> str:
+    """
+    Reads a query template from `text_templates/queries` and fills it
+    in with the given keyword arguments.
+    """
+    with open(
+        Path(__file__).parent / "text_templates" / "queries" / f"{name}.txt",
+        "r",
+    ) as query_file:
+        return query_file.read().format(**kwargs)
+
+
+def execute(query: str, stage: str) -> dict:
+    """
+    Executes a query with the shared Snapshot client.
+
+    Parameters:
+    -----------
+    query : str
+        The GraphQL query.
+    stage : str
+        The pipeline stage the query is measured as.
+
+    Returns:
+    --------
+    dict:
+        The data returned by Snapshot.
+    """
+    from gql import gql
+
+    client = get_snapshot_client()
+    with track_stage(stage):
+        return client.execute(gql(query))
+
+
+async def aexecute(query: str, stage: str) -> dict:
+    """
+    Executes a query without blocking the event loop.
+
+    Each call opens its own session, since a gql session cannot be
+    shared by concurrent queries. The schema is not fetched, so the
+    query is not validated locally.
+
+    Parameters:
+    -----------
+    query : str
+        The GraphQL query.
+    stage : str
+        The pipeline stage the query is measured as.
+
+    Returns:
+    --------
+    dict:
+        The data returned by Snapshot.
+    """
+    from gql import Client, gql
+    from gql.transport.aiohttp import AIOHTTPTransport
+
+    async_client = Client(transport=AIOHTTPTransport(url=get_snapshot_url()))
+    with track_stage(stage):
+        async with async_client as session:
+            return await session.execute(gql(query))
+
+
+def proposals_query(
+    created_gte: int, first: int, skip: int = 0, space_ids: list = None
+) -> str:
+    """Builds the query of `query_snapshot_proposals`."""
+    return read_query(
+        "proposals",
+        first=first,
+        skip=skip,
+        created_gte=created_gte,
+        space_filter=(
+            f", space_in: {json.dumps(list(space_ids))}" if space_ids else ""
+        ),
+    )
 
 
 def query_snapshot_proposal(proposal_id: str):
@@ -21,13 +99,9 @@ def query_snapshot_proposal(proposal_id: str):
     dict:
         The data of the proposal as a dictionary.
     """
-
-    with open(
-        Path(__file__).parent / "text_templates" / "queries" / "proposal.txt",
-        "r",
-    ) as query_file:
-        query = query_file.read().format(proposal_id=proposal_id)
-        return client.execute(gql(query))
+    return execute(
+        read_query("proposal", proposal_id=proposal_id), "snapshot_proposal"
+    )
 
 
 def query_snapshot_space(space_id: str):
@@ -44,9 +118,57 @@ def query_snapshot_space(space_id: str):
     dict:
         The data of the space as a dictionary.
     """
-    with open(
-        Path(__file__).parent / "text_templates" / "queries" / "space.txt",
-        "r",
-    ) as query_file:
-        query = query_file.read().format(space_id=space_id)
-        return client.execute(gql(query))
+    return execute(read_query("space", space_id=space_id), "snapshot_space")
+
+
+def query_snapshot_proposals(
+    created_gte: int, first: int, skip: int = 0, space_ids: list = None
+):
+    """
+    Fetches a page of proposals from Snapshot, oldest first.
+
+    Parameters:
+    -----------
+    created_gte : int
+        Only proposals created at or after this timestamp are returned.
+    first : int
+        The maximum number of proposals to return.
+    skip : int, optional
+        The number of matching proposals to skip.
+    space_ids : list, optional
+        Only proposals of these spaces are returned. All spaces are
+        included if omitted.
+
+    Returns:
+    --------
+    dict:
+        The data of the proposals as a dictionary.
+    """
+    return execute(
+        proposals_query(created_gte, first, skip, space_ids),
+        "snapshot_proposals",
+    )
+
+
+async def aquery_snapshot_proposal(proposal_id: str):
+    """Asynchronous version of `query_snapshot_proposal`."""
+    return await aexecute(
+        read_query("proposal", proposal_id=proposal_id), "snapshot_proposal"
+    )
+
+
+async def aquery_snapshot_space(space_id: str):
+    """Asynchronous version of `query_snapshot_space`."""
+    return await aexecute(
+        read_query("space", space_id=space_id), "snapshot_space"
+    )
+
+
+async def aquery_snapshot_proposals(
+    created_gte: int, first: int, skip: int = 0, space_ids: list = None
+):
+    """Asynchronous version of `query_snapshot_proposals`."""
+    return await aexecute(
+        proposals_query(created_gte, first, skip, space_ids),
+        "snapshot_proposals",
+    )
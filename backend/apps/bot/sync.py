@@ -0,0 +1,237 @@
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.bot import revisions
+from apps.bot.models import FanOutJob, Proposal, SyncCursor
+from apps.bot.snapshot import query_snapshot_proposals
+from apps.users.models import SpaceSubscription
+
+logger = logging.getLogger(__name__)
+
+CURSOR_NAME = "snapshot_proposals"
+
+
+def mirror_proposals(proposals: list):
+    """
+    Inserts or updates the local mirror of Snapshot proposals, leaving
+    their processing state untouched.
+
+    Every fetched proposal goes through the mirror, which is where edits
+    are detected: proposals whose title or body changed since they were
+    fanned out are handed to `revisions.enqueue_revisions`.
+
+    Parameters:
+    -----------
+    proposals : list
+        The proposals as returned by the Snapshot API.
+    """
+    previous = Proposal.objects.only(
+        "title", "body", "body_hash", "end", "processed_at"
+    ).in_bulk([proposal["id"] for proposal in proposals])
+    Proposal.objects.bulk_create(
+        [Proposal.from_snapshot(proposal) for proposal in proposals],
+        update_conflicts=True,
+        unique_fields=["id"],
+        update_fields=[
+            "space_id",
+            "title",
+            "body",
+            "state",
+            "created",
+            "start",
+            "end",
+            "data",
+            "body_hash",
+            "synced_at",
+        ],
+    )
+    revisions.enqueue_revisions(previous, proposals)
+
+
+def claim_proposal(proposal_id: str) -> bool:
+    """
+    Marks a mirrored proposal as processed.
+
+    The update is atomic, so when the webhook and the sync job (or two
+    deliveries of the same webhook) race for a proposal, only one of
+    them wins the claim.
+
+    Parameters:
+    -----------
+    proposal_id : str
+        The Snapshot identifier of the proposal.
+
+    Returns:
+    --------
+    bool:
+        True if the caller claimed the proposal and should fan it out.
+    """
+    return bool(
+        Proposal.objects.filter(
+            pk=proposal_id, processed_at__isnull=True
+        ).update(processed_at=timezone.now())
+    )
+
+
+def enqueue_fan_out(proposal: dict) -> FanOutJob:
+    """
+    Enqueues the complete fan-out of a proposal, which the job worker
+    claims by priority and voting deadline (see `apps.bot.jobs`).
+
+    Parameters:
+    -----------
+    proposal : dict
+        The proposal as returned by `query_snapshot_proposal`. It must
+        have been mirrored with `mirror_proposals`.
+
+    Returns:
+    --------
+    FanOutJob:
+        The pending fan-out job of the proposal.
+    """
+    job, _ = FanOutJob.objects.get_or_create(
+        proposal_id=proposal["id"],
+        kind=FanOutJob.KindChoices.FAN_OUT,
+        status=FanOutJob.StatusChoices.PENDING,
+        defaults={
+            "priority": FanOutJob.PriorityChoices.NORMAL,
+            "body_hash": Proposal.content_hash(proposal),
+        },
+    )
+    logger.info("Enqueued the fan-out of proposal %s", proposal["id"])
+    return job
+
+
+def receive_proposal(proposal: dict) -> bool:
+    """
+    Mirrors a proposal and enqueues its fan-out unless it was already
+    processed. The proposal is claimed and its job enqueued in the same
+    transaction, so that a claimed proposal is never left without a
+    job.
+
+    Parameters:
+    -----------
+    proposal : dict
+        The proposal as returned by `query_snapshot_proposal`.
+
+    Returns:
+    --------
+    bool:
+        True if the fan-out of the proposal was enqueued.
+    """
+    mirror_proposals([proposal])
+    with transaction.atomic():
+        if not claim_proposal(proposal["id"]):
+            return False
+        enqueue_fan_out(proposal)
+    return True
+
+
+async def areceive_proposal(proposal: dict) -> bool:
+    """Asynchronous version of `receive_proposal`."""
+    return await sync_to_async(receive_proposal)(proposal)
+
+
+def sync_proposals(page_size: int = 100, max_pages: int = None) -> int:
+    """
+    Pulls the proposals created since the last sync from Snapshot into
+    the local mirror.
+
+    Proposals are requested oldest first, starting at the persisted
+    `created` cursor, which is moved forward after every page. Since
+    several proposals can share a `created` timestamp, the cursor is
+    inclusive and proposals at the boundary are skipped within a run;
+    proposals seen twice are simply upserted again. The first sync
+    starts `SNAPSHOT["SYNC_LOOKBACK"]` seconds in the past.
+
+    Only the spaces listed in `SNAPSHOT["SPACES"]` are synced or, if it
+    is empty, the spaces that have at least one subscriber.
+
+    Parameters:
+    -----------
+    page_size : int, optional
+        The number of proposals requested per page.
+    max_pages : int, optional
+        Stops after this many pages. The next run resumes from the
+        cursor.
+
+    Returns:
+    --------
+    int:
+        The number of proposals mirrored.
+    """
+    cursor, _ = SyncCursor.objects.get_or_create(
+        name=CURSOR_NAME,
+        defaults={
+            "value": int(time.time()) - settings.SNAPSHOT["SYNC_LOOKBACK"]
+        },
+    )
+
+    space_ids = settings.SNAPSHOT["SPACES"] or list(
+        SpaceSubscription.objects.values_list("space_id", flat=True)
+        .order_by("space_id")
+        .distinct()
+    )
+    if not space_ids:
+        return 0
+
+    mirrored = 0
+    skip = 0
+    pages = 0
+    while max_pages is None or pages < max_pages:
+        proposals = query_snapshot_proposals(
+            created_gte=cursor.value,
+            first=page_size,
+            skip=skip,
+            space_ids=space_ids,
+        )["proposals"]
+        pages += 1
+        if not proposals:
+            break
+
+        mirror_proposals(proposals)
+        mirrored += len(proposals)
+
+        newest = proposals[-1]["created"]
+        at_newest = sum(
+            proposal["created"] == newest for proposal in proposals
+        )
+        if newest == cursor.value:
+            skip += at_newest
+        else:
+            skip = at_newest
+            cursor.value = newest
+            cursor.save(update_fields=["value", "updated_at"])
+
+        if len(proposals) < page_size:
+            break
+
+    logger.info("Mirrored %s Snapshot proposals", mirrored)
+    return mirrored
+
+
+def fan_out_pending() -> int:
+    """
+    Enqueues the fan-out of every mirrored proposal that has not been
+    processed yet and is still open for voting.
+
+    Returns:
+    --------
+    int:
+        The number of fan-outs enqueued.
+    """
+    enqueued = 0
+    pending = Proposal.objects.filter(
+        processed_at__isnull=True, end__gt=timezone.now()
+    )
+    for proposal in pending:
+        with transaction.atomic():
+            if claim_proposal(proposal.pk):
+                enqueue_fan_out(proposal.data)
+                enqueued += 1
+    return enqueued
@@ -0,0 +1,108 @@
+"""
+Extraction of the verdict of a recommendation.
+
+The language model is asked to call the `recommend` function with a
+verdict and its reasoning, so the verdict is read from structured
+arguments. Completions that do not call the function, and
+recommendations stored before verdicts were extracted, are parsed from
+their leading words instead.
+"""
+
+import json
+import re
+from typing import Optional, Tuple
+
+# The verdicts, as stored in `Recommendation.verdict`.
+TRUE = "true"
+FALSE = "false"
+NOT_ENOUGH_INFO = "not_enough_info"
+
+# How each verdict is written at the start of a recommendation.
+LABELS = {
+    TRUE: "True",
+    FALSE: "False",
+    NOT_ENOUGH_INFO: "Not enough info",
+}
+
+_LEADING_VERDICT = re.compile(
+    r"^[\s*_#>\"'`]*(?:verdict\s*:\s*)?[\s*_\"'`]*"
+    r"(not enough info(?:rmation)?|true|false|yes|no)\b",
+    re.IGNORECASE,
+)
+
+_SYNONYMS = {
+    "true": TRUE,
+    "yes": TRUE,
+    "false": FALSE,
+    "no": FALSE,
+}
+
+
+def normalize(verdict: str) -> Optional[str]:
+    """
+    Maps a verdict as written by the language model to one of the
+    stored verdicts, or None if it is not one.
+    """
+    verdict = " ".join(verdict.lower().replace("_", " ").split())
+    if verdict.startswith("not enough info"):
+        return NOT_ENOUGH_INFO
+    return _SYNONYMS.get(verdict)
+
+
+def parse_text(text: str) -> Optional[str]:
+    """
+    Reads the verdict a free-text recommendation starts with.
+
+    Parameters:
+    -----------
+    text : str
+        The recommendation, such as "True. The proposal funds...".
+
+    Returns:
+    --------
+    str or None:
+        The verdict, or None if the recommendation does not start with
+        one.
+    """
+    stripped = text.strip()
+    if stripped.startswith("{"):
+        try:
+            verdict = json.loads(stripped).get("verdict")
+        except (ValueError, AttributeError):
+            verdict = None
+        if isinstance(verdict, str):
+            return normalize(verdict)
+    match = _LEADING_VERDICT.match(text)
+    return normalize(match.group(1)) if match else None
+
+
+def parse_function_call(arguments: str) -> Tuple[Optional[str], str]:
+    """
+    Reads the arguments of a call to the `recommend` function.
+
+    Parameters:
+    -----------
+    arguments : str
+        The arguments as a JSON object with a `verdict` and a
+        `reasoning`.
+
+    Returns:
+    --------
+    tuple:
+        The verdict, or None if it is missing or unknown, and the
+        recommendation text, which starts with the verdict's label.
+
+    Raises:
+    -------
+    ValueError:
+        If the arguments are not a JSON object.
+    """
+    parsed = json.loads(arguments)
+    if not isinstance(parsed, dict):
+        raise ValueError("The function arguments are not an object")
+    verdict = parsed.get("verdict")
+    verdict = normalize(verdict) if isinstance(verdict, str) else None
+    reasoning = str(parsed.get("reasoning") or "").strip()
+    if verdict is None:
+        return None, reasoning
+    return verdict, f"{LABELS[verdict]}. {reasoning}".strip()
@@ -0,0 +1,144 @@
+"""
+Handling of Snapshot webhook events.
+
+Snapshot delivers an event whenever a proposal of a subscribed space is
+created, starts, ends or is deleted, as `{"id": "proposal/<id>",
+"event": "proposal/<name>", "space": ...}`. Each event is routed to its
+handler through `HANDLERS`. Only created proposals are fanned out to
+the language model, by a `FanOutJob` that the job worker runs, so that
+deliveries return at once. When voting starts, the proposal is
+mirrored again, which enqueues a revision if its text changed
+significantly since it was fanned out. Every other event only updates
+the mirror.
+"""
+
+import hmac
+import logging
+from typing import Awaitable, Callable, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpRequest
+
+from apps.bot import sync
+from apps.bot.models import FanOutJob, Proposal
+from apps.bot.snapshot import aquery_snapshot_proposal
+
+logger = logging.getLogger(__name__)
+
+# The header Snapshot sends the secret of the webhook in.
+SECRET_HEADER = "Authentication"
+
+
+def is_authentic(request: HttpRequest) -> bool:
+    """
+    Whether a delivery carries the shared secret of the webhook, which
+    is compared in constant time. Every delivery is rejected while
+    `SNAPSHOT["WEBHOOK_SECRET"]` is unset.
+    """
+    secret = settings.SNAPSHOT["WEBHOOK_SECRET"]
+    received = request.headers.get(SECRET_HEADER, "")
+    return bool(secret) and hmac.compare_digest(
+        received.encode(), secret.encode()
+    )
+
+
+def proposal_id(event: dict) -> Optional[str]:
+    """
+    Reads the Snapshot identifier of the proposal an event is about, or
+    None if the event is not about a proposal.
+    """
+    identifier = event.get("id")
+    if not isinstance(identifier, str) or not identifier.startswith(
+        "proposal/"
+    ):
+        return None
+    return identifier.removeprefix("proposal/") or None
+
+
+async def afetch(proposal_id: str) -> Optional[dict]:
+    """Fetches a proposal from Snapshot, or None if it does not exist."""
+    return (await aquery_snapshot_proposal(proposal_id)).get("proposal")
+
+
+async def acreated(proposal_id: str):
+    """
+    Mirrors a new proposal and enqueues its fan-out, unless it already
+    was.
+    """
+    proposal = await afetch(proposal_id)
+    if proposal is None:
+        logger.warning("Created proposal %s was not found", proposal_id)
+        return
+    await sync.areceive_proposal(proposal)
+
+
+async def astarted(proposal_id: str):
+    """
+    Mirrors a proposal whose voting started, which is its final text.
+    A revision is enqueued if the text changed significantly since the
+    proposal was fanned out.
+    """
+    proposal = await afetch(proposal_id)
+    if proposal is None:
+        logger.warning("Started proposal %s was not found", proposal_id)
+        return
+    await sync_to_async(sync.mirror_proposals)([proposal])
+
+
+async def aended(proposal_id: str):
+    """Marks a mirrored proposal as closed."""
+    await Proposal.objects.filter(pk=proposal_id).aupdate(
+        state=Proposal.StateChoices.CLOSED
+    )
+
+
+async def adeleted(proposal_id: str):
+    """
+    Marks a mirrored proposal as deleted and drops its pending jobs.
+    Its recommendations are kept.
+    """
+    await Proposal.objects.filter(pk=proposal_id).aupdate(
+        state=Proposal.StateChoices.DELETED
+    )
+    await FanOutJob.objects.filter(
+        proposal_id=proposal_id, status=FanOutJob.StatusChoices.PENDING
+    ).adelete()
+
+
+# The handler of each event, called with the proposal identifier.
+HANDLERS: dict[str, Callable[[str], Awaitable[None]]] = {
+    "proposal/created": acreated,
+    "proposal/start": astarted,
+    "proposal/end": aended,
+    "proposal/deleted": adeleted,
+}
+
+
+async def ahandle(event: dict) -> bool:
+    """
+    Routes a webhook event to its handler.
+
+    Parameters:
+    -----------
+    event : dict
+        The body of the delivery.
+
+    Returns:
+    --------
+    bool:
+        False if the event is malformed. Events without a handler are
+        ignored, and count as handled so that Snapshot does not deliver
+        them again.
+    """
+    identifier = proposal_id(event)
+    name = event.get("event")
+    if identifier is None or not isinstance(name, str):
+        return False
+    handler = HANDLERS.get(name)
+    if handler is None:
+        logger.info("Ignoring %s event of proposal %s", name, identifier)
+        return True
+    logger.info("Handling %s event of proposal %s", name, identifier)
+    await handler(identifier)
+    return True
@@ -1,6 +1,13 @@
 from django.contrib import admin
 
-from apps.users.models import Account, Profile
+from apps.users.models import (
+    Account,
+    Profile,
+    SpaceSubscription,
+    SupabaseAdminTask,
+)
 
 admin.site.register(Account)
 admin.site.register(Profile)
+admin.site.register(SpaceSubscription)
+admin.site.register(SupabaseAdminTask)
@@ -1,6 +1,7 @@
-from rest_framework import serializers
+from adrf import serializers
+from rest_framework import relations
 
-from apps.users.models import Account
+from apps.users.models import Account, Profile, SpaceSubscription
 
 
 class AccountSerializer(serializers.ModelSerializer):
@@ -37,16 +38,50 @@ class ProfileSerializer(serializers.ModelSerializer):
 
     This serializer converts complex types, like Profile instances,
     into a format that's easy to render into a JSON response. It
-    provides serialization for all fields of the Profile model.
+    provides serialization for all fields of the Profile model, except
+    for the bio embedding and the personal statements, which are
+    internal.
 
     Attributes:
     -----------
+    account : PrimaryKeyRelatedField
+        The primary key of the profile's account, which cannot be
+        changed.
     Meta : class
-        Metadata class that defines the model to serialize and specifies
-        that all fields of the model should be included in the
-        serialized representation.
+        Metadata class that defines the model to serialize and the
+        fields to leave out of the serialized representation.
     """
 
+    account = relations.PrimaryKeyRelatedField(read_only=True)
+
     class Meta:
-        model = Account
-        fields = "__all__"
+        model = Profile
+        exclude = (
+            "bio_embedding",
+            "bio_embedding_key",
+            "personal_statement",
+            "personal_statement_tokens",
+            "anonymous_statement",
+            "anonymous_statement_tokens",
+            "statement_hash",
+        )
+
+
+class SpaceSubscriptionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the SpaceSubscription model.
+
+    This serializer exposes the subscribed Snapshot space and when the
+    subscription was created. The profile is implied by the
+    authenticated user and is not part of the representation.
+
+    Attributes:
+    -----------
+    Meta : class
+        Metadata class that defines the model to serialize and the
+        fields to include in the serialized representation.
+    """
+
+    class Meta:
+        model = SpaceSubscription
+        fields = ("space_id", "created_at")
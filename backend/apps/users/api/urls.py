@@ -1,8 +1,19 @@
 from django.urls import path
 
-from .views import ProfileDetail, ProfileList
+from .views import (
+    AccountProvisioning,
+    ProfileDetail,
+    ProfileList,
+    SpaceSubscriptionDetail,
+    SpaceSubscriptionList,
+)
 
 urlpatterns = [
+    path(
+        "accounts/provision",
+        AccountProvisioning.as_view(),
+        name="account_provisioning",
+    ),
     path(
         "profile/list",
         ProfileList.as_view(),
@@ -13,4 +24,14 @@ urlpatterns = [
         ProfileDetail.as_view(),
         name="profile",
     ),
+    path(
+        "profile/subscriptions",
+        SpaceSubscriptionList.as_view(),
+        name="space_subscription_list",
+    ),
+    path(
+        "profile/subscriptions/<str:space_id>",
+        SpaceSubscriptionDetail.as_view(),
+        name="space_subscription",
+    ),
 ]
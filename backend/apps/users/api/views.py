@@ -1,16 +1,28 @@
+import dataclasses
 from http import HTTPStatus
 
+from adrf import decorators, generics, mixins, views
+from asgiref.sync import sync_to_async
 from django.http import HttpRequest
-from rest_framework import decorators, response, generics, mixins, permissions
+from rest_framework import response, permissions
 
-from apps.users.models import Profile
+from apps.users import cache, provisioning
+from apps.users.models import Profile, SpaceSubscription
+from core import conditional
+from core.db import release_connections
 
-from .serializers import AccountSerializer, ProfileSerializer
+from .serializers import (
+    AccountSerializer,
+    ProfileSerializer,
+    SpaceSubscriptionSerializer,
+)
 
 
 @decorators.api_view(["GET"])
-def example(request: HttpRequest):
-    return response.Response({"user": AccountSerializer(request.user).data})
+async def example(request: HttpRequest):
+    return response.Response(
+        {"user": await AccountSerializer(request.user).adata}
+    )
 
 
 class ProfileList(generics.GenericAPIView, mixins.ListModelMixin):
@@ -37,8 +49,8 @@ class ProfileList(generics.GenericAPIView, mixins.ListModelMixin):
     serializer_class = ProfileSerializer
     permission_classes = [permissions.IsAdminUser]
 
-    def get(self, request, *args, **kwargs):
-        return self.list(request, *args, **kwargs)
+    async def get(self, request, *args, **kwargs):
+        return await self.alist(request, *args, **kwargs)
 
 
 class ProfileDetail(
@@ -64,7 +76,7 @@ class ProfileDetail(
 
     Methods:
     --------
-    get_object() -> Optional[Profile]:
+    aget_object() -> Optional[Profile]:
         Retrieves the profile associated with the authenticated user.
         Returns None if the user is a superuser.
 
@@ -75,17 +87,20 @@ class ProfileDetail(
     put(request: HttpRequest, *args, **kwargs) -> HttpResponse:
         Handles PUT requests and updates the profile of the
         authenticated user.
+
+    perform_aupdate(serializer: Serializer) -> None:
+        Saves the updated profile and caches it.
     """
 
     queryset = Profile.objects.all()
     serializer_class = ProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-    def get_object(self):
+    async def aget_object(self):
         """Retrieves the profile associated with the authenticated user."""
         if self.request.user.is_superuser:
             return None
-        return Profile.objects.filter(account=self.request.user).first()
+        return await Profile.objects.filter(account=self.request.user).afirst()
 
     def _superuser_detail(func):
         """
@@ -93,7 +108,7 @@ class ProfileDetail(
         error response. Otherwise, proceeds to the decorated function.
         """
 
-        def inner(self, request: HttpRequest):
+        async def inner(self, request: HttpRequest):
             if request.user.is_superuser:
                 return response.Response(
                     {
@@ -105,17 +120,34 @@ class ProfileDetail(
                     status=HTTPStatus.BAD_REQUEST,
                 )
             else:
-                return func(self, request)
+                return await func(self, request)
 
         return inner
 
     @_superuser_detail
-    def get(self, request: HttpRequest, *args, **kwargs):
-        """Handles GET requests and returns the profile of the authenticated user."""
-        return self.retrieve(request, *args, **kwargs)
+    async def get(self, request: HttpRequest, *args, **kwargs):
+        """
+        Handles GET requests and returns the profile of the
+        authenticated user.
+
+        The profile is read from the per-account cache. The response
+        carries an ETag derived from the version of the profile, and a
+        request whose `If-None-Match` holds it is answered with 304 Not
+        Modified without serializing the profile.
+        """
+        profile = await cache.aget_profile(request.user.pk)
+        etag = conditional.make_etag(
+            request.user.pk, profile.version if profile else None
+        )
+        unchanged = conditional.not_modified(request, etag)
+        if unchanged is not None:
+            return unchanged
+        return conditional.tag(
+            response.Response(await self.get_serializer(profile).adata), etag
+        )
 
     @_superuser_detail
-    def put(self, request: HttpRequest, *args, **kwargs):
+    async def put(self, request: HttpRequest, *args, **kwargs):
         """
         Handles PUT requests to update the profile of the authenticated
         user. Restricts modification of certain fields ('account').
@@ -131,4 +163,149 @@ class ProfileDetail(
                 },
                 status=HTTPStatus.BAD_REQUEST,
             )
-        return self.partial_update(request, *args, **kwargs)
+        return await self.partial_aupdate(request, *args, **kwargs)
+
+    async def perform_aupdate(self, serializer):
+        """
+        Saves the updated profile, which was read from the database, and
+        writes it through to the per-account cache.
+        """
+        await serializer.asave()
+        await cache.astore(serializer.instance)
+
+
+class SpaceSubscriptionList(generics.ListCreateAPIView):
+    """
+    API view to list and create the Snapshot space subscriptions of the
+    authenticated user. Proposals are only fanned out to the
+    subscribers of their space.
+
+    Attributes:
+    -----------
+    serializer_class : Serializer
+        The serializer to be used for subscriptions.
+    permission_classes : List[Permission]
+        The set of permissions required to access this view.
+
+    Methods:
+    --------
+    get_queryset() -> QuerySet:
+        Returns the subscriptions of the authenticated user.
+
+    acreate(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        Subscribes the authenticated user to a space. Subscribing twice
+        to the same space is not an error.
+    """
+
+    serializer_class = SpaceSubscriptionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return SpaceSubscription.objects.filter(
+            profile__account=self.request.user
+        ).order_by("space_id")
+
+    async def acreate(self, request: HttpRequest, *args, **kwargs):
+        profile = await Profile.objects.filter(account=request.user).afirst()
+        if profile is None:
+            return response.Response(
+                {"detail": "The current user does not have a profile"},
+                status=HTTPStatus.BAD_REQUEST,
+            )
+        serializer = self.get_serializer(data=request.data)
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        subscription, created = await SpaceSubscription.objects.aget_or_create(
+            profile=profile,
+            space_id=serializer.validated_data["space_id"],
+        )
+        return response.Response(
+            await self.get_serializer(subscription).adata,
+            status=HTTPStatus.CREATED if created else HTTPStatus.OK,
+        )
+
+
+class SpaceSubscriptionDetail(generics.DestroyAPIView):
+    """
+    API view to unsubscribe the authenticated user from a Snapshot
+    space.
+
+    Attributes:
+    -----------
+    serializer_class : Serializer
+        The serializer to be used for subscriptions.
+    permission_classes : List[Permission]
+        The set of permissions required to access this view.
+    lookup_field : str
+        The subscriptions are looked up by space identifier.
+    """
+
+    serializer_class = SpaceSubscriptionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    lookup_field = "space_id"
+
+    def get_queryset(self):
+        return SpaceSubscription.objects.filter(
+            profile__account=self.request.user
+        )
+
+
+class AccountProvisioning(views.APIView):
+    """
+    API view to create the accounts of many users at once, for example
+    when onboarding a DAO. This view is restricted to admin users.
+
+    The users are either uploaded as a CSV or NDJSON `file`, whose
+    format is given by the `format` field or guessed from its name, or
+    sent as a JSON list under `users`. Each user has an `email`, a
+    `password` and an optional `username`. See
+    `apps.users.provisioning.provision_accounts`.
+
+    Attributes:
+    -----------
+    permission_classes : List[Permission]
+        The set of permissions required to access this view.
+
+    Methods:
+    --------
+    post(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        Handles POST requests and returns the outcome for every user.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    async def post(self, request: HttpRequest, *args, **kwargs):
+        try:
+            if "file" in request.FILES:
+                users = provisioning.read_upload(
+                    request.FILES["file"], request.data.get("format")
+                )
+            else:
+                users = request.data.get("users")
+        except (ValueError, UnicodeDecodeError) as exception:
+            return response.Response(
+                {"detail": f"The file of users is invalid: {exception}"},
+                status=HTTPStatus.BAD_REQUEST,
+            )
+        if not isinstance(users, list) or not all(
+            isinstance(user, dict) for user in users
+        ):
+            return response.Response(
+                {
+                    "detail": (
+                        "Either upload a CSV or NDJSON 'file' or send the"
+                        " users as a list of objects under 'users'."
+                    )
+                },
+                status=HTTPStatus.BAD_REQUEST,
+            )
+
+        def provision():
+            try:
+                return provisioning.provision_accounts(users)
+            finally:
+                release_connections()
+
+        # Provisioning waits on Supabase for a while, so it runs outside
+        # of the thread shared by the other synchronous code.
+        report = await sync_to_async(provision, thread_sensitive=False)()
+        return response.Response(dataclasses.asdict(report))
@@ -0,0 +1,72 @@
+"""
+Per-account cache of profiles.
+
+The frontend reads the profile of the user on every page load. Profiles
+are cached by account on the first read, written through when they are
+updated through the API and invalidated whenever they are saved
+elsewhere (see `apps.users.models.signals`), so reads normally skip the
+database. Updates that bypass `save()`, such as `QuerySet.update()`,
+must call `invalidate` themselves. The embedding of the bio is not
+cached, as the API never returns it.
+"""
+
+import copy
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.users.models import Profile
+
+# Part of the cache keys. Bump it when the fields of `Profile` change,
+# so that instances pickled by an earlier release are not read back.
+KEY_VERSION = 2
+
+
+def key(account_id: int) -> str:
+    """Returns the cache key of the profile of an account."""
+    return f"users:profile:{KEY_VERSION}:{account_id}"
+
+
+async def aget_profile(account_id: int) -> Optional[Profile]:
+    """
+    Reads the profile of an account, from the cache if it is there.
+
+    Parameters:
+    -----------
+    account_id : int
+        The primary key of the account.
+
+    Returns:
+    --------
+    Profile or None:
+        The profile, or None if the account has none, such as
+        superusers. Missing profiles are not cached.
+    """
+    profile = await cache.aget(key(account_id))
+    if profile is None:
+        profile = (
+            await Profile.objects.filter(account_id=account_id)
+            .defer("bio_embedding")
+            .afirst()
+        )
+        if profile is not None:
+            await astore(profile)
+    return profile
+
+
+async def astore(profile: Profile):
+    """
+    Caches a profile, replacing the cached copy, if any. The embedding
+    of the bio is deferred on the cached copy, even if it was loaded.
+    """
+    profile = copy.copy(profile)
+    profile.__dict__.pop("bio_embedding", None)
+    await cache.aset(
+        key(profile.pk), profile, timeout=settings.PROFILE_CACHE_TIMEOUT
+    )
+
+
+def invalidate(account_id: int):
+    """Drops the cached profile of an account."""
+    cache.delete(key(account_id))
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.users import tasks
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the queued Supabase admin operations, such as deleting the"
+        " Supabase users of deleted accounts. Several workers can run at"
+        " once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=tasks.BATCH_SIZE,
+            help="The number of tasks claimed at once.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=tasks.CONCURRENCY,
+            help="The number of tasks sent to Supabase at once.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=5.0,
+            help="The seconds to wait when the queue is empty.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exits once the queue is empty instead of waiting.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            counts = tasks.process_tasks(
+                limit=options["batch_size"],
+                concurrency=options["concurrency"],
+            )
+            if any(counts.values()):
+                self.stdout.write(
+                    f"Done {counts['done']}, retrying {counts['retried']},"
+                    f" failed {counts['failed']}."
+                )
+                continue
+            if options["once"]:
+                return
+            time.sleep(options["poll_interval"])
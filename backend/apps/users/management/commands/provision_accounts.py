@@ -0,0 +1,85 @@
+import dataclasses
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.users import provisioning
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates the accounts listed in a CSV or NDJSON file of users with"
+        " an email, a password and an optional username. Users are signed"
+        " up with Supabase concurrently and their usernames are set in"
+        " bulk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            help="The file of users.",
+        )
+        parser.add_argument(
+            "--format",
+            choices=provisioning.FORMATS,
+            help="The format of the file. Guessed from its extension if"
+            " omitted.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=provisioning.CONCURRENCY,
+            help="The number of sign ups sent to Supabase at once.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=provisioning.BATCH_SIZE,
+            help="The number of accounts read or updated per query.",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=provisioning.TIMEOUT,
+            help="The seconds to wait for the accounts to be created.",
+        )
+        parser.add_argument(
+            "--report",
+            help="Writes the outcome of every user to this JSON file.",
+        )
+
+    def handle(self, *args, **options):
+        format = options["format"] or provisioning.format_of(options["path"])
+        if format is None:
+            raise CommandError(
+                "Cannot guess the format of the file, use --format."
+            )
+        try:
+            with open(options["path"], encoding="utf-8-sig") as stream:
+                users = provisioning.read_users(stream, format)
+        except (OSError, ValueError) as exception:
+            raise CommandError(exception)
+
+        start = time.perf_counter()
+        report = provisioning.provision_accounts(
+            users,
+            concurrency=options["concurrency"],
+            batch_size=options["batch_size"],
+            timeout=options["timeout"],
+        )
+        self.stdout.write(
+            f"Created {len(report.created)} accounts in"
+            f" {time.perf_counter() - start:.1f}s. Skipped"
+            f" {len(report.existing)} existing, rejected"
+            f" {len(report.rejected)}, failed {len(report.failed)} and timed"
+            f" out on {len(report.missing)}."
+        )
+        for email, reason in {**report.rejected, **report.failed}.items():
+            self.stderr.write(f"{email}: {reason}")
+        for email in report.missing:
+            self.stderr.write(f"{email}: the account was not created in time")
+
+        if options["report"]:
+            with open(options["report"], "w") as stream:
+                json.dump(dataclasses.asdict(report), stream, indent=2)
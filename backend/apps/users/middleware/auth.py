@@ -1,34 +1,90 @@
 import datetime
+from typing import Optional
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
 from django.http import HttpRequest
-from django.utils.deprecation import MiddlewareMixin
 from django.contrib.auth.models import AnonymousUser
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 import jwt
 
 from apps.users.models import Account
 
+# How often, at most, the `last_login` of an account is refreshed.
+LAST_SEEN_INTERVAL = datetime.timedelta(hours=1)
 
-class SupabaseAuthMiddleware(MiddlewareMixin):
+
+def token_subject(token: str, secret: Optional[str]) -> Optional[str]:
+    """
+    Returns the UUID of the account a Supabase JWT was issued for.
+
+    Parameters:
+    -----------
+    token : str
+        The encoded JWT.
+    secret : str or None
+        The secret Supabase signs its JWTs with, which the signature of
+        the JWT is verified with. No JWT is accepted without it.
+
+    Returns:
+    --------
+    str or None
+        The 'sub' claim of the JWT, or None if it is expired, malformed,
+        not signed with the secret or not issued to an authenticated
+        user.
+    """
+    if not secret:
+        return None
+    try:
+        decoded_token = jwt.decode(
+            token,
+            secret,
+            algorithms=["HS256"],
+            audience="authenticated",
+            options={"require": ["exp", "sub"]},
+        )
+        return decoded_token["sub"]
+    except jwt.InvalidTokenError:
+        return None
+
+
+class SupabaseAuthMiddleware:
     """
     Middleware to authenticate users based on Supabase JWT
     (JSON Web Token) authorization.
 
     This middleware checks the 'Authorization' header in the incoming
-    request for a JWT. If the JWT is present and valid, it sets the
-    'user' attribute of the request to the corresponding user instance.
-    If the JWT is invalid or not present, or if any exception occurs
-    during the process, the 'user' attribute is set to an AnonymousUser.
+    request for a JWT. If the JWT is present and its signature is
+    verified with `SUPABASE["JWT_SECRET"]`, it sets the 'user' attribute
+    of the request to the corresponding user instance. If the JWT is
+    invalid or not present, the 'user' attribute is left
+    as set by Django's authentication middleware, which is an
+    AnonymousUser unless the request carries a session.
+
+    The `last_login` of authenticated accounts is refreshed at most
+    once per `LAST_SEEN_INTERVAL`, so that the fan-out can serve active
+    users first without a write on every request.
+
+    The middleware supports both synchronous and asynchronous requests.
+    Under ASGI, the account is looked up with the asynchronous ORM, so
+    the request stays on the event loop.
 
     Methods:
     --------
-    _return_anon_user(request: HttpRequest) -> HttpResponse:
-        Sets the user attribute of the request to an AnonymousUser and
-        returns the response.
+    _token_subject(request: HttpRequest) -> Optional[str]:
+        Returns the UUID of the account the request's JWT was issued
+        for, if the JWT is present, signed by Supabase and has not
+        expired.
+
+    _is_stale(account: Account) -> bool:
+        Whether the `last_login` of an account should be refreshed.
 
-    process_request(request: HttpRequest) -> HttpResponse:
-        Processes the incoming request, checks for the 'Authorization'
-        header, decodes the JWT, and sets the user accordingly.
+    __call__(request: HttpRequest) -> HttpResponse:
+        Authenticates the request and returns the response.
+
+    __acall__(request: HttpRequest) -> HttpResponse:
+        Asynchronous version of `__call__`.
 
     Attributes:
     -----------
@@ -37,6 +93,9 @@ class SupabaseAuthMiddleware(MiddlewareMixin):
         Django's middleware mechanism.
     """
 
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         """
         Initializes the middleware.
@@ -47,12 +106,13 @@ class SupabaseAuthMiddleware(MiddlewareMixin):
             A callable to get the response for a request.
         """
         self.get_response = get_response
-        super().__init__(get_response)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
-    def _return_anon_user(self, request: HttpRequest):
+    def _token_subject(self, request: HttpRequest) -> Optional[str]:
         """
-        Sets the user attribute of the request to an AnonymousUser and
-        returns the response.
+        Returns the UUID of the account the request's JWT was issued
+        for.
 
         Parameters:
         -----------
@@ -61,62 +121,56 @@ class SupabaseAuthMiddleware(MiddlewareMixin):
 
         Returns:
         --------
-        HttpResponse
-            The response for the request.
+        str or None
+            The 'sub' claim of the JWT, or None if the 'Authorization'
+            header is missing, is not a bearer token or holds a JWT
+            that is expired, malformed or not signed by Supabase.
         """
-        request.user = AnonymousUser()
-        return self.get_response(request)
-
-    def process_request(self, request: HttpRequest):
+        auth_header = request.headers.get("Authorization", "")
+        if not auth_header.startswith("Bearer "):
+            return None
+        return token_subject(
+            auth_header.removeprefix("Bearer ").strip(),
+            settings.SUPABASE["JWT_SECRET"],
+        )
+
+    def _is_stale(self, account: Account) -> bool:
         """
-        Processes the incoming request.
-
-        This method checks for the 'Authorization' header in the
-        request, decodes the JWT token, and sets the user attribute of
-        the request to the corresponding user instance. If the JWT token
-        is invalid or not present, or if any exception occurs, it sets
-        the user attribute to an AnonymousUser.
-
-        Parameters:
-        -----------
-        request : HttpRequest
-            The incoming request.
-
-        Returns:
-        --------
-        HttpResponse
-            The response for the request.
+        Whether the `last_login` of an account is older than
+        `LAST_SEEN_INTERVAL`, or was never set.
         """
-        if not isinstance(request.user, AnonymousUser):
-            return self.get_response(request)
-
-        auth_header = request.headers.get("Authorization")
-
-        if not auth_header:
-            self._return_anon_user(request)
-
-        try:
-            token = auth_header.strip("Bearer").strip()
-            decoded_token = jwt.decode(
-                token,
-                algorithms=["HS256"],
-                options={
-                    "verify_signature": False,
-                },
-            )
-
-            if datetime.datetime.now().timestamp() > decoded_token["exp"]:
-                self._return_anon_user(request)
-
-            uuid = decoded_token["sub"]
-            user = Account.objects.get(uuid=uuid)
-            request.user = user
-
-            return self.get_response(request)
-        except (
-            Account.DoesNotExist,
-            ValidationError,
-            KeyError,
-            AttributeError,
-        ):
-            self._return_anon_user(request)
+        return (
+            account.last_login is None
+            or timezone.now() - account.last_login > LAST_SEEN_INTERVAL
+        )
+
+    def __call__(self, request: HttpRequest):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if uuid := self._token_subject(request):
+            try:
+                request.user = Account.objects.get(uuid=uuid)
+            except (Account.DoesNotExist, ValidationError):
+                request.user = AnonymousUser()
+            else:
+                if self._is_stale(request.user):
+                    request.user.last_login = timezone.now()
+                    Account.objects.filter(pk=request.user.pk).update(
+                        last_login=request.user.last_login
+                    )
+        return self.get_response(request)
+
+    async def __acall__(self, request: HttpRequest):
+        if uuid := self._token_subject(request):
+            try:
+                request.user = await Account.objects.aget(uuid=uuid)
+            except (Account.DoesNotExist, ValidationError):
+                request.user = AnonymousUser()
+            else:
+                if self._is_stale(request.user):
+                    request.user.last_login = timezone.now()
+                    await Account.objects.filter(pk=request.user.pk).aupdate(
+                        last_login=request.user.last_login
+                    )
+        return await self.get_response(request)
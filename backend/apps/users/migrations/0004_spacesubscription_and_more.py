@@ -0,0 +1,44 @@
+# Generated by Django 4.2.4 on 2026-10-19 08:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0003_alter_profile_account"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SpaceSubscription",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("space_id", models.CharField(max_length=128)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="space_subscriptions",
+                        to="users.profile",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="spacesubscription",
+            constraint=models.UniqueConstraint(
+                fields=("space_id", "profile"),
+                name="unique_space_subscription",
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.4 on 2026-10-19 08:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0006_supabaseadmintask"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="version",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        # Profiles are inserted by a trigger on the account table, which
+        # does not know about the version.
+        migrations.RunSQL(
+            "ALTER TABLE users_profile ALTER COLUMN version SET DEFAULT 1",
+            "ALTER TABLE users_profile ALTER COLUMN version DROP DEFAULT",
+        ),
+    ]
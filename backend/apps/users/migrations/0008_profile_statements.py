@@ -0,0 +1,110 @@
+# Generated by Django 4.2.4 on 2026-10-19 08:50
+
+import hashlib
+
+from django.db import migrations, models
+
+from core.tokens import count_tokens
+
+# The statements are rendered as the model rendered them when this
+# migration was written. Later changes to the model's renderer only
+# apply to the profiles saved after them.
+STATEMENT_FIELDS = [
+    "personal_statement",
+    "personal_statement_tokens",
+    "anonymous_statement",
+    "anonymous_statement_tokens",
+    "statement_hash",
+]
+
+
+def render_statements(profile):
+    name = ""
+    if profile.first_name:
+        name += f"The user's name is {profile.first_name} "
+    if profile.last_name:
+        name += f"{profile.last_name}. "
+    anonymous = f"Here is their bio: {profile.bio}" if profile.bio else ""
+    model = profile.large_language_model or "gpt-4"
+    profile.personal_statement = name + anonymous
+    profile.personal_statement_tokens = count_tokens(name + anonymous, model)
+    profile.anonymous_statement = anonymous
+    profile.anonymous_statement_tokens = count_tokens(anonymous, model)
+    profile.statement_hash = hashlib.sha256(anonymous.encode()).hexdigest()
+
+
+def render_existing_statements(apps, schema_editor):
+    Profile = apps.get_model("users", "Profile")
+    # Profiles are walked by primary key, a batch at a time, so that
+    # they are never all held in memory.
+    last_pk = 0
+    while True:
+        batch = list(
+            Profile.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .only("first_name", "last_name", "bio", "large_language_model")[
+                :1000
+            ]
+        )
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        for profile in batch:
+            render_statements(profile)
+        Profile.objects.bulk_update(batch, STATEMENT_FIELDS)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0007_profile_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="anonymous_statement",
+            field=models.TextField(default="", editable=False),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="anonymous_statement_tokens",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="personal_statement",
+            field=models.TextField(default="", editable=False),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="personal_statement_tokens",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="statement_hash",
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        # Profiles are inserted by a trigger on the account table, which
+        # does not know about the statements. They are rendered on the
+        # first save.
+        migrations.RunSQL(
+            """
+            ALTER TABLE users_profile
+                ALTER COLUMN personal_statement SET DEFAULT '',
+                ALTER COLUMN personal_statement_tokens SET DEFAULT 0,
+                ALTER COLUMN anonymous_statement SET DEFAULT '',
+                ALTER COLUMN anonymous_statement_tokens SET DEFAULT 0
+            """,
+            """
+            ALTER TABLE users_profile
+                ALTER COLUMN personal_statement DROP DEFAULT,
+                ALTER COLUMN personal_statement_tokens DROP DEFAULT,
+                ALTER COLUMN anonymous_statement DROP DEFAULT,
+                ALTER COLUMN anonymous_statement_tokens DROP DEFAULT
+            """,
+        ),
+        migrations.RunPython(
+            render_existing_statements, migrations.RunPython.noop
+        ),
+    ]
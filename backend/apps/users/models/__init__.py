@@ -1,2 +1,4 @@
 from .account import Account
 from .profile import Profile
+from .subscription import SpaceSubscription
+from .task import SupabaseAdminTask
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 from django.contrib.auth.models import (
@@ -7,10 +7,79 @@ from django.contrib.auth.models import (
     PermissionsMixin,
 )
 
-from apps.users.supabase_client import supabase_client
+from core.clients import get_supabase_client
 
+from .task import SupabaseAdminTask
 
-class AccountManager(BaseUserManager):
+
+class AccountQuerySet(models.QuerySet):
+    """
+    AccountQuerySet deletes accounts in batches and keeps Supabase in
+    sync.
+
+    Methods:
+    --------
+    delete(sync_supabase: bool = True, batch_size: int = 500)
+        -> tuple[int, dict]:
+        Deletes the accounts along with their profiles and
+        recommendations, and enqueues the deletion of their Supabase
+        users.
+    """
+
+    def delete(self, sync_supabase=True, batch_size=500):
+        """
+        Deletes the accounts of the queryset.
+
+        Unlike `QuerySet.delete`, which loads every account and deletes
+        them and their related rows in a single transaction, the
+        accounts are deleted `batch_size` at a time, each batch in its
+        own transaction. Profiles, subscriptions and recommendations
+        are deleted with one statement per table and batch. The
+        deletion of the Supabase users is enqueued in the same
+        transaction as the batch, so that it happens if and only if the
+        accounts are gone.
+
+        Parameters:
+        -----------
+        sync_supabase : bool, optional
+            Whether to enqueue the deletion of the Supabase users. Only
+            accounts that never had one, such as generated test data,
+            should skip it.
+        batch_size : int, optional
+            The number of accounts deleted per transaction.
+
+        Returns:
+        --------
+        tuple[int, dict]:
+            The number of rows deleted and the number per model, as
+            returned by `QuerySet.delete`.
+        """
+        deleted, per_model = 0, {}
+        accounts = list(self.order_by("pk").values_list("pk", "uuid"))
+        for offset in range(0, len(accounts), batch_size):
+            batch = accounts[offset : offset + batch_size]
+            with transaction.atomic(using=self.db):
+                if sync_supabase:
+                    SupabaseAdminTask.enqueue_user_deletions(
+                        user_uuid for _, user_uuid in batch
+                    )
+                # The base manager returns a plain queryset, whose delete
+                # cascades with one statement per related table.
+                count, counts = (
+                    self.model._base_manager.using(self.db)
+                    .filter(pk__in=[pk for pk, _ in batch])
+                    .delete()
+                )
+            deleted += count
+            for label, count in counts.items():
+                per_model[label] = per_model.get(label, 0) + count
+        return deleted, per_model
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class AccountManager(BaseUserManager.from_queryset(AccountQuerySet)):
     """
     AccountManager is a custom user manager for the Account model. It
     provides methods to create a regular user and a superuser for the
@@ -35,7 +104,9 @@ class AccountManager(BaseUserManager):
     """
 
     def create_user(self, email, password, username=None):
-        supabase_client.auth.sign_up({"email": email, "password": password})
+        get_supabase_client().auth.sign_up(
+            {"email": email, "password": password}
+        )
 
         user: Account = Account.objects.get(email=email)
 
@@ -150,8 +221,8 @@ class Account(AbstractBaseUser, PermissionsMixin):
         Returns the username of the user.
 
     delete():
-        Deletes the user from both the Supabase authentication system
-        and the local database.
+        Deletes the user from the local database and enqueues its
+        deletion from the Supabase authentication system.
 
     __str__() -> str:
         Returns the email of the user for string representation.
@@ -180,17 +251,20 @@ class Account(AbstractBaseUser, PermissionsMixin):
         """
         return self.username
 
-    def delete(self):
+    def delete(self, using=None, keep_parents=False):
         """
-        Deletes the user from both the Supabase authentication system
-        and the local database.
-
-        The method ensures that when a user is deleted from the Django
-        ORM, they are also deleted from Supabase's authentication
-        system.
+        Deletes the user from the local database and enqueues its
+        deletion from Supabase's authentication system.
+
+        The Supabase user is deleted in the background by the
+        `process_supabase_tasks` command, so the caller does not wait
+        on Supabase. The task is enqueued in the same transaction as the
+        deletion, so the user is removed from Supabase if and only if
+        it is removed from the Django ORM.
         """
-        supabase_client.auth.admin.delete_user(self.uuid)
-        super().delete()
+        with transaction.atomic(using=using):
+            SupabaseAdminTask.enqueue_user_deletions([self.uuid])
+            return super().delete(using=using, keep_parents=keep_parents)
 
     def __str__(self):
         """
@@ -1,8 +1,65 @@
+import hashlib
 from textwrap import dedent
+from typing import Optional
 
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from core.tokens import count_tokens
+
+# The fields the personal statements of a profile are rendered from.
+STATEMENT_SOURCE_FIELDS = {
+    "first_name",
+    "last_name",
+    "bio",
+    "large_language_model",
+}
+
+# The fields that hold the rendered personal statements of a profile.
+STATEMENT_FIELDS = {
+    "personal_statement",
+    "personal_statement_tokens",
+    "anonymous_statement",
+    "anonymous_statement_tokens",
+    "statement_hash",
+}
+
+
+def render_statements(
+    first_name: Optional[str],
+    last_name: Optional[str],
+    bio: Optional[str],
+    large_language_model: Optional[str],
+) -> dict:
+    """
+    Renders the personal statements of a profile, which are sent to the
+    language model with every prompt.
+
+    Parameters:
+    -----------
+    first_name, last_name, bio, large_language_model : str or None
+        The fields of the profile.
+
+    Returns:
+    --------
+    dict:
+        The values of the `STATEMENT_FIELDS` of the profile.
+    """
+    name = ""
+    if first_name:
+        name += f"The user's name is {first_name} "
+    if last_name:
+        name += f"{last_name}. "
+    anonymous = f"Here is their bio: {bio}" if bio else ""
+    model = large_language_model or Profile.LargeLanguageModelChoices.GPT_4
+    return {
+        "personal_statement": name + anonymous,
+        "personal_statement_tokens": count_tokens(name + anonymous, model),
+        "anonymous_statement": anonymous,
+        "anonymous_statement_tokens": count_tokens(anonymous, model),
+        "statement_hash": hashlib.sha256(anonymous.encode()).hexdigest(),
+    }
+
 
 class Profile(models.Model):
     """
@@ -60,9 +117,43 @@ class Profile(models.Model):
         The preferred large language model of the user. Defaults to
         'gpt-4', but is optional. Provides choices between 'gpt-4' and
         'llama2' and will include more in the future.
+    bio_embedding : BinaryField
+        The embedding of the bio as little-endian float32, used to skip
+        proposals the user is unlikely to care about.
+    bio_embedding_key : CharField
+        The digest of the bio and embedder the embedding was made from.
+        The bio is embedded again when it no longer matches.
+    version : PositiveIntegerField
+        Incremented on every save, so that clients can tell whether the
+        profile changed without reading it. The column defaults to 1 in
+        the database as well, as profiles are inserted by the trigger.
+    personal_statement : TextField
+        The statement of the user's name and bio sent to the language
+        model. Like the other statement fields, it is rendered on every
+        save, and defaults to empty in the database for the profiles
+        inserted by the trigger.
+    personal_statement_tokens : PositiveIntegerField
+        The number of tokens of the personal statement for the user's
+        language model.
+    anonymous_statement : TextField
+        The personal statement without the user's name, sent when the
+        completion is shared by a cluster of profiles.
+    anonymous_statement_tokens : PositiveIntegerField
+        The number of tokens of the anonymous statement.
+    statement_hash : CharField
+        The digest of the anonymous statement. Profiles with the same
+        digest and language model get the same completion for a
+        proposal.
 
     Methods:
     --------
+    render_statements() -> None:
+        Renders the personal statements from the fields of the profile.
+
+    save(*args, **kwargs) -> None:
+        Saves the profile, renders its personal statements and
+        increments its version.
+
     __str__() -> str:
         Returns the string representation of the user profile, which is
         the associated account's representation.
@@ -82,8 +173,8 @@ class Profile(models.Model):
     last_name = models.CharField(max_length=40, null=True, blank=True)
     bio = models.TextField(max_length=500, null=True, blank=True)
     subscribed_to_emails = models.BooleanField(
-        default=True, 
-        null=True, 
+        default=True,
+        null=True,
         blank=True,
     )
     large_language_model = models.CharField(
@@ -93,6 +184,56 @@ class Profile(models.Model):
         null=True,
         blank=True,
     )
+    bio_embedding = models.BinaryField(null=True, editable=False)
+    bio_embedding_key = models.CharField(
+        max_length=64, null=True, editable=False
+    )
+    version = models.PositiveIntegerField(default=1, editable=False)
+    personal_statement = models.TextField(default="", editable=False)
+    personal_statement_tokens = models.PositiveIntegerField(
+        default=0, editable=False
+    )
+    anonymous_statement = models.TextField(default="", editable=False)
+    anonymous_statement_tokens = models.PositiveIntegerField(
+        default=0, editable=False
+    )
+    statement_hash = models.CharField(max_length=64, null=True, editable=False)
+
+    def render_statements(self):
+        """
+        Renders the personal statements from the fields of the profile.
+        Updates that bypass `save()`, such as `bulk_create()`, must call
+        it themselves.
+        """
+        for name, value in render_statements(
+            self.first_name,
+            self.last_name,
+            self.bio,
+            self.large_language_model,
+        ).items():
+            setattr(self, name, value)
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the profile, rendering its personal statements and
+        incrementing its version in the database so that concurrent
+        saves never share a version.
+        """
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or STATEMENT_SOURCE_FIELDS & {*update_fields}:
+            self.render_statements()
+            if update_fields is not None:
+                update_fields = kwargs["update_fields"] = {
+                    *update_fields,
+                    *STATEMENT_FIELDS,
+                }
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "version"}
+        self.version = models.F("version") + 1
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=["version"])
 
     def __str__(self):
         return self.account.__str__()
@@ -0,0 +1,30 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .profile import Profile
+from apps.users import cache
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_cached_profile(sender, instance: Profile, **kwargs):
+    """
+    Drops the cached copy of a profile once it is saved or deleted.
+
+    The cache is invalidated when the transaction commits, so that a
+    read in between does not cache the version being replaced.
+
+    Args:
+    ----
+    sender : Model
+        The model class that triggered the signal.
+    instance : Profile
+        The saved or deleted profile.
+    **kwargs : dict
+        Additional keyword arguments passed by the signal trigger.
+    """
+    account_id = instance.pk
+    transaction.on_commit(
+        lambda: cache.invalidate(account_id), using=kwargs.get("using")
+    )
@@ -0,0 +1,48 @@
+from django.db import models
+
+from .profile import Profile
+
+
+class SpaceSubscription(models.Model):
+    """
+    SpaceSubscription represents a profile's interest in the proposals
+    of a Snapshot space.
+
+    Proposals are only fanned out to the subscribers of the space they
+    belong to. The unique constraint on (`space_id`, `profile`) doubles
+    as the space-to-subscriber index used to select them.
+
+    Attributes:
+    -----------
+    profile : ForeignKey
+        The subscribed profile. Its subscriptions are deleted along
+        with it.
+    space_id : CharField
+        The Snapshot identifier of the space, such as 'aave.eth'.
+    created_at : DateTimeField
+        Timestamp of when the subscription was created.
+
+    Methods:
+    --------
+    __str__() -> str:
+        Returns the profile and the space of the subscription.
+    """
+
+    profile = models.ForeignKey(
+        Profile,
+        on_delete=models.CASCADE,
+        related_name="space_subscriptions",
+    )
+    space_id = models.CharField(max_length=128)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["space_id", "profile"],
+                name="unique_space_subscription",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.profile} -> {self.space_id}"
@@ -0,0 +1,92 @@
+from typing import Iterable
+
+from django.db import models
+from django.utils import timezone
+
+
+class SupabaseAdminTask(models.Model):
+    """
+    SupabaseAdminTask represents an operation on Supabase's
+    authentication system that is carried out in the background.
+
+    Admin operations are recorded in the same transaction as the local
+    change they mirror, so Supabase is kept in sync even if the request
+    that caused them ends before Supabase answers. The tasks are run
+    concurrently by the `process_supabase_tasks` command, which claims
+    them with `SELECT ... FOR UPDATE SKIP LOCKED` so that several
+    workers never run the same task. A failed task is retried with an
+    exponential backoff until it runs out of attempts.
+
+    Attributes:
+    -----------
+    operation : CharField
+        The admin operation to carry out.
+    user_uuid : UUIDField
+        The identifier of the Supabase user the operation applies to.
+    status : CharField
+        Whether the task is pending, done or failed for good.
+    attempts : PositiveIntegerField
+        The number of times the task was claimed.
+    last_error : TextField
+        The error of the last failed attempt.
+    available_at : DateTimeField
+        When the task can be claimed next. Claiming a task moves it
+        forward by a lease, so that the task is retried if its worker
+        dies.
+    created_at : DateTimeField
+        Timestamp of when the task was enqueued.
+    completed_at : DateTimeField
+        Timestamp of when the task succeeded or failed for good.
+
+    Methods:
+    --------
+    enqueue_user_deletions(user_uuids: Iterable) -> list:
+        Enqueues the deletion of Supabase users.
+
+    __str__() -> str:
+        Returns the operation and the user of the task.
+    """
+
+    class OperationChoices(models.TextChoices):
+        DELETE_USER = "delete_user"
+
+    class StatusChoices(models.TextChoices):
+        PENDING = "pending"
+        DONE = "done"
+        FAILED = "failed"
+
+    operation = models.CharField(
+        max_length=32, choices=OperationChoices.choices
+    )
+    user_uuid = models.UUIDField()
+    status = models.CharField(
+        max_length=16,
+        choices=StatusChoices.choices,
+        default=StatusChoices.PENDING,
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "available_at"],
+                name="supabase_task_queue",
+            )
+        ]
+
+    @classmethod
+    def enqueue_user_deletions(cls, user_uuids: Iterable) -> list:
+        return cls.objects.bulk_create(
+            cls(
+                operation=cls.OperationChoices.DELETE_USER,
+                user_uuid=user_uuid,
+            )
+            for user_uuid in user_uuids
+        )
+
+    def __str__(self):
+        return f"{self.operation} {self.user_uuid}"
@@ -0,0 +1,280 @@
+"""
+Bulk provisioning of accounts.
+
+`AccountManager.create_user` signs a single user up with Supabase,
+reads the account created by the `auth.users` trigger and saves its
+username, which takes three round trips per user. `provision_accounts`
+signs many users up concurrently, waits for the trigger-created rows in
+batches and sets the usernames with a single bulk update, so a whole
+DAO can be onboarded at once.
+"""
+
+import csv
+import dataclasses
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
+
+from apps.users.models import Account
+from core.clients import get_supabase_client
+
+# The number of sign ups sent to Supabase at once.
+CONCURRENCY = 8
+
+# The number of accounts read or updated per query.
+BATCH_SIZE = 500
+
+# The seconds to wait for the `auth.users` trigger to create the
+# accounts, and between two checks.
+TIMEOUT = 60.0
+POLL_INTERVAL = 0.5
+
+FORMATS = ("csv", "ndjson")
+
+
+@dataclasses.dataclass
+class ProvisioningReport:
+    """
+    The outcome of `provision_accounts`.
+
+    Attributes:
+    -----------
+    created : list
+        The emails of the accounts that were created.
+    existing : list
+        The emails that already had an account and were left untouched.
+    rejected : dict
+        The reason each invalid row was not signed up, by email, or by
+        row number if the row has no email or repeats one.
+    failed : dict
+        The error returned by Supabase for each failed sign up, by
+        email.
+    missing : list
+        The emails that were signed up but whose account was not
+        created by the trigger before the timeout.
+    """
+
+    created: list = dataclasses.field(default_factory=list)
+    existing: list = dataclasses.field(default_factory=list)
+    rejected: dict = dataclasses.field(default_factory=dict)
+    failed: dict = dataclasses.field(default_factory=dict)
+    missing: list = dataclasses.field(default_factory=list)
+
+
+def read_users(stream: Iterable[str], format: str) -> list:
+    """
+    Reads the users to provision.
+
+    Parameters:
+    -----------
+    stream : Iterable[str]
+        The lines of the file.
+    format : str
+        Either "csv", with a header row naming the `email`, `password`
+        and optional `username` columns, or "ndjson", with one JSON
+        object with the same keys per line.
+
+    Returns:
+    --------
+    list:
+        The users as dictionaries.
+
+    Raises:
+    -------
+    ValueError:
+        If the format is unknown or a line is not valid JSON.
+    """
+    match format:
+        case "csv":
+            return [dict(row) for row in csv.DictReader(stream)]
+        case "ndjson":
+            return [json.loads(line) for line in stream if line.strip()]
+        case _:
+            raise ValueError(
+                f"Unknown format {format!r}, expected one of"
+                f" {', '.join(FORMATS)}"
+            )
+
+
+def format_of(filename: str) -> Optional[str]:
+    """Guesses the format of a file of users from its extension."""
+    extension = filename.rsplit(".", 1)[-1].lower()
+    if extension in ("ndjson", "jsonl"):
+        return "ndjson"
+    if extension == "csv":
+        return "csv"
+    return None
+
+
+def read_upload(upload, format: Optional[str] = None) -> list:
+    """
+    Reads the users to provision from an uploaded file. The format is
+    guessed from the file name if omitted.
+    """
+    return read_users(
+        io.TextIOWrapper(upload, encoding="utf-8-sig"),
+        format or format_of(upload.name) or "",
+    )
+
+
+def _normalize_email(email: Optional[str]) -> str:
+    """
+    Normalizes an email as Supabase stores it, fully lowercased, so that
+    it matches the email the `auth.users` trigger copies to the account.
+    """
+    return (email or "").strip().lower()
+
+
+def _validate(users: list, report: ProvisioningReport) -> dict:
+    """
+    Rejects the rows that cannot be signed up, and returns the username
+    requested for each remaining email.
+    """
+    usernames = {}
+    for number, user in enumerate(users, start=1):
+        email = _normalize_email(user.get("email"))
+        username = (user.get("username") or "").strip()
+        if not email or not user.get("password"):
+            report.rejected[
+                email or f"row {number}"
+            ] = "An email and a password are required"
+        elif email in usernames or email in report.rejected:
+            report.rejected[f"row {number}"] = "The email is repeated"
+        elif len(username) > Account._meta.get_field("username").max_length:
+            report.rejected[email] = "The username is too long"
+        else:
+            usernames[email] = username
+    return usernames
+
+
+def _reject_taken_usernames(usernames: dict, report: ProvisioningReport):
+    """
+    Rejects the emails whose requested username belongs to an account
+    or is requested more than once.
+    """
+    requested = {}
+    for email, username in usernames.items():
+        if username:
+            requested.setdefault(username, []).append(email)
+    taken = set()
+    for offset in range(0, len(requested), BATCH_SIZE):
+        taken.update(
+            Account.objects.filter(
+                username__in=list(requested)[offset : offset + BATCH_SIZE]
+            ).values_list("username", flat=True)
+        )
+    for username, emails in requested.items():
+        if username in taken or len(emails) > 1:
+            for email in emails:
+                report.rejected[email] = "The username is already taken"
+                del usernames[email]
+
+
+def _sign_up(user: dict) -> Optional[str]:
+    """Signs a user up with Supabase and returns the error, if any."""
+    try:
+        get_supabase_client().auth.sign_up(
+            {"email": user["email"], "password": user["password"]}
+        )
+    except Exception as exception:
+        return str(exception) or exception.__class__.__name__
+    return None
+
+
+def provision_accounts(
+    users: list,
+    concurrency: int = CONCURRENCY,
+    batch_size: int = BATCH_SIZE,
+    timeout: float = TIMEOUT,
+) -> ProvisioningReport:
+    """
+    Creates the accounts of many users.
+
+    Invalid rows, and rows whose username is taken, are rejected before
+    anything is sent to Supabase. Emails that already have an account
+    are skipped. The remaining users are signed up with up to
+    `concurrency` requests in flight. The accounts are then created by
+    the `auth.users` trigger; they are read in batches until all of
+    them exist or `timeout` expires, and their usernames are set with a
+    bulk update. Users without a username get their UUID, as with
+    `AccountManager.create_user`.
+
+    Parameters:
+    -----------
+    users : list
+        The users as dictionaries with an `email`, a `password` and an
+        optional `username`, as returned by `read_users`.
+    concurrency : int, optional
+        The number of sign ups sent to Supabase at once.
+    batch_size : int, optional
+        The number of accounts read or updated per query.
+    timeout : float, optional
+        The seconds to wait for the trigger to create the accounts.
+
+    Returns:
+    --------
+    ProvisioningReport:
+        The outcome for every user.
+    """
+    report = ProvisioningReport()
+    usernames = _validate(users, report)
+
+    emails = list(usernames)
+    for offset in range(0, len(emails), batch_size):
+        report.existing.extend(
+            Account.objects.filter(
+                email__in=emails[offset : offset + batch_size]
+            ).values_list("email", flat=True)
+        )
+    for email in report.existing:
+        del usernames[email]
+    _reject_taken_usernames(usernames, report)
+
+    passwords = {
+        _normalize_email(user.get("email")): user["password"]
+        for user in users
+        if user.get("password")
+    }
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+        errors = executor.map(
+            _sign_up,
+            (
+                {"email": email, "password": passwords[email]}
+                for email in usernames
+            ),
+        )
+        for email, error in zip(list(usernames), errors):
+            if error is not None:
+                report.failed[email] = error
+                del usernames[email]
+
+    pending = set(usernames)
+    deadline = time.monotonic() + timeout
+    while pending:
+        batch = list(pending)[:batch_size]
+        accounts = list(
+            Account.objects.filter(email__in=batch).only(
+                "email", "uuid", "username"
+            )
+        )
+        changed = []
+        for account in accounts:
+            username = usernames[account.email] or str(account.uuid)
+            if account.username != username:
+                account.username = username
+                changed.append(account)
+        Account.objects.bulk_update(changed, ["username"])
+        created = {account.email for account in accounts}
+        report.created.extend(email for email in batch if email in created)
+        pending -= created
+
+        if len(accounts) == len(batch):
+            continue
+        if time.monotonic() >= deadline:
+            report.missing.extend(sorted(pending))
+            break
+        time.sleep(POLL_INTERVAL)
+
+    return report
@@ -0,0 +1,156 @@
+"""
+Worker for the Supabase admin task queue.
+
+Tasks are enqueued as `SupabaseAdminTask` rows in the transaction of
+the change they mirror, and are run by `process_tasks`. Tasks are
+claimed with `SELECT ... FOR UPDATE SKIP LOCKED`, so several workers
+can drain the queue at once, and each claim leases the task for
+`LEASE` seconds, after which a task whose worker died is claimed again.
+"""
+
+import datetime
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.users.models import SupabaseAdminTask
+from core.clients import get_supabase_client
+
+logger = logging.getLogger(__name__)
+
+# The number of tasks sent to Supabase at once.
+CONCURRENCY = 8
+
+# The number of tasks claimed at once.
+BATCH_SIZE = 100
+
+# The number of attempts after which a task is marked as failed.
+MAX_ATTEMPTS = 5
+
+# The seconds a claimed task is reserved for its worker, and the delay
+# before the first retry, which doubles with every attempt.
+LEASE = 300
+RETRY_DELAY = 30
+
+
+def claim_tasks(limit: int = BATCH_SIZE) -> list:
+    """
+    Claims the pending tasks that are due, oldest first.
+
+    Parameters:
+    -----------
+    limit : int, optional
+        The maximum number of tasks to claim.
+
+    Returns:
+    --------
+    list:
+        The claimed tasks. Tasks locked by another worker are skipped.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        tasks = list(
+            SupabaseAdminTask.objects.select_for_update(skip_locked=True)
+            .filter(
+                status=SupabaseAdminTask.StatusChoices.PENDING,
+                available_at__lte=now,
+            )
+            .order_by("available_at")[:limit]
+        )
+        SupabaseAdminTask.objects.filter(
+            pk__in=[task.pk for task in tasks]
+        ).update(
+            attempts=F("attempts") + 1,
+            available_at=now + datetime.timedelta(seconds=LEASE),
+        )
+    for task in tasks:
+        task.attempts += 1
+    return tasks
+
+
+def run_task(task: SupabaseAdminTask) -> Optional[str]:
+    """
+    Carries out a task.
+
+    Parameters:
+    -----------
+    task : SupabaseAdminTask
+        The task to carry out.
+
+    Returns:
+    --------
+    str or None:
+        The error, or None if the task succeeded. Deleting a user that
+        no longer exists in Supabase succeeds.
+    """
+    try:
+        match task.operation:
+            case SupabaseAdminTask.OperationChoices.DELETE_USER:
+                get_supabase_client().auth.admin.delete_user(
+                    str(task.user_uuid)
+                )
+            case _:
+                return f"Unknown operation {task.operation!r}"
+    except Exception as exception:
+        if getattr(exception, "status", None) == 404:
+            return None
+        return str(exception) or exception.__class__.__name__
+    return None
+
+
+def process_tasks(
+    limit: int = BATCH_SIZE, concurrency: int = CONCURRENCY
+) -> dict:
+    """
+    Claims a batch of tasks and runs them concurrently.
+
+    Failed tasks are made available again after `RETRY_DELAY` seconds,
+    doubled for every previous attempt, and are marked as failed once
+    they reach `MAX_ATTEMPTS`.
+
+    Parameters:
+    -----------
+    limit : int, optional
+        The maximum number of tasks to claim.
+    concurrency : int, optional
+        The number of tasks sent to Supabase at once.
+
+    Returns:
+    --------
+    dict:
+        The number of tasks that are done, will be retried and failed.
+    """
+    tasks = claim_tasks(limit)
+    if not tasks:
+        return {"done": 0, "retried": 0, "failed": 0}
+
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+        errors = list(executor.map(run_task, tasks))
+
+    now = timezone.now()
+    counts = {"done": 0, "retried": 0, "failed": 0}
+    for task, error in zip(tasks, errors):
+        task.last_error = error or ""
+        if error is None:
+            task.status = SupabaseAdminTask.StatusChoices.DONE
+            task.completed_at = now
+            counts["done"] += 1
+        elif task.attempts >= MAX_ATTEMPTS:
+            task.status = SupabaseAdminTask.StatusChoices.FAILED
+            task.completed_at = now
+            counts["failed"] += 1
+            logger.error("Supabase task %s failed for good: %s", task, error)
+        else:
+            task.available_at = now + datetime.timedelta(
+                seconds=RETRY_DELAY * 2 ** (task.attempts - 1)
+            )
+            counts["retried"] += 1
+            logger.warning("Supabase task %s failed: %s", task, error)
+    SupabaseAdminTask.objects.bulk_update(
+        tasks, ["status", "last_error", "available_at", "completed_at"]
+    )
+    return counts
@@ -0,0 +1,84 @@
+"""
+Accessors for the clients of external services.
+
+Clients are built, and their libraries imported, on first use rather
+than when the modules using them are imported. `django.setup()`,
+migrations and management commands that never talk to Supabase,
+Snapshot or OpenAI neither pay for these imports nor need the
+credentials. A missing setting is reported by the first call.
+"""
+
+import functools
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+@functools.cache
+def get_supabase_client():
+    """
+    Returns the Supabase client, authenticated with the service role
+    key.
+    """
+    import supabase
+
+    try:
+        return supabase.Client(
+            settings.SUPABASE["URL"],
+            settings.SUPABASE["SERVICE_ROLE_KEY"],
+            options=supabase.client.ClientOptions(
+                auto_refresh_token=False,
+                persist_session=False,
+            ),
+        )
+    except (KeyError, AttributeError):
+        raise ImproperlyConfigured(
+            "Either the `SUPABASE` setting is missing or it is improperly"
+            " configured"
+        )
+
+
+def get_snapshot_url() -> str:
+    """Returns the URL of the Snapshot GraphQL API."""
+    try:
+        return settings.SNAPSHOT["GRAPHQL_URL"]
+    except (KeyError, AttributeError):
+        raise ImproperlyConfigured(
+            "Either the `SNAPSHOT` setting is missing or it is improperly"
+            " configured"
+        )
+
+
+@functools.cache
+def get_snapshot_client():
+    """
+    Returns the synchronous Snapshot GraphQL client. The schema is
+    fetched with the first query.
+    """
+    from gql import Client
+    from gql.transport.aiohttp import AIOHTTPTransport
+
+    return Client(
+        transport=AIOHTTPTransport(url=get_snapshot_url()),
+        fetch_schema_from_transport=True,
+    )
+
+
+@functools.cache
+def get_openai():
+    """
+    Returns the `openai` module, configured with the key and base URL of
+    the OpenAI provider.
+    """
+    import openai
+
+    try:
+        provider = settings.LARGE_LANGUAGE_MODEL_PROVIDERS["openai"]
+        openai.api_key = provider["key"]
+        openai.api_base = provider["base"]
+    except (KeyError, AttributeError):
+        raise ImproperlyConfigured(
+            "Either the `LARGE_LANGUAGE_MODEL_PROVIDERS` setting is missing or"
+            " it is improperly configured"
+        )
+    return openai
@@ -0,0 +1,75 @@
+"""
+Conditional GET for API views.
+
+The frontend polls the recommendations and the profile, which rarely
+change between polls. Views derive a strong ETag from a cheap query,
+such as an aggregate or a version counter, and answer requests whose
+`If-None-Match` holds it with 304 Not Modified, before reading or
+serializing the data.
+"""
+
+import hashlib
+from typing import Optional
+
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+
+
+def make_etag(*parts) -> str:
+    """
+    Builds a strong ETag from the values that identify a version of a
+    resource.
+
+    Parameters:
+    -----------
+    *parts
+        The values, such as the requesting user, a row count and the
+        latest modification time.
+
+    Returns:
+    --------
+    str:
+        The quoted ETag.
+    """
+    digest = hashlib.sha256(repr(parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def not_modified(request: HttpRequest, etag: str) -> Optional[HttpResponse]:
+    """
+    Answers a conditional request whose client already holds the
+    current version of a resource.
+
+    Parameters:
+    -----------
+    request : HttpRequest
+        The request, which may carry an `If-None-Match` header.
+    etag : str
+        The ETag of the current version.
+
+    Returns:
+    --------
+    HttpResponse or None:
+        A 304 Not Modified response, or None if the resource must be
+        sent.
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        return None
+    return tag(response, etag)
+
+
+def tag(response: HttpResponse, etag: str) -> HttpResponse:
+    """
+    Sets the ETag of a response. Responses depend on the user, so they
+    vary on the `Authorization` header and may only be cached privately,
+    and are revalidated on every use.
+    """
+    response["ETag"] = etag
+    patch_vary_headers(response, ("Authorization",))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
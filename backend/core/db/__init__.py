@@ -0,0 +1,16 @@
+from django.db import connections
+
+
+def release_connections():
+    """
+    Returns the connections held by the current thread to the pool,
+    unless they are inside a transaction.
+
+    Outside of the request cycle (for example in a fan-out worker)
+    Django never closes connections, so a worker would otherwise keep
+    its connections for as long as it runs, including while it waits
+    on a language model.
+    """
+    for connection in connections.all(initialized_only=True):
+        if not connection.in_atomic_block:
+            connection.close_if_unusable_or_obsolete()
@@ -0,0 +1,140 @@
+"""
+PostgreSQL database backend that borrows connections from a psycopg
+connection pool instead of opening a new connection per request.
+
+The `default`, `public` and `auth` aliases point at the same Supabase
+database and only differ by their search path, so they share a single
+pool per process. The search path of each alias is set on the
+connection when it is borrowed, and Django "closing" the connection
+returns it to the pool.
+
+Options (in the alias' `OPTIONS`):
+
+    search_path : str
+        The schema search path of the alias.
+    pool : dict
+        Keyword arguments for `psycopg_pool.ConnectionPool`, such as
+        `min_size`, `max_size`, `timeout`, `max_idle` and
+        `max_lifetime`.
+"""
+
+import os
+import threading
+import time
+
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from django.utils.asyncio import async_unsafe
+from prometheus_client import Gauge, Histogram
+from psycopg import sql
+from psycopg_pool import ConnectionPool
+
+POOL_WAIT = Histogram(
+    "diplomat_db_pool_wait_seconds",
+    "Time spent waiting to borrow a connection from the pool.",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0),
+)
+POOL_SIZE = Gauge(
+    "diplomat_db_pool_size",
+    "Number of connections managed by the pool.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+POOL_AVAILABLE = Gauge(
+    "diplomat_db_pool_available",
+    "Number of idle connections in the pool.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+POOL_WAITING = Gauge(
+    "diplomat_db_pool_waiting",
+    "Number of requests waiting for a connection from the pool.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(conn_params: dict, options: dict) -> ConnectionPool:
+    """
+    Returns the pool of this process for the given connection
+    parameters, creating it on first use.
+
+    Pools are keyed by process id so that a forked worker never reuses
+    the sockets of its parent.
+    """
+    key = (
+        os.getpid(),
+        tuple(
+            sorted(
+                (name, value)
+                for name, value in conn_params.items()
+                if name not in ("context", "cursor_factory")
+            )
+        ),
+        tuple(sorted(options.items())),
+    )
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(
+                kwargs=conn_params,
+                check=ConnectionPool.check_connection,
+                name=(
+                    f"{conn_params.get('user')}@{conn_params.get('host')}"
+                    f"/{conn_params.get('dbname')}"
+                ),
+                open=True,
+                **options,
+            )
+        return _pools[key]
+
+
+def observe_pool(pool: ConnectionPool):
+    """Updates the pool gauges from the pool's statistics."""
+    stats = pool.get_stats()
+    POOL_SIZE.labels(pool.name).set(stats["pool_size"])
+    POOL_AVAILABLE.labels(pool.name).set(stats["pool_available"])
+    POOL_WAITING.labels(pool.name).set(stats.get("requests_waiting", 0))
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    _pool = None
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop("pool", None)
+        conn_params.pop("search_path", None)
+        return conn_params
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        options = self.settings_dict["OPTIONS"]
+        self.isolation_level = IsolationLevel.READ_COMMITTED
+        self._pool = get_pool(conn_params, options.get("pool", {}))
+
+        start = time.perf_counter()
+        connection = self._pool.getconn()
+        POOL_WAIT.labels(self._pool.name).observe(time.perf_counter() - start)
+        observe_pool(self._pool)
+
+        if search_path := options.get("search_path"):
+            connection.execute(
+                sql.SQL("SET search_path TO {}").format(
+                    sql.SQL(", ").join(
+                        sql.Identifier(schema.strip())
+                        for schema in search_path.split(",")
+                    )
+                )
+            )
+            if not connection.autocommit:
+                connection.commit()
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self._pool.putconn(self.connection)
+                observe_pool(self._pool)
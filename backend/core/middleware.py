@@ -0,0 +1,19 @@
+"""
+Project-wide middleware.
+"""
+
+from django.middleware import gzip
+
+
+class GZipMiddleware(gzip.GZipMiddleware):
+    """
+    Compresses responses like Django's `GZipMiddleware`, except for
+    server-sent event streams, whose events must reach the client as
+    soon as they are written instead of waiting to fill a compressed
+    block.
+    """
+
+    def process_response(self, request, response):
+        if response.get("Content-Type", "").startswith("text/event-stream"):
+            return response
+        return super().process_response(request, response)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import json
 import os
 from pathlib import Path
 
@@ -67,6 +68,7 @@ MIDDLEWARE = [
     # Django middleware
     # -------------------------------------------------------------------------
     "django.middleware.security.SecurityMiddleware",
+    "core.middleware.GZipMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -103,11 +105,22 @@ WSGI_APPLICATION = "core.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# All aliases share one psycopg connection pool per process (see
+# `core.db.backends.pooled_postgresql`), so the pool size bounds the
+# number of connections a process opens to Supabase.
+DATABASE_POOL = {
+    "min_size": int(os.getenv("DATABASE_POOL_MIN_SIZE", "2")),
+    "max_size": int(os.getenv("DATABASE_POOL_MAX_SIZE", "10")),
+    "timeout": float(os.getenv("DATABASE_POOL_TIMEOUT", "10")),
+    "max_idle": float(os.getenv("DATABASE_POOL_MAX_IDLE", "300")),
+}
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "core.db.backends.pooled_postgresql",
         "OPTIONS": {
-            "options": "-c search_path=private",
+            "search_path": "private",
+            "pool": DATABASE_POOL,
         },
         "NAME": os.getenv("SUPABASE_DB_NAME"),
         "USER": os.getenv("SUPABASE_DB_USER"),
@@ -116,9 +129,10 @@ DATABASES = {
         "PORT": os.getenv("SUPABASE_DB_PORT"),
     },
     "public": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "core.db.backends.pooled_postgresql",
         "OPTIONS": {
-            "options": "-c search_path=public",
+            "search_path": "public",
+            "pool": DATABASE_POOL,
         },
         "NAME": os.getenv("SUPABASE_DB_NAME"),
         "USER": os.getenv("SUPABASE_DB_USER"),
@@ -127,9 +141,10 @@ DATABASES = {
         "PORT": os.getenv("SUPABASE_DB_PORT"),
     },
     "auth": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "core.db.backends.pooled_postgresql",
         "OPTIONS": {
-            "options": "-c search_path=auth",
+            "search_path": "auth",
+            "pool": DATABASE_POOL,
         },
         "NAME": os.getenv("SUPABASE_DB_NAME"),
         "USER": os.getenv("SUPABASE_DB_USER"),
@@ -140,6 +155,31 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# Redis when `REDIS_URL` is set (which requires the `redis` package),
+# otherwise the memory of each process. Local caches are not shared, so
+# a change only invalidates the cache of the process that made it and
+# the other processes serve their copy until it expires.
+CACHES = {
+    "default": (
+        {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+        if os.getenv("REDIS_URL")
+        else {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        }
+    ),
+}
+
+# How long, in seconds, profiles are cached.
+PROFILE_CACHE_TIMEOUT = int(os.getenv("PROFILE_CACHE_TIMEOUT", "300"))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -208,15 +248,15 @@ AUTH_USER_MODEL = "users.Account"
 
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 
-EMAIL_HOST = "smtp.gmail.com"
+EMAIL_HOST = os.getenv("EMAIL_HOST", "smtp.gmail.com")
 
-EMAIL_PORT = 587
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", "587"))
 
 EMAIL_HOST_USER = os.getenv("GOOGLE_EMAIL_ADDRESS")
 
 EMAIL_HOST_PASSWORD = os.getenv("GOOGLE_APP_PASSWORD")
 
-EMAIL_USE_TLS = True
+EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "true").lower() == "true"
 
 
 # Supabase
@@ -224,6 +264,29 @@ EMAIL_USE_TLS = True
 SUPABASE = {
     "URL": os.getenv("SUPABASE_URL"),
     "SERVICE_ROLE_KEY": os.getenv("SUPABASE_SERVICE_ROLE_KEY"),
+    # The secret Supabase signs its JWTs with. The signature of every
+    # JWT is verified with it, and no JWT is accepted while it is unset.
+    "JWT_SECRET": os.getenv("SUPABASE_JWT_SECRET"),
+}
+
+
+# Snapshot
+
+SNAPSHOT = {
+    "GRAPHQL_URL": os.getenv(
+        "SNAPSHOT_GRAPHQL_URL", "https://hub.snapshot.org/graphql"
+    ),
+    # Spaces whose proposals are pulled by the proposal sync. The spaces
+    # with at least one subscriber are synced when empty.
+    "SPACES": [
+        space for space in os.getenv("SNAPSHOT_SPACES", "").split(",") if space
+    ],
+    # How far back, in seconds, the first proposal sync looks.
+    "SYNC_LOOKBACK": int(os.getenv("SNAPSHOT_SYNC_LOOKBACK", "86400")),
+    # The secret configured on the Snapshot webhook, which Snapshot
+    # sends with every delivery. Deliveries are rejected while it is
+    # unset.
+    "WEBHOOK_SECRET": os.getenv("SNAPSHOT_WEBHOOK_SECRET", ""),
 }
 
 
@@ -232,6 +295,7 @@ SUPABASE = {
 LARGE_LANGUAGE_MODEL_PROVIDERS = {
     "openai": {
         "key": os.getenv("OPENAI_API_KEY"),
+        "base": os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1"),
     },
     "llama2": {
         "key": None,
@@ -239,6 +303,127 @@ LARGE_LANGUAGE_MODEL_PROVIDERS = {
 }
 
 
+# Routing of completions to cheaper, faster models
+
+MODEL_ROUTING = {
+    # Whether completions may be routed away from the model of the
+    # profile at all.
+    "ENABLED": os.getenv("MODEL_ROUTING_ENABLED", "true").lower() == "true",
+    # The routes of each model of the profiles, tried in order. A
+    # completion takes the first route whose limits it is within, and
+    # keeps the model of the profile if there is none. A route may limit
+    # the tokens of the prompt (`max_prompt_tokens`), the complexity of
+    # the proposal from 0 to 1 (`max_complexity`, see
+    # `apps.bot.completions.proposal_complexity`) and the seconds left
+    # before voting ends (`max_seconds_left`). Deployments override the
+    # routes with the JSON of `MODEL_ROUTING_ROUTES`.
+    "ROUTES": json.loads(
+        os.getenv(
+            "MODEL_ROUTING_ROUTES",
+            json.dumps(
+                {
+                    "gpt-4": [
+                        # Voting is about to end: answer fast.
+                        {"model": "gpt-3.5-turbo", "max_seconds_left": 3600},
+                        # Short, plain proposals.
+                        {
+                            "model": "gpt-3.5-turbo",
+                            "max_prompt_tokens": 1500,
+                            "max_complexity": 0.3,
+                        },
+                    ],
+                }
+            ),
+        )
+    ),
+}
+
+
+# Deadlines and hedging of completion requests
+
+HEDGING = {
+    # Whether slow completions are sent a second time.
+    "ENABLED": os.getenv("HEDGING_ENABLED", "true").lower() == "true",
+    # The hard deadline, in seconds, of every completion, hedged or not.
+    "DEADLINE": float(os.getenv("COMPLETION_DEADLINE", "120")),
+    # The percentile of the recent latencies of a provider's model past
+    # which a pending completion is hedged, and the minimum number of
+    # latencies before any is, out of the last `WINDOW` completions.
+    "PERCENTILE": float(os.getenv("HEDGING_PERCENTILE", "0.95")),
+    "MIN_SAMPLES": 20,
+    "WINDOW": 500,
+    # The minimum seconds a completion is pending before it is hedged.
+    "MIN_DELAY": float(os.getenv("HEDGING_MIN_DELAY", "2")),
+    # The share of the tokens of completions that hedges may spend on
+    # top of them.
+    "MAX_TOKEN_SHARE": float(os.getenv("HEDGING_MAX_TOKEN_SHARE", "0.05")),
+}
+
+
+# Fan-out of proposals to the users
+
+FAN_OUT = {
+    # The number of clusters of profiles whose completions are requested
+    # at the same time.
+    "CONCURRENCY": int(os.getenv("FAN_OUT_CONCURRENCY", "8")),
+    # The number of profiles per shard of a fan-out run. Shards are the
+    # unit of work claimed by the fan-out workers.
+    "SHARD_SIZE": int(os.getenv("FAN_OUT_SHARD_SIZE", "250")),
+    # The share of the word shingles of a proposal's title and body that
+    # must change for an edit to regenerate its recommendations.
+    "REVISION_MIN_CHANGE": float(
+        os.getenv("FAN_OUT_REVISION_MIN_CHANGE", "0.1")
+    ),
+}
+
+
+# Real-time push of new recommendations to the clients
+
+REALTIME = {
+    # The database the notifications of new recommendations are listened
+    # for on, if not the default one. `LISTEN` needs a session of its
+    # own, so this must bypass any transaction pooler, such as the
+    # transaction mode of Supabase's pooler.
+    "DATABASE_URL": os.getenv("REALTIME_DATABASE_URL"),
+    # The seconds between the comments that keep idle streams, and the
+    # proxies in front of them, open.
+    "HEARTBEAT": float(os.getenv("REALTIME_HEARTBEAT", "15")),
+    # The seconds after which a stream is closed, and reopened by the
+    # client. Disconnected clients are only noticed when a stream
+    # closes, so this bounds the streams held for nobody.
+    "STREAM_TIMEOUT": float(os.getenv("REALTIME_STREAM_TIMEOUT", "300")),
+    # The number of undelivered events after which a stream misses the
+    # next ones.
+    "QUEUE_SIZE": 100,
+}
+
+
+# Embeddings used to skip the profiles a proposal is irrelevant to
+
+EMBEDDINGS = {
+    # The embedder class, either the local `HashingEmbedder` or the
+    # `OpenAIEmbedder`.
+    "BACKEND": os.getenv(
+        "EMBEDDINGS_BACKEND", "apps.bot.embeddings.HashingEmbedder"
+    ),
+    "OPTIONS": {},
+    # The minimum cosine similarity between a bio and a proposal for the
+    # profile to receive a recommendation. The scale depends on the
+    # embedder: hashing embeddings of unrelated texts are close to 0,
+    # while OpenAI embeddings rarely go below 0.7.
+    "MIN_SIMILARITY": os.getenv("EMBEDDINGS_MIN_SIMILARITY", "0.05"),
+}
+
+
+# Prometheus metrics
+
+METRICS = {
+    # The bearer token scrapers send to read `/api/v1/bot/metrics`. Only
+    # admin users can read the metrics while it is unset.
+    "TOKEN": os.getenv("METRICS_TOKEN", ""),
+}
+
+
 # CORS headers
 
 CORS_ORIGIN_ALLOW_ALL = True
@@ -0,0 +1,61 @@
+"""
+Counting of language model tokens.
+
+Texts are counted with the tokenizer of their model through `tiktoken`,
+when it is installed. Without it, or for models `tiktoken` does not
+know, the count is estimated from the words and punctuation of the
+text, which is close to the count of OpenAI's tokenizers for English
+prose. Counts are used for budgeting, never to truncate a prompt, so an
+estimate is good enough.
+"""
+
+import functools
+import re
+
+# The encoding of the models `tiktoken` does not know.
+DEFAULT_ENCODING = "cl100k_base"
+
+# The pieces of text the estimate counts as one token each.
+ESTIMATE_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+@functools.cache
+def get_encoding(model: str):
+    """
+    Returns the `tiktoken` encoding of a model, or None if `tiktoken` is
+    not installed.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+def count_tokens(text: str, model: str) -> int:
+    """
+    Counts the tokens of a text for a model.
+
+    Parameters:
+    -----------
+    text : str
+        The text to count the tokens of.
+    model : str
+        The name of the model, such as 'gpt-4'.
+
+    Returns:
+    --------
+    int:
+        The number of tokens, or its estimate if `tiktoken` is not
+        installed.
+    """
+    if not text:
+        return 0
+    encoding = get_encoding(model)
+    if encoding is None:
+        return len(ESTIMATE_PATTERN.findall(text))
+    return len(encoding.encode(text, disallowed_special=()))